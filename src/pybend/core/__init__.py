@@ -2,8 +2,14 @@ from .models.proto_model import ProtoModel
 from .models.storable_mixin import StorableMixin
 from .models.viewable_mixin import ViewableMixin
 from .api.routes import create_api_blueprint
-from .storage.abstract_storage import AbstractStorage
+from .storage.abstract_storage import AbstractStorage, StorageBusy
 from .storage.json_storage import JSONStorage
+from .storage.json_log_storage import JSONLogStorage
+from .storage.columnar_storage import ColumnarStorage
+from .storage.kv_storage import KVStorage
+from .storage.memory_storage import MemoryStorage
+from .storage.caching_storage import CachingStorage
+from .storage.instrumented_storage import InstrumentedStorage
 from .storage.sqlite_storage import SQLiteStorage
 from .utils.decorators import expose_route
 from .utils.registrar import register_model, registered_models
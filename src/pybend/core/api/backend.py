@@ -19,6 +19,10 @@ class BaseBackend(ABC, BaseModel):
 
     app: Any = None
     registered_models: dict[str, type] = {}
+    # Serializer of the response bodies (see api.serializers), the fastest available by default
+    serializer: Any = None
+    # Per-route request metrics (see api.metrics), served at /metrics
+    metrics: Any = None
 
     class Config:
         orm_mode = True
@@ -30,6 +34,12 @@ class BaseBackend(ABC, BaseModel):
         self.description = f"{self.__class__.__name__} backend"
         self.version = "1.0.0"
         self.port = 8000
+        if self.serializer is None:
+            from api.serializers import default_serializer
+            self.serializer = default_serializer()
+        if self.metrics is None:
+            from api.metrics import RouteMetrics
+            self.metrics = RouteMetrics()
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
@@ -39,6 +49,28 @@ class BaseBackend(ABC, BaseModel):
     def register_routes(self, registered_models: dict[str, type]):
         pass
 
+    @abstractmethod
+    def install_metrics(self):
+        """
+        Installs the request timing hooks on `app`, recording into `metrics`, and serves them at /metrics.
+        """
+        pass
+
+    def shutdown(self):
+        """
+        Closes the storage backends (and their async adapters) of all registered models,
+        each backend once.
+        """
+        storages = []
+        # Async adapters first, so that pending calls drain before their storage is closed
+        for attribute in ('async_storage', 'storage'):
+            for model_class in self.registered_models.values():
+                storage = getattr(model_class, attribute, None)
+                if storage is not None and not any(storage is s for s in storages):
+                    storages.append(storage)
+        for storage in storages:
+            storage.close()
+
 
 # app/backends/fastapi_backend.py
 class FastAPIBackend(BaseBackend):
@@ -47,10 +79,14 @@ class FastAPIBackend(BaseBackend):
         from fastapi import FastAPI
         from fastapi.middleware.cors import CORSMiddleware
 
+        # The OpenAPI document and docs are served by `register_routes`, from the schema registry
         self.app = FastAPI(
             title=self.name,
             version=self.version,
-            description=self.description
+            description=self.description,
+            openapi_url=None,
+            docs_url=None,
+            redoc_url=None
         )
         self.app.add_middleware(
             CORSMiddleware,
@@ -59,12 +95,63 @@ class FastAPIBackend(BaseBackend):
             allow_methods=["*"],
             allow_headers=["*"],
         )
+        self.install_metrics()
+        self.app.add_event_handler("shutdown", self.shutdown)
+
+        from fastapi.responses import JSONResponse
+        from storage.abstract_storage import StorageBusy
+
+        @self.app.exception_handler(StorageBusy)
+        async def storage_busy(request, exc):
+            # Nothing was written, the client can retry
+            return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+    def install_metrics(self):
+        from fastapi import Response
+        from api.metrics import PROMETHEUS, MetricsMiddleware
+        # Added last, so it is the outermost middleware and times the others too
+        self.app.add_middleware(MetricsMiddleware, metrics=self.metrics)
+
+        @self.app.get('/metrics', include_in_schema=False)
+        async def metrics():
+            return Response(content=self.metrics.render(), media_type=PROMETHEUS)
 
     def register_routes(self, registered_models: dict[str, type]):
         from api.routes_fastapi import register_routes, register_route
         from api.routes_fastapi import router
-        register_routes()
+        register_routes(self.serializer)
         self.app.include_router(router)
+        self._register_openapi_routes()
+
+    def _register_openapi_routes(self):
+        """
+        Serves the OpenAPI document built once, on first use, through the schema
+        registry (pre-serialized, with an ETag), and the Swagger UI and ReDoc pages.
+        """
+        from fastapi import Request
+        from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+        from fastapi.openapi.utils import get_openapi
+        from api.routes_fastapi import schema_response
+        from utils.schema_registry import schema_registry
+        app = self.app
+
+        def compiled_openapi():
+            return schema_registry.document('openapi', lambda: get_openapi(
+                title=app.title, version=app.version, description=app.description, routes=app.routes
+            ))
+        app.openapi = lambda: compiled_openapi().schema
+
+        @app.get('/openapi.json', include_in_schema=False)
+        async def openapi_json(request: Request):
+            return schema_response(request, compiled_openapi())
+
+        @app.get('/docs', include_in_schema=False)
+        async def swagger_ui():
+            return get_swagger_ui_html(openapi_url='/openapi.json', title=f"{app.title} - Swagger UI")
+
+        @app.get('/redoc', include_in_schema=False)
+        async def redoc():
+            return get_redoc_html(openapi_url='/openapi.json', title=f"{app.title} - ReDoc")
 
     def get_app(self):
         return self.app
@@ -72,18 +159,86 @@ class FastAPIBackend(BaseBackend):
 
 # app/backends/flask_backend.py
 class FlaskBackend(BaseBackend):
+    swagger: Any = None
+
     def __init__(self, **data):
         super().__init__(**data)
         from flask import Flask
         from flasgger import Swagger
         self.app = Flask(__name__, static_url_path='/static', static_folder='static', template_folder='templates')
         self.app.config['SWAGGER'] = {'title': 'PyBend Flask API', 'uiversion': 3}
-        Swagger(self.app)
+        self.swagger = Swagger(self.app)
+        self.install_metrics()
+
+        import json
+        from flask import Response
+        from storage.abstract_storage import StorageBusy
+
+        @self.app.errorhandler(StorageBusy)
+        def storage_busy(exc):
+            # Nothing was written, the client can retry
+            return Response(json.dumps({'error': str(exc)}), status=503, headers={'Retry-After': '1'},
+                            content_type='application/json')
+        # Flask has no application shutdown signal, close storages at interpreter exit
+        import atexit
+        atexit.register(self.shutdown)
+
+    def install_metrics(self):
+        """
+        Times requests from `before_request` to `after_request`: streamed responses
+        are timed to their first byte and their size is not recorded. The route
+        label is the matched URL rule. Timings are kept in the WSGI environ, per
+        request, as batch operations share the application context (and `g`).
+        """
+        import time
+        from flask import Response, request
+        from api.metrics import PROMETHEUS
+        app, metrics = self.app, self.metrics
+
+        @app.before_request
+        def start_timer():
+            request.environ['pybend.metrics.start'] = time.perf_counter()
+            metrics.started(request.method)
+
+        @app.after_request
+        def record_metrics(response):
+            start = request.environ.get('pybend.metrics.start')
+            if start is not None:
+                route = request.url_rule.rule if request.url_rule is not None else None
+                size = None if response.is_streamed else response.calculate_content_length()
+                metrics.observe(request.method, route, response.status_code, time.perf_counter() - start, size)
+            return response
+
+        @app.teardown_request
+        def stop_timer(exc=None):
+            if request.environ.pop('pybend.metrics.start', None) is not None:
+                metrics.finished(request.method)
+
+        def metrics_view():
+            return Response(metrics.render(), content_type=PROMETHEUS)
+        app.add_url_rule('/metrics', endpoint='metrics', view_func=metrics_view, methods=['GET'])
 
     def register_routes(self, registered_models: dict[str, type]):
         from api.routes_flask import create_api_blueprint
-        blueprint = create_api_blueprint(registered_models)
+        blueprint = create_api_blueprint(registered_models, self.serializer)
         self.app.register_blueprint(blueprint)
+        self._serve_compiled_apispec()
+
+    def _serve_compiled_apispec(self):
+        """
+        Replaces flasgger's spec views, which re-serialize the spec on every request,
+        with the spec compiled once through the schema registry.
+        """
+        from api.routes_flask import schema_response
+        from utils.schema_registry import schema_registry
+        for spec in self.swagger.config['specs']:
+            endpoint = spec['endpoint']
+
+            def apispec(endpoint=endpoint):
+                return schema_response(schema_registry.document(
+                    f'swagger-{endpoint}', lambda: self.swagger.get_apispecs(endpoint)
+                ))
+            self.app.view_functions[f'flasgger.{endpoint}'] = apispec
 
     def get_app(self):
         from asgiref.wsgi import WsgiToAsgi
@@ -0,0 +1,209 @@
+# app/api/batch.py
+
+import json
+from contextlib import ExitStack, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from api.streaming import JSON
+from storage.async_storage import transaction_thread
+from storage.change_feed import change_feed
+
+# `POST /batch` takes a list of sub-requests, `{"method", "path", "body", "headers"}`,
+# runs them in order against the generated routes, in process, and answers with
+# their results, `{"status", "headers", "body"}`, in the same order. With
+# `?transaction=true` they run in one transaction of the storages of the models
+# they address: the first failed operation (status >= 400) rolls every write back.
+# The backend-specific dispatch lives in the route modules.
+
+METHODS = frozenset({'GET', 'POST', 'PUT', 'DELETE'})
+
+# Headers of the batch request describing its own body or conditions, not passed on to the operations
+_BATCH_HEADERS = frozenset({
+    'content-length', 'content-type', 'content-encoding', 'transfer-encoding', 'accept',
+    'if-none-match', 'if-modified-since', 'if-match', 'if-unmodified-since',
+})
+# Headers of the operations' responses left out of their results
+_RESPONSE_HEADERS = frozenset({'content-length', 'transfer-encoding'})
+
+# Status of the operations undone or skipped because another one failed in a transaction
+FAILED_DEPENDENCY = 424
+
+
+class Operation(NamedTuple):
+    method: str
+    path: str
+    query: str
+    headers: Dict[str, str]  # added to (or overriding) those of the batch request
+    body: Optional[bytes]  # JSON encoded
+
+
+class OperationResult(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    content_type: Optional[str]
+
+
+class Rollback(Exception):
+    """
+    Raised inside a batch transaction to roll it back after a failed operation.
+    """
+
+
+def parse_operations(payload: Any, max_operations: int) -> List[Operation]:
+    """
+    Validates the body of a batch request. Raises ValueError when it is invalid.
+    """
+    if not isinstance(payload, list):
+        raise ValueError("A batch must be a list of operations")
+    if len(payload) > max_operations:
+        raise ValueError(f"A batch holds at most {max_operations} operations, got {len(payload)}")
+    operations = []
+    for index, item in enumerate(payload):
+        if not isinstance(item, dict):
+            raise ValueError(f"Operation {index} must be an object with a method and a path")
+        method = str(item.get('method', 'GET')).upper()
+        if method not in METHODS:
+            raise ValueError(f"Operation {index}: unsupported method '{method}'")
+        path = item.get('path')
+        if not isinstance(path, str) or not path.startswith('/'):
+            raise ValueError(f"Operation {index}: path must be a string starting with '/'")
+        path, _, query = path.partition('?')
+        if path.rstrip('/') == '/batch':
+            raise ValueError(f"Operation {index}: batches cannot be nested")
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict):
+            raise ValueError(f"Operation {index}: headers must be an object")
+        body = json.dumps(item['body']).encode() if item.get('body') is not None else None
+        operations.append(Operation(method, path, query, {str(k): str(v) for k, v in headers.items()}, body))
+    return operations
+
+
+def operation_headers(batch_headers: Iterable[Tuple[str, str]], operation: Operation) -> Dict[str, str]:
+    """
+    Returns the request headers of an operation: those of the batch request
+    (e.g. Authorization), minus the ones about its own body, plus the operation's.
+    """
+    headers = {name.lower(): value for name, value in batch_headers if name.lower() not in _BATCH_HEADERS}
+    if operation.body is not None:
+        headers['content-type'] = JSON
+    headers.update((name.lower(), value) for name, value in operation.headers.items())
+    return headers
+
+
+def result_headers(headers: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+    return {name: value for name, value in headers if name.lower() not in _RESPONSE_HEADERS}
+
+
+def error_result(status: int, message: str) -> OperationResult:
+    return OperationResult(status, {}, json.dumps({'error': message}).encode(), JSON)
+
+
+def model_storages(operations: List[Operation], models: Dict[str, Any]) -> List[Any]:
+    """
+    Returns the distinct storages of the models the operations address, by the
+    first segment of their path (`/product/1` -> the `product` model).
+    """
+    storages = []
+    for operation in operations:
+        model_class = models.get(operation.path.split('/')[1])
+        storage = getattr(model_class, 'storage', None)
+        if storage is not None and not any(storage is s for s in storages):
+            storages.append(storage)
+    return storages
+
+
+@contextmanager
+def storage_transactions(storages: List[Any]):
+    """
+    Holds a transaction of each storage for the duration of the block. Raises
+    NotImplementedError, before the block runs, if one does not support them.
+    """
+    with ExitStack() as stack:
+        for storage in storages:
+            stack.enter_context(storage.transaction())
+        yield
+
+
+@contextmanager
+def transaction(storages: List[Any]):
+    """
+    Holds a transaction of each storage for the duration of the block, its changes
+    published once they are all committed.
+    """
+    with change_feed.deferred(), storage_transactions(storages):
+        yield
+
+
+def failed(result: OperationResult) -> bool:
+    return result.status >= 400
+
+
+def rolled_back(results: List[OperationResult], total: int) -> List[OperationResult]:
+    """
+    Returns the results of a transaction rolled back after its last operation
+    failed: that failure, and a 424 for every other operation.
+    """
+    index = len(results) - 1
+    return (
+        [error_result(FAILED_DEPENDENCY, f"Rolled back, operation {index} failed")] * index
+        + [results[index]]
+        + [error_result(FAILED_DEPENDENCY, f"Not run, operation {index} failed")] * (total - index - 1)
+    )
+
+
+def run_atomic(storages: List[Any], operations: List[Operation],
+               dispatch: Callable[[Operation], OperationResult]) -> List[OperationResult]:
+    """
+    Dispatches the operations in order inside one transaction, up to the first failure.
+    """
+    results: List[OperationResult] = []
+    try:
+        with transaction(storages):
+            for operation in operations:
+                results.append(dispatch(operation))
+                if failed(results[-1]):
+                    raise Rollback()
+    except Rollback:
+        return rolled_back(results, len(operations))
+    return results
+
+
+async def arun_atomic(storages: List[Any], operations: List[Operation],
+                      dispatch: Callable[[Operation], Awaitable[OperationResult]]) -> List[OperationResult]:
+    """
+    `run_atomic` for an async `dispatch`. The transactions are held by a thread
+    of their own, which runs every storage call of the operations, so that the
+    event loop neither holds nor waits for a writer lock.
+    """
+    results: List[OperationResult] = []
+    try:
+        with change_feed.deferred():
+            async with transaction_thread(lambda: storage_transactions(storages)):
+                for operation in operations:
+                    results.append(await dispatch(operation))
+                    if failed(results[-1]):
+                        raise Rollback()
+    except Rollback:
+        return rolled_back(results, len(operations))
+    return results
+
+
+def _encode_result(result: OperationResult) -> bytes:
+    mimetype = (result.content_type or '').split(';')[0].strip()
+    if not result.body:
+        body = b'null'
+    elif mimetype == JSON:
+        # Already JSON: embedded as is, without decoding it
+        body = result.body
+    else:
+        body = json.dumps(result.body.decode('utf-8', 'replace')).encode()
+    headers = json.dumps(result.headers, separators=(',', ':')).encode()
+    return b'{"status":%d,"headers":%s,"body":%s}' % (result.status, headers, body)
+
+
+def encode_results(results: List[OperationResult]) -> bytes:
+    """
+    Serializes the response of a batch: its results, in the order of the operations.
+    """
+    return b'[' + b','.join(_encode_result(result) for result in results) + b']'
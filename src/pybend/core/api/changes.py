@@ -0,0 +1,88 @@
+# app/api/changes.py
+
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, Optional, Type
+
+from storage.change_feed import Change
+from storage.filters import Condition, filters_from_query, parse_filters
+
+# Change feed routes (`/{model}/_changes`): the changes of a model pushed as
+# Server-Sent Events, or WebSocket messages on FastAPI. `since` (or the SSE
+# `Last-Event-ID` header) resumes after a sequence number, query params naming
+# a field filter the changes like the list routes filter rows. A stream ends
+# after a maximum duration, its last event id set to the position reached, and
+# the client reconnects from there.
+
+SSE = 'text/event-stream'
+SSE_HEADERS: Dict[str, str] = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+# Comment line sent when no change came for a while, so proxies keep the stream open
+KEEPALIVE = b': keepalive\n\n'
+
+
+def change_position(since: Optional[str], last_event_id: Optional[str] = None) -> Optional[int]:
+    """
+    Returns the sequence number to resume after, None to start from now on.
+    """
+    value = since if since not in (None, '') else last_event_id
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("since must be a change sequence number")
+
+
+def change_conditions(model_class: Type[Any], params: Mapping[str, str]) -> List[Condition]:
+    """
+    Parses the query params naming a field into filter conditions. Raises ValueError when invalid.
+    """
+    return parse_filters(model_class, filters_from_query(model_class, params))
+
+
+def encode_change(serializer: Any, change: Change) -> bytes:
+    return serializer.dumps_value(change._asdict())
+
+
+def sse_message(serializer: Any, change: Optional[Change]) -> bytes:
+    """
+    Formats a change as a Server-Sent Event, its sequence number as event id; None as a keep-alive.
+    """
+    if change is None:
+        return KEEPALIVE
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (change.seq, change.op.encode(), encode_change(serializer, change))
+
+
+def sse_position(position: int) -> bytes:
+    # An event with an id and no data sets the client's Last-Event-ID without being dispatched
+    return b'id: %d\n\n' % position
+
+
+def sse_stream(serializer: Any, changes: Iterator[Optional[Change]], position: int,
+               max_seconds: float) -> Iterator[bytes]:
+    """
+    Formats the changes yielded by `change_feed.subscribe(since=position)` as
+    Server-Sent Events for `max_seconds`, then ends with the position reached.
+    """
+    deadline = time.monotonic() + max_seconds
+    for change in changes:
+        if change is not None:
+            position = change.seq
+        yield sse_message(serializer, change)
+        if time.monotonic() >= deadline:
+            break
+    yield sse_position(position)
+
+
+async def asse_stream(serializer: Any, changes: AsyncIterator[Optional[Change]], position: int,
+                      max_seconds: float) -> AsyncIterator[bytes]:
+    """
+    `sse_stream` for `change_feed.asubscribe`.
+    """
+    deadline = time.monotonic() + max_seconds
+    async for change in changes:
+        if change is not None:
+            position = change.seq
+        yield sse_message(serializer, change)
+        if time.monotonic() >= deadline:
+            break
+    yield sse_position(position)
@@ -0,0 +1,68 @@
+# app/api/conditional.py
+
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional, Type
+
+from storage.versions import Version, VersionTracker
+
+# HTTP validators (ETag/Last-Modified) of the generated GET routes, from the
+# storage's version counters: a request whose validators still match is
+# answered 304 before any row is read.
+
+
+def _versions(model_class: Type[Any]) -> Optional[VersionTracker]:
+    return getattr(model_class.storage, 'versions', None)
+
+
+def list_version(model_class: Type[Any]) -> Optional[Version]:
+    """
+    Returns the version of the model's table, None if its storage does not track versions.
+    """
+    versions = _versions(model_class)
+    return versions.table_version(model_class.__tablename__) if versions is not None else None
+
+
+def instance_version(model_class: Type[Any], id_: int) -> Optional[Version]:
+    """
+    Returns the version of one row, None if the storage does not track versions.
+    """
+    versions = _versions(model_class)
+    return versions.row_version(model_class.__tablename__, id_) if versions is not None else None
+
+
+def validator_headers(version: Optional[Version], vary: str = None) -> Dict[str, str]:
+    """
+    Returns the ETag and Last-Modified headers of `version`. Routes serving several
+    representations under the same validators name the request headers choosing
+    between them in `vary`, so caches never revalidate one with the other's.
+    """
+    headers = {'Vary': vary} if vary else {}
+    if version is not None:
+        headers.update({'ETag': version.etag, 'Last-Modified': formatdate(version.last_modified, usegmt=True)})
+    return headers
+
+
+def _opaque_tag(tag: str) -> str:
+    # Weak comparison, as required for GET: W/"x" matches "x"
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def is_not_modified(version: Optional[Version], if_none_match: Optional[str],
+                    if_modified_since: Optional[str]) -> bool:
+    """
+    Whether the request validators match `version`. If-None-Match takes
+    precedence over If-Modified-Since (RFC 9110, 13.2.2).
+    """
+    if version is None:
+        return False
+    if if_none_match is not None:
+        return _opaque_tag(version.etag) in {_opaque_tag(tag) for tag in if_none_match.split(',')}
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # Last-Modified has a one second resolution
+        return int(version.last_modified) <= since
+    return False
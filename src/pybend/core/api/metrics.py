@@ -0,0 +1,160 @@
+# app/api/metrics.py
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Per-route request metrics of the backends, served at `/metrics` in the Prometheus
+# text format. Requests are labeled by the templated path of the route they
+# matched (`/products/{id}` on FastAPI, `/products/<int:id>` on Flask), never by
+# their raw URL, so the number of series stays bounded.
+
+PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+# Route label of the requests that matched no route
+UNMATCHED = '<unmatched>'
+
+# Upper bounds of the histogram buckets, in seconds and in bytes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    """
+    Counts of observations per bucket (not cumulated until rendered), their sum and count.
+    """
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, index: int, value: float):
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels: str) -> str:
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RouteMetrics:
+    """
+    Latency and response size histograms per (method, route, status), and the
+    number of requests in flight per method. Recording a request costs two
+    bisections and a few increments under a lock.
+    """
+
+    def __init__(self, latency_buckets: Sequence[float] = LATENCY_BUCKETS,
+                 size_buckets: Sequence[float] = SIZE_BUCKETS):
+        self.latency_buckets = tuple(latency_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self._lock = threading.Lock()
+        self._latency: Dict[Tuple[str, str, str], Histogram] = {}
+        self._sizes: Dict[Tuple[str, str, str], Histogram] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def started(self, method: str):
+        with self._lock:
+            self._in_flight[method] = self._in_flight.get(method, 0) + 1
+
+    def finished(self, method: str):
+        with self._lock:
+            self._in_flight[method] -= 1
+
+    def observe(self, method: str, route: Optional[str], status: int, seconds: float, size: Optional[int]):
+        """
+        Records a completed request. `size` is the response body size in bytes,
+        None when unknown (e.g. a streamed body), in which case it is not recorded.
+        """
+        key = (method, route or UNMATCHED, str(status))
+        latency_index = bisect_left(self.latency_buckets, seconds)
+        size_index = bisect_left(self.size_buckets, size) if size is not None else None
+        with self._lock:
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram(len(self.latency_buckets))
+            histogram.observe(latency_index, seconds)
+            if size_index is not None:
+                histogram = self._sizes.get(key)
+                if histogram is None:
+                    histogram = self._sizes[key] = Histogram(len(self.size_buckets))
+                histogram.observe(size_index, size)
+
+    def _render_histograms(self, lines: List[str], name: str, description: str, buckets: Tuple[float, ...],
+                           histograms: Dict[Tuple[str, str, str], Histogram]):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (method, route, status), histogram in sorted(histograms.items()):
+            labels = _labels(method=method, route=route, status=status)
+            cumulated = 0
+            for bound, count in zip(buckets + (float('inf'),), histogram.counts):
+                cumulated += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulated}')
+            lines.append(f'{name}_sum{{{labels}}} {_number(histogram.sum)}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+    def render(self) -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        with self._lock:
+            self._render_histograms(lines, 'http_request_duration_seconds',
+                                    'Time to serve HTTP requests, by method, route template and status.',
+                                    self.latency_buckets, self._latency)
+            self._render_histograms(lines, 'http_response_size_bytes',
+                                    'Size of the HTTP response bodies, by method, route template and status.',
+                                    self.size_buckets, self._sizes)
+            lines.append('# HELP http_requests_in_flight HTTP requests being served, by method.')
+            lines.append('# TYPE http_requests_in_flight gauge')
+            for method, count in sorted(self._in_flight.items()):
+                lines.append(f'http_requests_in_flight{{{_labels(method=method)}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request, from its start to the end of the
+    response body (the whole stream, for streamed responses). The route label
+    is the path template of the route the router matched.
+    """
+
+    def __init__(self, app: Any, metrics: RouteMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        method = scope['method']
+        start = time.perf_counter()
+        response = {'status': 500, 'size': 0}
+
+        async def timed_send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['size'] += len(message.get('body', b''))
+            await send(message)
+
+        self.metrics.started(method)
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            self.metrics.finished(method)
+            # The router leaves the matched route in the scope
+            route = getattr(scope.get('route'), 'path', None)
+            self.metrics.observe(method, route, response['status'], time.perf_counter() - start,
+                                 response['size'])
@@ -1,9 +1,25 @@
 # app/api/routes.py
 
-from fastapi import APIRouter, Request, HTTPException, status, Body
-from typing import Dict, Type, Any, List
+import asyncio
+import logging
+from fastapi import APIRouter, Request, Response, HTTPException, status, Body, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import Dict, Type, Any, List, Optional
+import config
+from api.batch import (Operation, OperationResult, arun_atomic, encode_results, error_result, model_storages,
+                       operation_headers, parse_operations, result_headers)
+from api.changes import SSE, SSE_HEADERS, asse_stream, change_conditions, change_position, encode_change
+from api.conditional import instance_version, is_not_modified, list_version, validator_headers
+from api.serializers import Serializer, default_serializer
+from api.streaming import JSON, NDJSON, aiter_json, fields_encoder, iter_json, split_fields, wants_ndjson
 from models.storable_mixin import StorableMixin
+from storage.abstract_storage import StorageBusy
+from storage.change_feed import change_feed
+from storage.filters import filters_from_query
 from utils.registrar import registered_models
+from utils.schema_registry import CompiledSchema, schema_registry
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -24,9 +40,122 @@ def register_route(path, fn, method='GET'):
         raise ValueError(f"Unsupported HTTP method: {method}")
 
 
-def register_routes():
+def schema_response(request: Request, compiled: CompiledSchema) -> Response:
+    """
+    Serves a pre-serialized schema document, or 304 when the client has it already.
+    """
+    headers = validator_headers(compiled.version)
+    if is_not_modified(compiled.version, request.headers.get('if-none-match'),
+                       request.headers.get('if-modified-since')):
+        return Response(status_code=304, headers=headers)
+    return Response(content=compiled.body, media_type=JSON, headers=headers)
+
+
+def json_response(serializer: Serializer, value: Any, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serializes a response body straight to bytes, bypassing `jsonable_encoder`
+    and response model validation.
+    """
+    return Response(content=serializer.dumps(value), status_code=status_code, media_type=JSON, headers=headers)
+
+
+def handler_response(serializer: Serializer, output: Any) -> Response:
+    """
+    Responds with the output of an @expose_route handler: a Response, a
+    `(body, status)` tuple (as Flask views return), or a body.
+    """
+    if isinstance(output, Response):
+        return output
+    if isinstance(output, tuple):
+        body, status_code = output
+        return json_response(serializer, body, status_code=status_code)
+    return json_response(serializer, output)
+
+
+# Keys of the batch request's ASGI scope shared by its operations
+_BATCH_SCOPE = ('type', 'asgi', 'http_version', 'scheme', 'server', 'client', 'root_path', 'state')
+
+
+async def dispatch_operation(request: Request, operation: Operation) -> OperationResult:
+    """
+    Runs one operation of a batch through the application, in process: a new
+    ASGI request whose response is collected in memory.
+    """
+    scope = {key: request.scope[key] for key in _BATCH_SCOPE if key in request.scope}
+    scope.update(
+        method=operation.method,
+        path=operation.path,
+        raw_path=operation.path.encode(),
+        query_string=operation.query.encode(),
+        headers=[(name.encode('latin-1'), value.encode('latin-1'))
+                 for name, value in operation_headers(request.headers.items(), operation).items()],
+    )
+    pending = [{'type': 'http.request', 'body': operation.body or b'', 'more_body': False}]
+    complete = asyncio.Event()
+    start: Dict[str, Any] = {}
+    chunks: List[bytes] = []
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        # Nothing more to read: the client "disconnects" once the response is complete
+        await complete.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            start.update(message)
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                complete.set()
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # The error response, if any, was sent before the exception was re-raised
+        logger.exception("Error in batch operation %s %s", operation.method, operation.path)
+        if not start:
+            return error_result(500, "Internal Server Error")
+    finally:
+        complete.set()
+    headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in start.get('headers', [])]
+    content_type = next((value for name, value in headers if name.lower() == 'content-type'), None)
+    return OperationResult(start.get('status', 500), result_headers(headers), b''.join(chunks), content_type)
+
+
+def register_routes(serializer: Serializer = None):
+    """
+    Registers the routes of all registered models. Response bodies are encoded
+    by `serializer`, the fastest available by default.
+    """
     print("Route registration started")
     print(registered_models)
+    serializer = serializer or default_serializer()
+
+    @router.get("/blueprint", tags=["Schema"], status_code=200)
+    async def get_blueprint(request: Request) -> Dict[str, Any]:
+        return schema_response(request, schema_registry.blueprint())
+
+    @router.post("/batch", tags=["Batch"], status_code=200)
+    async def batch(request: Request, operations: List[Dict[str, Any]] = Body(...),
+                    transaction: bool = False) -> List[Dict[str, Any]]:
+        try:
+            operations = parse_operations(operations, config.BATCH_MAX_OPERATIONS)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        dispatch = lambda operation: dispatch_operation(request, operation)
+        if not transaction:
+            results = [await dispatch(operation) for operation in operations]
+            return Response(content=encode_results(results), media_type=JSON)
+        storages = model_storages(operations, registered_models)
+        try:
+            results = await arun_atomic(storages, operations, dispatch)
+        except NotImplementedError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return Response(content=encode_results(results), media_type=JSON)
+
     for model_name, model_class in registered_models.items():
         endpoint_base = f"/{model_name}"
         is_storable = issubclass(model_class, StorableMixin)
@@ -37,48 +166,191 @@ def register_routes():
         # Register the base route for the schema
         @router.get(f"/{model_class.__name__}", tags=[model_title], status_code=200)
         @router.get(f"/{model_class.__name__}/schema", tags=[model_title], status_code=200)
-        async def get_model_schema(cls_=model_class) -> Dict[str, Any]:
-            return cls_.schema()
+        async def get_model_schema(request: Request, cls_=model_class) -> Dict[str, Any]:
+            return schema_response(request, schema_registry.schema(cls_))
 
         if is_storable:
             @router.post(endpoint_base, tags=[model_title], status_code=201)
-            async def create_instance(data: model_class) -> model_class:
+            async def create_instance(data: model_class, cls_=model_class) -> model_class:
+                # `data` was validated by FastAPI: it is stored as is, and the stored
+                # instance comes back without another validation
+                try:
+                    instance = await cls_.acreate(data)
+                    return json_response(serializer, instance, status_code=201)
+                except StorageBusy:
+                    raise
+                except Exception as e:
+                    logger.warning("Error creating instance of %s: %s", cls_.__tablename__, e)
+                    raise HTTPException(status_code=400, detail=str(e))
+
+            @router.get(endpoint_base, tags=[model_title], responses={304: {"description": "Not modified"}})
+            async def get_all_instances(request: Request, ids: Optional[str] = None,
+                                        limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                                        order: str = 'asc', stream: bool = False, fields: Optional[str] = None,
+                                        cls_=model_class) -> List[model_class]:
+                # Validated against the table version, before any row is read
+                version = list_version(cls_)
+                # The JSON array and the NDJSON stream share the table version
+                headers = validator_headers(version, vary='Accept')
+                if is_not_modified(version, request.headers.get('if-none-match'),
+                                   request.headers.get('if-modified-since')):
+                    return Response(status_code=304, headers=headers)
+                # Sparse fieldset: only these columns are read and serialized
+                field_list = split_fields(fields)
+                encode = fields_encoder(field_list, serializer)
+                # Trusted rows are serialized straight from storage, without building models
+                raw = cls_.__trusted__
+                if ids:
+                    try:
+                        id_list = [int(id_) for id_ in ids.split(',') if id_]
+                    except ValueError:
+                        raise HTTPException(status_code=400, detail="ids must be a comma separated list of integers")
+                    try:
+                        items = await cls_.aget_many(id_list, fields=field_list, raw=raw)
+                    except ValueError as e:
+                        raise HTTPException(status_code=400, detail=str(e))
+                    return Response(content=b''.join(iter_json(items, encode=encode)), media_type=JSON,
+                                    headers=headers)
+                # Query params naming a field (`email=...`, `price__gte=10`) are pushed down as filters
+                filters = filters_from_query(cls_, request.query_params)
+
+                ndjson = wants_ndjson(request.headers.get('accept'))
+                if stream or ndjson:
+                    # The whole result is streamed row by row from a storage cursor: memory
+                    # stays flat whatever the table size, so no page size applies
+                    try:
+                        rows = cls_.astream(cursor=cursor, order=order, filters=filters, fields=field_list, raw=raw)
+                    except ValueError as e:
+                        raise HTTPException(status_code=400, detail=str(e))
+                    return StreamingResponse(aiter_json(rows, ndjson=ndjson, encode=encode),
+                                             media_type=NDJSON if ndjson else JSON, headers=headers)
+
+                limit = min(limit or config.DEFAULT_PAGE_SIZE, config.MAX_PAGE_SIZE)
+                try:
+                    items, next_cursor = await cls_.apage(limit, cursor=cursor, order=order, filters=filters,
+                                                          fields=field_list, raw=raw)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                if next_cursor:
+                    next_url = request.url.include_query_params(limit=limit, cursor=next_cursor)
+                    headers['Link'] = f'<{next_url}>; rel="next"'
+                    headers['X-Next-Cursor'] = next_cursor
+                return Response(content=b''.join(iter_json(items, encode=encode)), media_type=JSON, headers=headers)
+
+            # Bulk routes are registered before `/{id}` so `_bulk` is not captured as an id
+            @router.post(f"{endpoint_base}/_bulk", tags=[model_title], status_code=201)
+            async def create_instances(data: List[model_class], cls_=model_class) -> List[model_class]:
+                try:
+                    return json_response(serializer, await cls_.acreate_many(data), status_code=201)
+                except StorageBusy:
+                    raise
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+
+            @router.put(f"{endpoint_base}/_bulk", tags=[model_title])
+            async def update_instances(data: List[Dict[str, Any]] = Body(...), cls_=model_class) -> Dict[str, Any]:
                 try:
-                    print(f"Creating instance of {model_name} with data: {data}")
-                    instance = model_class(**data.dict())
-                    instance = model_class.create(instance)
-                    return instance
+                    await cls_.aupdate_many(data)
+                    return json_response(serializer, {"message": "Updated successfully", "count": len(data)})
+                except StorageBusy:
+                    raise
                 except Exception as e:
-                    print(f"Error creating instance of {model_name}: {e}")
                     raise HTTPException(status_code=400, detail=str(e))
 
-            @router.get(endpoint_base, tags=[model_title])
-            async def get_all_instances(cls_=model_class) -> List[model_class]:
-                return cls_.list()
+            @router.delete(f"{endpoint_base}/_bulk", tags=[model_title])
+            async def delete_instances(ids: List[int] = Body(...), cls_=model_class) -> Dict[str, Any]:
+                await cls_.adelete_many(ids)
+                return json_response(serializer, {"message": "Deleted successfully", "count": len(ids)})
+
+            @router.get(f"{endpoint_base}/_changes", tags=[model_title],
+                        responses={200: {"content": {SSE: {}}, "description": "Server-Sent Events"}})
+            async def get_changes(request: Request, since: Optional[str] = None, cls_=model_class):
+                # Pushed as Server-Sent Events, resumed from `since` or the Last-Event-ID header
+                try:
+                    position = change_position(since, request.headers.get('last-event-id'))
+                    conditions = change_conditions(cls_, request.query_params)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                if position is None:
+                    position = change_feed.seq
+                changes = change_feed.asubscribe(cls_.__tablename__, since=position, conditions=conditions,
+                                                 timeout=config.CHANGE_FEED_KEEPALIVE)
+                return StreamingResponse(asse_stream(serializer, changes, position, config.CHANGE_FEED_MAX_STREAM),
+                                         media_type=SSE, headers=SSE_HEADERS)
+
+            @router.websocket(f"{endpoint_base}/_changes")
+            async def watch_changes(websocket: WebSocket, cls_=model_class):
+                try:
+                    position = change_position(websocket.query_params.get('since'))
+                    conditions = change_conditions(cls_, websocket.query_params)
+                except ValueError as e:
+                    await websocket.close(code=1008, reason=str(e))
+                    return
+                await websocket.accept()
+
+                async def send_changes():
+                    async for change in change_feed.asubscribe(cls_.__tablename__, since=position,
+                                                               conditions=conditions,
+                                                               timeout=config.CHANGE_FEED_KEEPALIVE):
+                        if change is not None:
+                            await websocket.send_text(encode_change(serializer, change).decode())
+
+                async def until_disconnect():
+                    # Messages from the client are ignored
+                    while (await websocket.receive())['type'] != 'websocket.disconnect':
+                        pass
+
+                tasks = {asyncio.ensure_future(send_changes()), asyncio.ensure_future(until_disconnect())}
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in pending:
+                    task.cancel()
+                try:
+                    for task in done:
+                        task.result()
+                except WebSocketDisconnect:
+                    pass
 
             @router.get(f"{endpoint_base}/schema", tags=[model_title])
-            async def get_schema(cls_=model_class) -> Dict[str, Any]:
-                return cls_.schema()
+            async def get_schema(request: Request, cls_=model_class) -> Dict[str, Any]:
+                return schema_response(request, schema_registry.schema(cls_))
 
-            @router.get(f"{endpoint_base}/{{id}}", tags=[model_title])
-            async def get_instance(id: int, cls_=model_class) -> model_class:
-                instance = cls_.get(id)
+            @router.get(f"{endpoint_base}/{{id:int}}", tags=[model_title], responses={304: {"description": "Not modified"}})
+            async def get_instance(id: int, request: Request, fields: Optional[str] = None,
+                                   cls_=model_class) -> model_class:
+                version = instance_version(cls_, id)
+                headers = validator_headers(version)
+                if is_not_modified(version, request.headers.get('if-none-match'),
+                                   request.headers.get('if-modified-since')):
+                    return Response(status_code=304, headers=headers)
+                field_list = split_fields(fields)
+                try:
+                    instance = await cls_.aget(id, fields=field_list, raw=cls_.__trusted__)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
                 if not instance:
                     raise HTTPException(status_code=404, detail="Not found")
-                return instance.model_dump()
+                # Returning the body directly skips response_model validation, which a
+                # partial instance would fail and a stored row does not need
+                return Response(content=fields_encoder(field_list, serializer)(instance), media_type=JSON,
+                                headers=headers)
 
-            @router.put(f"{endpoint_base}/{{id}}", tags=[model_title])
+            @router.put(f"{endpoint_base}/{{id:int}}", tags=[model_title])
             async def update_instance(id: int, data: model_class, cls_=model_class) -> model_class:
                 try:
-                    cls_.update(id, data)
-                    return model_class
+                    await cls_.aupdate(id, data)
+                    stored = await cls_.aget(id, raw=True)
+                except StorageBusy:
+                    raise
                 except Exception as e:
                     raise HTTPException(status_code=400, detail=str(e))
+                if stored is None:
+                    raise HTTPException(status_code=404, detail="Not found")
+                return json_response(serializer, stored)
 
-            @router.delete(f"{endpoint_base}/{{id}}", tags=[model_title])
-            async def delete_instance(id: int) -> Dict[str, str]:
-                model_class.delete(id)
-                return {"message": "Deleted successfully"}
+            @router.delete(f"{endpoint_base}/{{id:int}}", tags=[model_title])
+            async def delete_instance(id: int, cls_=model_class) -> Dict[str, str]:
+                await cls_.adelete(id)
+                return json_response(serializer, {"message": "Deleted successfully"})
 
          # Handle @expose_route endpoints
         for attr_name in dir(model_class):
@@ -107,9 +379,11 @@ def register_routes():
                         return_type = List[model_class]
 
 
+                # Exposed handlers are synchronous (they query the storage directly):
+                # plain functions, so that FastAPI runs them in its threadpool
                 if 'GET' in methods:
-                    async def custom_get(attr=attr) -> return_type:
-                        return attr()
+                    def custom_get(attr=attr) -> return_type:
+                        return handler_response(serializer, attr())
                     custom_get.__name__ = attr.__name__
                     router.add_api_route(
                         full_route,
@@ -120,8 +394,8 @@ def register_routes():
                     )
 
                 if 'POST' in methods:
-                    async def custom_post(data: Dict[str, Any] = Body(...), attr=attr) -> return_type:
-                        return attr(data)
+                    def custom_post(data: Dict[str, Any] = Body(...), attr=attr) -> return_type:
+                        return handler_response(serializer, attr(data))
                     custom_post.__name__ = attr.__name__
                     router.add_api_route(
                         full_route,
@@ -1,24 +1,150 @@
 # app/api/routes.py
+import logging
 import requests
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, stream_with_context, url_for
 from flasgger import swag_from
 from functools import wraps
 import yaml
+from werkzeug.test import EnvironBuilder
 
+import config
+from api.batch import (Operation, OperationResult, encode_results, error_result, model_storages,
+                       operation_headers, parse_operations, result_headers, run_atomic)
+from api.changes import SSE, SSE_HEADERS, change_conditions, change_position, sse_stream
+from api.conditional import instance_version, is_not_modified, list_version, validator_headers
+from api.serializers import Serializer, default_serializer
+from api.streaming import JSON, NDJSON, fields_encoder, iter_json, split_fields, wants_ndjson
 from models.storable_mixin import StorableMixin
+from storage.abstract_storage import StorageBusy
+from storage.change_feed import change_feed
+from storage.filters import filters_from_query
+from utils.schema_registry import CompiledSchema, schema_registry
 
+logger = logging.getLogger(__name__)
 
-def create_api_blueprint(registered_models):
+
+def schema_response(compiled: CompiledSchema) -> Response:
+    """
+    Serves a pre-serialized schema document, or 304 when the client has it already.
+    """
+    headers = validator_headers(compiled.version)
+    if is_not_modified(compiled.version, request.headers.get('If-None-Match'),
+                       request.headers.get('If-Modified-Since')):
+        return Response(status=304, headers=headers)
+    return Response(compiled.body, status=200, headers=headers, mimetype=JSON)
+
+
+def dispatch_operation(operation: Operation) -> OperationResult:
+    """
+    Runs one operation of a batch through the application, in process: a new
+    request context dispatched like a WSGI request, its response read in memory.
+    """
+    app = current_app._get_current_object()
+    builder = EnvironBuilder(
+        path=operation.path,
+        base_url=request.url_root,
+        query_string=operation.query,
+        method=operation.method,
+        headers=operation_headers(request.headers.items(), operation),
+        data=operation.body,
+        environ_base={'REMOTE_ADDR': request.remote_addr},
+    )
+    try:
+        with app.request_context(builder.get_environ()):
+            response = app.full_dispatch_request()
+            body = response.get_data()
+    except Exception:
+        logger.exception("Error in batch operation %s %s", operation.method, operation.path)
+        return error_result(500, "Internal Server Error")
+    finally:
+        builder.close()
+    return OperationResult(response.status_code, result_headers(response.headers.items()), body,
+                           response.content_type)
+
+
+def create_api_blueprint(registered_models, serializer: Serializer = None):
     """
     Creates a Flask blueprint with routes for all registered models.
 
     Args:
         registered_models (dict): A dictionary of registered models.
+        serializer (Serializer): Serializer of the response bodies, the fastest available by default.
 
     Returns:
         Blueprint: A Flask blueprint with all routes.
     """
     api_bp = Blueprint('api', __name__)
+    serializer = serializer or default_serializer()
+
+    def respond(value, status=200, headers=None):
+        return Response(serializer.dumps(value), status=status, headers=headers, mimetype=JSON)
+
+    @api_bp.route('/blueprint', methods=['GET'])
+    @swag_from({
+        'tags': ['schema'],
+        'responses': {
+            200: {
+                'description': 'The schemas of all registered models, by name'
+            }
+        }
+    })
+    def get_blueprint():
+        return schema_response(schema_registry.blueprint())
+
+    @api_bp.route('/batch', methods=['POST'])
+    @swag_from({
+        'tags': ['batch'],
+        'parameters': [
+            {
+                'in': 'body',
+                'name': 'body',
+                'required': True,
+                'schema': {
+                    'type': 'array',
+                    'maxItems': config.BATCH_MAX_OPERATIONS,
+                    'items': {
+                        'type': 'object',
+                        'required': ['path'],
+                        'properties': {
+                            'method': {'type': 'string', 'enum': ['GET', 'POST', 'PUT', 'DELETE']},
+                            'path': {'type': 'string', 'example': '/product/1'},
+                            'headers': {'type': 'object'},
+                            'body': {}
+                        }
+                    }
+                }
+            },
+            {
+                'name': 'transaction',
+                'in': 'query',
+                'required': False,
+                'type': 'boolean',
+                'description': 'Run the operations in one storage transaction, rolled back by the first failure'
+            }
+        ],
+        'responses': {
+            200: {
+                'description': 'The result of each operation ({status, headers, body}), in order'
+            },
+            400: {
+                'description': 'Invalid batch, or transaction not supported by a storage'
+            }
+        }
+    })
+    def batch():
+        try:
+            operations = parse_operations(request.get_json(silent=True), config.BATCH_MAX_OPERATIONS)
+        except ValueError as e:
+            return respond({'error': str(e)}, 400)
+        if request.args.get('transaction', 'false').lower() not in ('1', 'true', 'yes'):
+            results = [dispatch_operation(operation) for operation in operations]
+        else:
+            try:
+                results = run_atomic(model_storages(operations, registered_models), operations,
+                                     dispatch_operation)
+            except NotImplementedError as e:
+                return respond({'error': str(e)}, 400)
+        return Response(encode_results(results), status=200, mimetype=JSON)
 
     for model_name, model_class in registered_models.items():
         # Endpoint base path
@@ -34,13 +160,13 @@ def create_api_blueprint(registered_models):
                         'in': 'body',
                         'name': 'body',
                         'required': True,
-                        'schema': model_class.model_json_schema()
+                        'schema': schema_registry.json_schema(model_class)
                     }
                 ],
                 'responses': {
                     201: {
                         'description': 'Created',
-                        'schema': model_class.model_json_schema()
+                        'schema': schema_registry.json_schema(model_class)
                     },
                     400: {
                         'description': 'Invalid input'
@@ -50,11 +176,13 @@ def create_api_blueprint(registered_models):
             def create():
                 data = request.json
                 try:
-                    instance = model_class(**data)
-                    instance = model_class.create(instance)
-                    return jsonify(instance.model_dump()), 201
+                    # Validated once, into the dict that is stored
+                    instance = model_class.create(data)
+                    return respond(instance, 201)
+                except StorageBusy:
+                    raise
                 except Exception as e:
-                    return jsonify({'error': str(e)}), 400
+                    return respond({'error': str(e)}, 400)
             return create
 
         if is_storable:
@@ -70,20 +198,126 @@ def create_api_blueprint(registered_models):
         def list_generator(model_class):
             @swag_from({
                 'tags': [model_name],
+                'parameters': [
+                    {
+                        'name': 'ids',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'string',
+                        'description': 'Comma separated ids to fetch in a single query'
+                    },
+                    {
+                        'name': 'limit',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'integer',
+                        'description': f'Page size (default {config.DEFAULT_PAGE_SIZE}, max {config.MAX_PAGE_SIZE})'
+                    },
+                    {
+                        'name': 'cursor',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'string',
+                        'description': 'Opaque cursor of the next page, from the X-Next-Cursor or Link header'
+                    },
+                    {
+                        'name': 'order',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'string',
+                        'enum': ['asc', 'desc']
+                    },
+                    {
+                        'name': '<field>[__<op>]',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'string',
+                        'description': 'Filter on a field, op is one of eq, ne, lt, lte, gt, gte, in, like '
+                                       '(e.g. email=a@b.c, price__gte=10, id__in=1,2,3)'
+                    },
+                    {
+                        'name': 'stream',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'boolean',
+                        'description': 'Stream all matching rows as a chunked JSON array instead of one page. '
+                                       'Sending Accept: application/x-ndjson streams NDJSON.'
+                    },
+                    {
+                        'name': 'fields',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'string',
+                        'description': 'Comma separated fields to return (id is always included)'
+                    }
+                ],
                 'responses': {
                     200: {
                         'description': f'A list of {model_name}',
                         'schema': {
                             'type': 'array',
-                            'items': model_class.model_json_schema()
+                            'items': schema_registry.json_schema(model_class)
                         }
+                    },
+                    304: {
+                        'description': 'Not modified (If-None-Match or If-Modified-Since matched)'
                     }
                 }
             })
             def get_all_instances():
-                instances = model_class.list()
-                jsonables = [instance.model_dump() for instance in instances]
-                return jsonables, 200
+                # Validated against the table version, before any row is read
+                version = list_version(model_class)
+                # The JSON array and the NDJSON stream share the table version
+                headers = validator_headers(version, vary='Accept')
+                if is_not_modified(version, request.headers.get('If-None-Match'),
+                                   request.headers.get('If-Modified-Since')):
+                    return Response(status=304, headers=headers)
+                # Sparse fieldset: only these columns are read and serialized
+                fields = split_fields(request.args.get('fields'))
+                encode = fields_encoder(fields, serializer)
+                # Trusted rows are serialized straight from storage, without building models
+                raw = model_class.__trusted__
+                ids = request.args.get('ids')
+                if ids:
+                    try:
+                        id_list = [int(id_) for id_ in ids.split(',') if id_]
+                    except ValueError:
+                        return respond({'error': 'ids must be a comma separated list of integers'}, 400)
+                    try:
+                        instances = model_class.get_many(id_list, fields=fields, raw=raw)
+                    except ValueError as e:
+                        return respond({'error': str(e)}, 400)
+                    return Response(b''.join(iter_json(instances, encode=encode)), status=200, headers=headers,
+                                    mimetype=JSON)
+
+                cursor = request.args.get('cursor')
+                order = request.args.get('order', 'asc')
+                # Query params naming a field (`email=...`, `price__gte=10`) are pushed down as filters
+                filters = filters_from_query(model_class, request.args)
+
+                ndjson = wants_ndjson(request.headers.get('Accept'))
+                if ndjson or request.args.get('stream', 'false').lower() in ('1', 'true'):
+                    # The whole result is streamed row by row from a storage cursor: memory
+                    # stays flat whatever the table size, so no page size applies
+                    try:
+                        rows = model_class.stream(cursor=cursor, order=order, filters=filters, fields=fields, raw=raw)
+                    except ValueError as e:
+                        return respond({'error': str(e)}, 400)
+                    return Response(stream_with_context(iter_json(rows, ndjson=ndjson, encode=encode)),
+                                    headers=headers, mimetype=NDJSON if ndjson else JSON)
+
+                limit = request.args.get('limit', config.DEFAULT_PAGE_SIZE, type=int)
+                limit = max(1, min(limit, config.MAX_PAGE_SIZE))
+                try:
+                    instances, next_cursor = model_class.page(limit, cursor=cursor, order=order, filters=filters,
+                                                              fields=fields, raw=raw)
+                except ValueError as e:
+                    return respond({'error': str(e)}, 400)
+                if next_cursor:
+                    args = {**request.args.to_dict(), 'limit': limit, 'cursor': next_cursor}
+                    headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+                    headers['X-Next-Cursor'] = next_cursor
+                return Response(b''.join(iter_json(instances, encode=encode)), status=200, headers=headers, mimetype=JSON)
             return get_all_instances
 
         get_all_instances_view = list_generator(model_class)
@@ -94,6 +328,124 @@ def create_api_blueprint(registered_models):
             endpoint=f'{model_name}_get_all'
         )
 
+        # Bulk create, update and delete
+        def bulk_generator(model_class):
+            @swag_from({
+                'tags': [model_name],
+                'parameters': [
+                    {
+                        'in': 'body',
+                        'name': 'body',
+                        'required': True,
+                        'description': 'POST: list of objects to create. PUT: list of partial objects with their id. '
+                                       'DELETE: list of ids.',
+                        'schema': {
+                            'type': 'array',
+                            'items': schema_registry.json_schema(model_class)
+                        }
+                    }
+                ],
+                'responses': {
+                    200: {
+                        'description': 'Updated or deleted successfully'
+                    },
+                    201: {
+                        'description': 'Created',
+                        'schema': {
+                            'type': 'array',
+                            'items': schema_registry.json_schema(model_class)
+                        }
+                    },
+                    400: {
+                        'description': 'Invalid input'
+                    }
+                }
+            })
+            def bulk_instances():
+                data = request.json
+                if not isinstance(data, list):
+                    return respond({'error': 'Expected a JSON array'}, 400)
+                try:
+                    if request.method == 'POST':
+                        instances = model_class.create_many(data)
+                        return respond(instances, 201)
+                    elif request.method == 'PUT':
+                        model_class.update_many(data)
+                        return respond({'message': 'Updated successfully', 'count': len(data)}, 200)
+                    else:
+                        model_class.delete_many([int(id_) for id_ in data])
+                        return respond({'message': 'Deleted successfully', 'count': len(data)}, 200)
+                except StorageBusy:
+                    raise
+                except Exception as e:
+                    return respond({'error': str(e)}, 400)
+            return bulk_instances
+
+        if is_storable:
+            bulk_instances_view = bulk_generator(model_class)
+            api_bp.add_url_rule(
+                f'{endpoint_base}/_bulk',
+                view_func=bulk_instances_view,
+                methods=['POST', 'PUT', 'DELETE'],
+                endpoint=f'{model_name}_bulk'
+            )
+
+        # Change feed, as Server-Sent Events
+        def changes_generator(model_class):
+            @swag_from({
+                'tags': [model_name],
+                'produces': [SSE],
+                'parameters': [
+                    {
+                        'name': 'since',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'integer',
+                        'description': 'Resume after this change sequence number (default: the Last-Event-ID '
+                                       'header, else only changes from now on)'
+                    },
+                    {
+                        'name': '<field>[__<op>]',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'string',
+                        'description': 'Filter the changes on a field, as for the list route'
+                    }
+                ],
+                'responses': {
+                    200: {
+                        'description': f'Stream of the changes (create, update, delete) of {model_name}, '
+                                       'a reset event when the position is no longer buffered'
+                    },
+                    400: {
+                        'description': 'Invalid position or filter'
+                    }
+                }
+            })
+            def get_changes():
+                try:
+                    position = change_position(request.args.get('since'), request.headers.get('Last-Event-ID'))
+                    conditions = change_conditions(model_class, request.args)
+                except ValueError as e:
+                    return respond({'error': str(e)}, 400)
+                if position is None:
+                    position = change_feed.seq
+                changes = change_feed.subscribe(model_class.__tablename__, since=position, conditions=conditions,
+                                                timeout=config.CHANGE_FEED_KEEPALIVE)
+                # Holds the worker thread while streaming: at most CHANGE_FEED_MAX_STREAM
+                # seconds, then the client reconnects with Last-Event-ID
+                return Response(sse_stream(serializer, changes, position, config.CHANGE_FEED_MAX_STREAM),
+                                mimetype=SSE, headers=SSE_HEADERS)
+            return get_changes
+
+        if is_storable:
+            api_bp.add_url_rule(
+                f'{endpoint_base}/_changes',
+                view_func=changes_generator(model_class),
+                methods=['GET'],
+                endpoint=f'{model_name}_changes'
+            )
+
         # Get instance by ID
         def get_generator(model_class):
             @swag_from({
@@ -104,12 +456,22 @@ def create_api_blueprint(registered_models):
                         'in': 'path',
                         'required': True,
                         'type': 'integer'
+                    },
+                    {
+                        'name': 'fields',
+                        'in': 'query',
+                        'required': False,
+                        'type': 'string',
+                        'description': 'Comma separated fields to return (id is always included)'
                     }
                 ],
                 'responses': {
                     200: {
                         'description': f'A {model_name} object',
-                        'schema': model_class.model_json_schema()
+                        'schema': schema_registry.json_schema(model_class)
+                    },
+                    304: {
+                        'description': 'Not modified (If-None-Match or If-Modified-Since matched)'
                     },
                     404: {
                         'description': 'Not found'
@@ -117,11 +479,22 @@ def create_api_blueprint(registered_models):
                 }
             })
             def get_instance_by_id(id):
-                instance = model_class.get(id)
-                if instance:
-                    return jsonify(instance.model_dump()), 200
+                version = instance_version(model_class, id)
+                headers = validator_headers(version)
+                if is_not_modified(version, request.headers.get('If-None-Match'),
+                                   request.headers.get('If-Modified-Since')):
+                    return Response(status=304, headers=headers)
+                fields = split_fields(request.args.get('fields'))
+                try:
+                    instance = model_class.get(id, fields=fields, raw=model_class.__trusted__)
+                except ValueError as e:
+                    return respond({'error': str(e)}, 400)
+                if instance and (fields or model_class.__trusted__):
+                    return Response(fields_encoder(fields, serializer)(instance), status=200, headers=headers, mimetype=JSON)
+                elif instance:
+                    return respond(instance, 200, headers)
                 else:
-                    return jsonify({'error': 'Not found'}), 404
+                    return respond({'error': 'Not found'}, 404)
             return get_instance_by_id
 
         if hasattr(model_class, 'get'):
@@ -148,7 +521,7 @@ def create_api_blueprint(registered_models):
                         'in': 'body',
                         'name': 'body',
                         'required': True,
-                        'schema': model_class.model_json_schema()
+                        'schema': schema_registry.json_schema(model_class)
                     }
                 ],
                 'responses': {
@@ -163,11 +536,12 @@ def create_api_blueprint(registered_models):
             def update_instance(id):
                 data = request.json
                 try:
-                    instance = model_class(**data)
-                    model_class.update(id, instance)
-                    return jsonify({'message': 'Updated successfully'}), 200
+                    model_class.update(id, data)
+                    return respond({'message': 'Updated successfully'}, 200)
+                except StorageBusy:
+                    raise
                 except Exception as e:
-                    return jsonify({'error': str(e)}), 400
+                    return respond({'error': str(e)}, 400)
             return update_instance
 
         if hasattr(model_class, 'update'):
@@ -199,7 +573,7 @@ def create_api_blueprint(registered_models):
             })
             def delete_instance(id):
                 model_class.delete(id)
-                return jsonify({'message': 'Deleted successfully'}), 200
+                return respond({'message': 'Deleted successfully'}, 200)
             return delete_instance
 
         if hasattr(model_class, 'delete'):
@@ -211,6 +585,28 @@ def create_api_blueprint(registered_models):
                 endpoint=f'{model_name}_delete'
             )
 
+        # Model schema, served pre-serialized. Registered before the model's own
+        # `/schema` endpoint (ProtoModel.schema), which it shadows
+        def schema_generator(model_class):
+            @swag_from({
+                'tags': [model_name],
+                'responses': {
+                    200: {
+                        'description': f'The JSON schema of {model_name}'
+                    }
+                }
+            })
+            def get_schema():
+                return schema_response(schema_registry.schema(model_class))
+            return get_schema
+
+        api_bp.add_url_rule(
+            f'{endpoint_base}/schema',
+            view_func=schema_generator(model_class),
+            methods=['GET'],
+            endpoint=f'{model_name}_get_schema'
+        )
+
         # Register additional endpoints defined in the model
         for attr_name in dir(model_class):
             attr = getattr(model_class, attr_name)
@@ -229,7 +625,10 @@ def create_api_blueprint(registered_models):
                             output = func(data)
                         else:
                             output = func()
-                        return output
+                        # Responses built by the handler (e.g. `jsonify(...), 401`) are returned as is
+                        if isinstance(output, (Response, tuple)):
+                            return output
+                        return respond(output)
                     # Attach the docstring for Swagger
                     endpoint_function.__doc__ = func.__doc__
                     return endpoint_function
@@ -0,0 +1,64 @@
+# app/api/serializers.py
+
+import json
+from typing import Any, Iterable
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib serializer is used instead
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    # Values the JSON libraries do not know: nested models, then anything else as a string
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(mode='json')
+    return str(value)
+
+
+class Serializer:
+    """
+    Serializes response bodies straight to bytes. Models are dumped by
+    pydantic-core (`model_dump_json`), without building intermediate dicts;
+    other values (raw rows, messages) with the stdlib `json` module.
+    """
+    name = 'json'
+
+    def dumps_value(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(',', ':'), default=_default).encode()
+
+    def encode_item(self, item: Any) -> bytes:
+        """
+        Serializes one row: a model instance or a plain JSON value.
+        """
+        if hasattr(item, 'model_dump_json'):
+            return item.model_dump_json().encode()
+        return self.dumps_value(item)
+
+    def encode_items(self, items: Iterable[Any]) -> bytes:
+        return b'[' + b','.join(self.encode_item(item) for item in items) + b']'
+
+    def dumps(self, value: Any) -> bytes:
+        """
+        Serializes a response body: a model, a list of models or rows, or any JSON value.
+        """
+        if isinstance(value, (list, tuple)):
+            return self.encode_items(value)
+        return self.encode_item(value)
+
+
+class OrjsonSerializer(Serializer):
+    """
+    Serializer using orjson for the values that are not models.
+    """
+    name = 'orjson'
+
+    def dumps_value(self, value: Any) -> bytes:
+        return orjson.dumps(value, default=_default)
+
+
+def default_serializer() -> Serializer:
+    """
+    Returns the fastest serializer available: orjson if installed, else the stdlib one.
+    """
+    return OrjsonSerializer() if orjson is not None else Serializer()
@@ -0,0 +1,98 @@
+# app/api/streaming.py
+
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Sequence
+
+from api.serializers import default_serializer
+
+JSON = 'application/json'
+NDJSON = 'application/x-ndjson'
+
+# Rows are buffered into chunks of about this size before being written out
+CHUNK_SIZE = 64 * 1024
+
+
+def fields_encoder(fields: Optional[Sequence[str]], serializer: Any = None) -> Callable[[Any], bytes]:
+    """
+    Returns the row serializer of a sparse fieldset: partial models are dumped
+    with only the requested fields (and id). Raw rows only hold those already.
+    Rows are encoded by `serializer`, or the default one (see api.serializers).
+    """
+    encode_row = (serializer or default_serializer()).encode_item
+    if not fields:
+        return encode_row
+    include = {'id', *fields}
+
+    def encode(item: Any) -> bytes:
+        if isinstance(item, dict):
+            return encode_row(item)
+        return item.model_dump_json(include=include).encode()
+    return encode
+
+
+def split_fields(value: Optional[str]) -> Optional[List[str]]:
+    """
+    Parses a `fields=a,b,c` query value.
+    """
+    return [field for field in value.split(',') if field] if value else None
+
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    return bool(accept) and NDJSON in accept
+
+
+class _Framing:
+    """
+    Byte framing of a stream of rows: a JSON array, or newline delimited JSON.
+    """
+
+    def __init__(self, ndjson: bool):
+        self.open, self.separator, self.close = (b'', b'', b'') if ndjson else (b'[', b',', b']')
+        self.terminator = b'\n' if ndjson else b''
+
+
+def iter_json(items: Iterable[Any], ndjson: bool = False,
+              encode: Callable[[Any], bytes] = None) -> Iterator[bytes]:
+    """
+    Serializes rows one by one into chunks of a JSON array (or NDJSON), so the whole
+    result never has to be held in memory. Rows are encoded by `encode`, by default
+    the `encode_item` of the default serializer.
+    """
+    encode = encode or default_serializer().encode_item
+    framing = _Framing(ndjson)
+    buffer = bytearray(framing.open)
+    first = True
+    for item in items:
+        if not first:
+            buffer += framing.separator
+        first = False
+        buffer += encode(item)
+        buffer += framing.terminator
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += framing.close
+    if buffer:
+        yield bytes(buffer)
+
+
+async def aiter_json(items: AsyncIterable[Any], ndjson: bool = False,
+                     encode: Callable[[Any], bytes] = None) -> AsyncIterator[bytes]:
+    """
+    Async counterpart of `iter_json`.
+    """
+    encode = encode or default_serializer().encode_item
+    framing = _Framing(ndjson)
+    buffer = bytearray(framing.open)
+    first = True
+    async for item in items:
+        if not first:
+            buffer += framing.separator
+        first = False
+        buffer += encode(item)
+        buffer += framing.terminator
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += framing.close
+    if buffer:
+        yield bytes(buffer)
@@ -0,0 +1,453 @@
+# app/benchmarks/http_load.py
+"""
+Drives the generated CRUD routes and the @expose_route endpoints of each backend
+(FastAPI, and Flask through WsgiToAsgi as served by `get_app`) over each storage,
+with a mixed read/write profile at a given concurrency, and reports throughput,
+p50/p95/p99 latency and error rates per backend and storage, and per operation.
+Throughput and latency count successful requests only, failures are reported apart.
+
+    python benchmarks/http_load.py [--backends fastapi,flask] [--storages sqlite,memory]
+        [--mode inprocess|localhost] [--concurrency 16] [--requests 2000]
+        [--mix get=45,list=15,create=10,update=10,delete=5,login=10,product_list=5]
+        [--rows 1000] [--output results.json]
+
+`inprocess` calls the ASGI app directly (no sockets, no HTTP parsing), from the
+load generator's process, so its own overhead is part of the latency; `localhost`
+serves it with uvicorn from another process, on a free local port. Each backend
+and storage runs over a new database seeded with `--rows` users and products.
+The app is built as in main.py (same SQLite options and Product cache).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+DEFAULT_MIX = 'get=45,list=15,create=10,update=10,delete=5,login=10,product_list=5'
+DEFAULT_SEED = 42
+LIST_PAGE_SIZE = 20
+MODEL_TABLES = ('users', 'products')
+
+
+def _sqlite(directory: str) -> Any:
+    from storage.async_storage import AsyncSQLiteStorage
+    return AsyncSQLiteStorage(os.path.join(directory, 'bench.db'), pragmas=config.SQLITE_PRAGMAS,
+                              max_readers=config.SQLITE_MAX_READERS, max_workers=config.SQLITE_ASYNC_WORKERS,
+                              group_commit=config.SQLITE_GROUP_COMMIT, durability=config.SQLITE_DURABILITY,
+                              commit_batch=config.SQLITE_COMMIT_BATCH, commit_window=config.SQLITE_COMMIT_WINDOW,
+                              timeout=config.SQLITE_TIMEOUT)
+
+
+def _memory(directory: str) -> Any:
+    from storage.memory_storage import MemoryStorage
+    return MemoryStorage()
+
+
+def _json_log(directory: str) -> Any:
+    from storage.json_log_storage import JSONLogStorage
+    return JSONLogStorage(directory)
+
+
+def _kv(directory: str) -> Any:
+    from storage.kv_storage import KVStorage
+    return KVStorage(directory)
+
+
+# Storages by name, each built in its own directory
+STORAGES: Dict[str, Callable[[str], Any]] = {
+    'sqlite': _sqlite,
+    'memory': _memory,
+    'json-log': _json_log,
+    'kv': _kv,
+}
+BACKENDS = ('fastapi', 'flask')
+
+
+def build_backend(backend: str, storage: Any) -> Any:
+    """
+    Registers the models over `storage` and builds the backend, as main.py does.
+    """
+    from api.backend import FastAPIBackend, FlaskBackend
+    from models.product_model import Product
+    from models.user_model import User
+    from utils.registrar import register_model, registered_models
+
+    register_model(Product, storage=storage, cache=config.PRODUCT_CACHE)
+    register_model(User, storage=storage)
+    backend_class = FastAPIBackend if backend == 'fastapi' else FlaskBackend
+    instance = backend_class(name='bench', version=config.VERSION, description='bench')
+    instance.register_routes(registered_models)
+    return instance
+
+
+def user_record(rng: random.Random, i: int) -> Dict[str, Any]:
+    return {'name': f'user {i}', 'email': f'user{i}@example.com', 'age': rng.randint(18, 90)}
+
+
+def product_record(rng: random.Random, i: int) -> Dict[str, Any]:
+    return {'name': f'product {i}', 'price': round(rng.uniform(1, 500), 2), 'description': f'description {i}'}
+
+
+RECORDS = {'users': user_record, 'products': product_record}
+
+
+def seed(rows: int, rng: random.Random) -> Dict[str, List[int]]:
+    """
+    Creates `rows` users and products through the models, returns their ids by table.
+    """
+    from models.product_model import Product
+    from models.user_model import User
+    from storage.records import record_id
+
+    ids = {}
+    for table, model_class in (('users', User), ('products', Product)):
+        instances = model_class.create_many([RECORDS[table](rng, i) for i in range(rows)])
+        ids[table] = [record_id(instance) for instance in instances]
+    return ids
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in OPERATIONS:
+            raise ValueError(f"unknown operation '{name.strip()}', expected one of {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Workload:
+    """
+    Picks the requests of the mixed profile. Reads and updates address the
+    seeded rows, which are never deleted, so they do not fail on a row deleted
+    concurrently; deletes address the rows created during the run.
+    """
+
+    def __init__(self, ids: Dict[str, List[int]], rows: int, mix: Dict[str, float], rng: random.Random):
+        self.ids = ids
+        self.created: Dict[str, List[int]] = {table: [] for table in MODEL_TABLES}
+        self.rows = rows
+        self.counter = rows
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.rng = rng
+
+    def next(self) -> Tuple[str, str, str, Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Returns the next request: operation, method, path, JSON body, and the table
+        whose created ids its response adds to (None when it creates nothing).
+        """
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        table = self.rng.choice(MODEL_TABLES)
+        if operation == 'delete' and not self.created[table]:
+            operation = 'create'
+        return (operation,) + OPERATIONS[operation](self, table)
+
+    def record(self, table: str) -> Dict[str, Any]:
+        self.counter += 1
+        return RECORDS[table](self.rng, self.counter)
+
+
+def _get(w: Workload, table: str):
+    return 'GET', f'/{table}/{w.rng.choice(w.ids[table])}', None, None
+
+
+def _list(w: Workload, table: str):
+    return 'GET', f'/{table}?limit={LIST_PAGE_SIZE}&after={w.rng.choice(w.ids[table])}', None, None
+
+
+def _create(w: Workload, table: str):
+    return 'POST', f'/{table}', w.record(table), table
+
+
+def _update(w: Workload, table: str):
+    # The PUT routes validate the whole record; the seeded row keeps its email, for logins
+    index = w.rng.randrange(w.rows)
+    return 'PUT', f'/{table}/{w.ids[table][index]}', RECORDS[table](w.rng, index), None
+
+
+def _delete(w: Workload, table: str):
+    # Taken out before the request is sent, so that no other request deletes it too
+    created = w.created[table]
+    return 'DELETE', f'/{table}/{created.pop(w.rng.randrange(len(created)))}', None, None
+
+
+def _login(w: Workload, table: str):
+    return 'POST', '/users/login', {'email': f'user{w.rng.randrange(w.rows)}@example.com'}, None
+
+
+def _product_list(w: Workload, table: str):
+    return 'GET', '/products/list', None, None
+
+
+# Operations of the profile; `login` and `product_list` are @expose_route endpoints
+OPERATIONS: Dict[str, Callable[[Workload, str], Tuple[str, str, Optional[Dict[str, Any]], Optional[str]]]] = {
+    'get': _get,
+    'list': _list,
+    'create': _create,
+    'update': _update,
+    'delete': _delete,
+    'login': _login,
+    'product_list': _product_list,
+}
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # Nearest rank
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def _failed(status: Any) -> bool:
+    return isinstance(status, str) or status >= 400
+
+
+def summarize(samples: List[Tuple[float, Any]], elapsed: float) -> Dict[str, Any]:
+    """
+    Summarizes (seconds, status) samples; the status of a request that got no
+    response is the name of the exception raised instead. Throughput and latency
+    are those of the successful requests: failures, often answered much faster,
+    would skew them. They are counted apart, in `errors` and `error_rate`.
+    """
+    latencies = sorted(seconds for seconds, status in samples if not _failed(status))
+    statuses: Dict[str, int] = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = len(samples) - len(latencies)
+    nan = float('nan')
+    return {
+        'requests': len(samples),
+        'rps': len(latencies) / elapsed if elapsed else float('inf'),
+        'p50_ms': percentile(latencies, 50) * 1000 if latencies else nan,
+        'p95_ms': percentile(latencies, 95) * 1000 if latencies else nan,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else nan,
+        'errors': errors,
+        'error_rate': errors / len(samples),
+        'statuses': statuses,
+    }
+
+
+async def drive(client: Any, workload: Workload, requests: int, concurrency: int,
+                samples: Optional[Dict[str, List[Tuple[float, Any]]]]):
+    """
+    Sends `requests` requests from `concurrency` concurrent clients, each sending
+    its next request as soon as the previous one is answered. Samples are
+    recorded per operation into `samples`, unless None (warm-up).
+    """
+    remaining = [requests]
+
+    async def client_loop():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            operation, method, path, body, created = workload.next()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = response.status_code
+            except Exception as e:
+                response, status = None, type(e).__name__
+            seconds = time.perf_counter() - start
+            if samples is not None:
+                samples.setdefault(operation, []).append((seconds, status))
+            if created is not None and status == 201:
+                workload.created[created].append(response.json()['id'])
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def app_over(backend: str, storage_name: str, rows: int, seed_value: int):
+    """
+    Yields the ASGI app of the backend over a new, seeded storage, and the seeded ids.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        instance = build_backend(backend, STORAGES[storage_name](directory))
+        try:
+            ids = seed(rows, random.Random(f'{seed_value}-data'))
+            yield instance.get_app(), ids
+        finally:
+            instance.shutdown()
+
+
+def _serve(backend: str, storage_name: str, rows: int, seed_value: int, port: int, conn: Any):
+    """
+    Server process of the localhost mode: sends the seeded ids, then serves until terminated.
+    """
+    import uvicorn
+    sys.stdout = open(os.devnull, 'w')
+    with app_over(backend, storage_name, rows, seed_value) as (app, ids):
+        conn.send(ids)
+        # No lifespan: the backend is shut down by `app_over`
+        uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, lifespan='off', log_level='critical',
+                                      access_log=False)).run()
+
+
+@contextlib.contextmanager
+def serve(backend: str, storage_name: str, args: argparse.Namespace):
+    """
+    Yields the seeded ids and an httpx.AsyncClient factory sending requests to the
+    app: in process through its ASGI interface, or over HTTP to a uvicorn server
+    run on localhost by another process.
+    """
+    import httpx
+
+    if args.mode == 'inprocess':
+        with app_over(backend, storage_name, args.rows, args.seed) as (app, ids):
+            # Application errors become 500 responses rather than exceptions
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            yield ids, lambda: httpx.AsyncClient(transport=transport, base_url='http://bench')
+        return
+
+    port = _free_port()
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.get_context('spawn').Process(
+        target=_serve, args=(backend, storage_name, args.rows, args.seed, port, sender), daemon=True
+    )
+    process.start()
+    try:
+        while not receiver.poll(0.1):
+            if not process.is_alive():
+                raise RuntimeError(f"the server process exited with status {process.exitcode}")
+        ids = receiver.recv()
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if not process.is_alive():
+                    raise RuntimeError(f"uvicorn failed to serve on port {port}")
+                time.sleep(0.05)
+        yield ids, lambda: httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=30.0,
+                                             limits=httpx.Limits(max_connections=None))
+    finally:
+        # uvicorn shuts down gracefully on SIGTERM
+        process.terminate()
+        process.join()
+
+
+def run(backend: str, storage_name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Serves the app over a new storage, seeds it and measures it under load.
+    """
+    samples: Dict[str, List[Tuple[float, Any]]] = {}
+
+    async def load(workload: Workload, new_client: Callable[[], Any]) -> float:
+        async with new_client() as client:
+            await drive(client, workload, args.warmup, args.concurrency, None)
+            start = time.perf_counter()
+            await drive(client, workload, args.requests, args.concurrency, samples)
+            return time.perf_counter() - start
+
+    with serve(backend, storage_name, args) as (ids, new_client):
+        workload = Workload(ids, args.rows, parse_mix(args.mix), random.Random(f'{args.seed}-load'))
+        elapsed = asyncio.run(load(workload, new_client))
+    # The req/s of an operation is its share of the total throughput (successful requests)
+    return {
+        'total': summarize([sample for values in samples.values() for sample in values], elapsed),
+        'operations': {operation: summarize(values, elapsed) for operation, values in sorted(samples.items())},
+    }
+
+
+def run_isolated(backend: str, storage_name: str, argv: List[str]) -> Dict[str, Any]:
+    """
+    Runs one backend and storage in a child process, so that runs do not share
+    the module-level state of the routes and models.
+    """
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), *argv, '--run', f'{backend}:{storage_name}'],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'failed')
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _print_row(label: str, result: Dict[str, Any]):
+    print(f"{label:<32}{result['requests']:>9}{result['rps']:>10.0f}{result['p50_ms']:>10.2f}"
+          f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['error_rate']:>8.1%}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--storages', default='sqlite,memory', help=f"any of {', '.join(STORAGES)}")
+    parser.add_argument('--mode', choices=('inprocess', 'localhost'), default='inprocess')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=2000, help='measured requests per backend and storage')
+    parser.add_argument('--warmup', type=int, default=200, help='requests sent before measuring')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='relative weights of the operations')
+    parser.add_argument('--rows', type=int, default=1000, help='users and products seeded')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--run', help=argparse.SUPPRESS)  # backend:storage, in a child process
+    args, argv = parser.parse_args(), sys.argv[1:]
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.run:
+        backend, _, storage_name = args.run.partition(':')
+        # The app's own prints (e.g. from @expose_route endpoints) stay out of the result line
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run(backend, storage_name, args)
+        print(json.dumps(result))
+        return 0
+
+    unknown = [name for name in _split(args.backends) if name not in BACKENDS]
+    unknown += [name for name in _split(args.storages) if name not in STORAGES]
+    if unknown:
+        parser.error(f"unknown backends or storages: {', '.join(unknown)}")
+
+    print(f"{args.mode}, {args.concurrency} concurrent clients, {args.requests} requests, mix {args.mix}")
+    print(f"{'backend/storage/operation':<32}{'requests':>9}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'errors':>8}")
+    results: Dict[str, Any] = {}
+    for backend in _split(args.backends):
+        for storage_name in _split(args.storages):
+            key = f'{backend}/{storage_name}'
+            try:
+                result = results[key] = run_isolated(backend, storage_name, argv)
+            except RuntimeError as e:
+                print(f"{key:<32}failed: {e}")
+                continue
+            _print_row(key, result['total'])
+            for operation, operation_result in result['operations'].items():
+                _print_row(f"  {operation}", operation_result)
+
+    if args.output:
+        report = {
+            'meta': {'mode': args.mode, 'concurrency': args.concurrency, 'requests': args.requests,
+                     'mix': args.mix, 'rows': args.rows, 'seed': args.seed, 'timestamp': time.time()},
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
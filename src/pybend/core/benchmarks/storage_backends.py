@@ -0,0 +1,242 @@
+# app/benchmarks/storage_backends.py
+"""
+Measures the throughput and latency percentiles of create/get/update/delete/list
+on every storage backend, over deterministic synthetic datasets of User, Product
+and Bot rows. Results are written as JSON; compared with a saved baseline, the
+run fails (exit status 1) when an operation regresses beyond the threshold.
+
+    python benchmarks/storage_backends.py [--rows 1000,100000] [--ops 1000]
+        [--backends sqlite,memory] [--models users,products,bots]
+        [--output results.json] [--baseline baseline.json] [--threshold 0.25]
+
+The bulk load of the dataset is reported as the `load` operation (rows/s).
+Some backends rewrite whole files on each write: keep them to small datasets.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple, Type
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.product_model import Product  # noqa: E402
+from models.user_model import Bot, User  # noqa: E402
+from storage.abstract_storage import AbstractStorage  # noqa: E402
+from storage.caching_storage import CachingStorage  # noqa: E402
+from storage.columnar_storage import ColumnarStorage  # noqa: E402
+from storage.json_log_storage import JSONLogStorage  # noqa: E402
+from storage.json_storage import JSONStorage  # noqa: E402
+from storage.kv_storage import KVStorage  # noqa: E402
+from storage.memory_storage import MemoryStorage  # noqa: E402
+from storage.records import record_id  # noqa: E402
+from storage.sqlite_storage import SQLiteStorage  # noqa: E402
+
+DEFAULT_SEED = 42
+# Relative slowdown (of throughput, or of p95 latency) tolerated against the baseline
+DEFAULT_THRESHOLD = 0.25
+LIST_PAGE_SIZE = 100
+
+# Storage backends by name, each built in its own directory
+BACKENDS: Dict[str, Callable[[str], AbstractStorage]] = {
+    'sqlite': lambda directory: SQLiteStorage(os.path.join(directory, 'bench.db')),
+    'sqlite-cached': lambda directory: CachingStorage(SQLiteStorage(os.path.join(directory, 'bench.db'))),
+    'memory': lambda directory: MemoryStorage(),
+    'json': lambda directory: JSONStorage(directory),
+    'json-log': lambda directory: JSONLogStorage(directory),
+    'columnar': lambda directory: ColumnarStorage(directory),
+    'kv': lambda directory: KVStorage(directory),
+}
+
+WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet')
+STATUSES = ('active', 'idle', 'paused', 'retired')
+
+
+def _word(rng: random.Random) -> str:
+    return rng.choice(WORDS)
+
+
+def user_record(rng: random.Random, i: int) -> Dict[str, Any]:
+    return {'name': f'{_word(rng)} {_word(rng)}', 'email': f'user{i}@example.com', 'age': rng.randint(18, 90)}
+
+
+def product_record(rng: random.Random, i: int) -> Dict[str, Any]:
+    return {'name': f'product {i}', 'price': round(rng.uniform(1, 500), 2),
+            'description': ' '.join(_word(rng) for _ in range(8))}
+
+
+def bot_record(rng: random.Random, i: int) -> Dict[str, Any]:
+    return {'name': f'bot {i}', 'description': ' '.join(_word(rng) for _ in range(6)), 'owner': _word(rng),
+            'version': f'{rng.randint(0, 3)}.{rng.randint(0, 9)}', 'status': rng.choice(STATUSES),
+            'prompt': ' '.join(_word(rng) for _ in range(20))}
+
+
+# Models by table name: the record generator and the field changed by updates
+MODELS: Dict[str, Tuple[Type[Any], Callable[[random.Random, int], Dict[str, Any]], Callable[[random.Random], Dict[str, Any]]]] = {
+    'users': (User, user_record, lambda rng: {'age': rng.randint(18, 90)}),
+    'products': (Product, product_record, lambda rng: {'price': round(rng.uniform(1, 500), 2)}),
+    'bots': (Bot, bot_record, lambda rng: {'status': rng.choice(STATUSES)}),
+}
+
+
+def dataset(model: str, rows: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Generates `rows` records of a model; the same seed always gives the same records.
+    """
+    make = MODELS[model][1]
+    rng = random.Random(f'{seed}-{model}')
+    return [make(rng, i) for i in range(rows)]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # Nearest rank
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    total = sum(values)
+    return {
+        'ops': len(values),
+        'ops_per_sec': len(values) / total if total else float('inf'),
+        'mean_ms': total / len(values) * 1000,
+        'p50_ms': percentile(values, 50) * 1000,
+        'p95_ms': percentile(values, 95) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+    }
+
+
+def timed(calls: List[Callable[[], Any]]) -> Dict[str, float]:
+    latencies = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def run_backend(backend: str, model: str, rows: int, ops: int, seed: int) -> Dict[str, Dict[str, float]]:
+    """
+    Loads a dataset into a new storage, then times `ops` calls of each operation on it.
+    """
+    model_class, make, change = MODELS[model]
+    records = dataset(model, rows, seed)
+    rng = random.Random(f'{seed}-{model}-ops')
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        storage = BACKENDS[backend](directory)
+        try:
+            storage.create_table(model_class)
+            start = time.perf_counter()
+            ids = [record_id(instance) for instance in storage.create_many(model_class, records)]
+            elapsed = time.perf_counter() - start
+            results['load'] = {'ops': rows, 'ops_per_sec': rows / elapsed if elapsed else float('inf')}
+
+            new_records = [make(rng, rows + i) for i in range(ops)]
+            results['create'] = timed([lambda data=data: storage.create(model_class, data) for data in new_records])
+            results['get'] = timed([lambda id_=rng.choice(ids): storage.get(model_class, id_) for _ in range(ops)])
+            results['list'] = timed([
+                lambda after=rng.choice(ids): storage.list(model_class, limit=LIST_PAGE_SIZE, after=after)
+                for _ in range(ops)
+            ])
+            results['update'] = timed([
+                lambda id_=rng.choice(ids), data=change(rng): storage.update(model_class, id_, data)
+                for _ in range(ops)
+            ])
+            deleted = rng.sample(ids, min(ops, len(ids)))
+            results['delete'] = timed([lambda id_=id_: storage.delete(model_class, id_) for id_ in deleted])
+        finally:
+            storage.close()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """
+    Returns the regressions of `results` against `baseline`: throughput lower, or
+    p95 latency higher, by more than `threshold` (relative). Entries missing from
+    either side are not compared.
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result['ops_per_sec'] < base['ops_per_sec'] * (1 - threshold):
+            regressions.append(f"{key}: {result['ops_per_sec']:.0f} ops/s, baseline {base['ops_per_sec']:.0f}")
+        if 'p95_ms' in result and 'p95_ms' in base and result['p95_ms'] > base['p95_ms'] * (1 + threshold):
+            regressions.append(f"{key}: p95 {result['p95_ms']:.3f} ms, baseline {base['p95_ms']:.3f} ms")
+    return regressions
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000', help='comma separated dataset sizes (up to 1000000)')
+    parser.add_argument('--ops', type=int, default=1000, help='timed calls per operation')
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--models', default=','.join(MODELS))
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'tolerated relative regression (default {DEFAULT_THRESHOLD})')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in _split(args.rows)]
+    unknown = [name for name in _split(args.backends) if name not in BACKENDS]
+    unknown += [name for name in _split(args.models) if name not in MODELS]
+    if unknown:
+        parser.error(f"unknown backends or models: {', '.join(unknown)}")
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'backend':<14}{'model':<10}{'rows':>9} {'operation':<10}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}")
+    for backend in _split(args.backends):
+        for model in _split(args.models):
+            for rows in sizes:
+                try:
+                    measured = run_backend(backend, model, rows, args.ops, args.seed)
+                except ImportError as e:  # optional dependency of the backend
+                    print(f"{backend:<14}skipped: {e}")
+                    break
+                for operation, result in measured.items():
+                    results[f'{backend}/{model}/{rows}/{operation}'] = result
+                    percentiles = ''.join(f"{result[p]:>10.3f}" if p in result else f"{'-':>10}"
+                                          for p in ('p50_ms', 'p95_ms', 'p99_ms'))
+                    print(f"{backend:<14}{model:<10}{rows:>9} {operation:<10}{result['ops_per_sec']:>12.0f}"
+                          f"{percentiles}")
+
+    if args.output:
+        report = {
+            'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'seed': args.seed,
+                     'ops': args.ops, 'timestamp': time.time()},
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {args.threshold:.0%} against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regression beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# app/benchmarks/write_path.py
+"""
+Counts the model constructions and validations per create/update request
+through the generated routes of both backends, and measures their throughput.
+
+    python benchmarks/write_path.py [--requests 500]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from typing import Any, ClassVar, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import model_validator  # noqa: E402
+
+from models.proto_model import ProtoModel  # noqa: E402
+from storage.sqlite_storage import SQLiteStorage  # noqa: E402
+from utils.registrar import register_model, registered_models  # noqa: E402
+
+COUNTS = {'constructions': 0, 'validations': 0}
+
+
+class BenchItem(ProtoModel):
+    __storable__: ClassVar[bool] = True
+    __tablename__: ClassVar[str] = 'bench_items'
+    id: Optional[int] = None
+    name: str
+    price: float
+    quantity: int = 0
+
+    def model_post_init(self, context: Any, /) -> None:
+        # Runs for every instance, validated or built with model_construct
+        COUNTS['constructions'] += 1
+
+    @model_validator(mode='after')
+    def count_validation(self) -> 'BenchItem':
+        COUNTS['validations'] += 1
+        return self
+
+
+def clients(database: str) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+    from api.backend import FastAPIBackend, FlaskBackend
+
+    register_model(BenchItem, storage=SQLiteStorage(database))
+    with contextlib.redirect_stdout(io.StringIO()):
+        fastapi_backend = FastAPIBackend(name='bench', version='0', description='bench')
+        fastapi_backend.register_routes(registered_models)
+        flask_backend = FlaskBackend(name='bench', version='0', description='bench')
+        flask_backend.register_routes(registered_models)
+    return {'fastapi': TestClient(fastapi_backend.app), 'flask': flask_backend.app.test_client()}
+
+
+def measure(client: Any, method: str, url: str, requests: int) -> Dict[str, float]:
+    body = {'name': 'item', 'price': 9.5, 'quantity': 3}
+    # Flask's test client has `open`, the FastAPI (httpx) one `request`
+    send = getattr(client, 'request', None) or (lambda method, url, **kwargs: client.open(url, method=method, **kwargs))
+    COUNTS.update(constructions=0, validations=0)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = send(method, url, json=body)
+        assert response.status_code in (200, 201), response.status_code
+    elapsed = time.perf_counter() - start
+    return {
+        'constructions': COUNTS['constructions'] / requests,
+        'validations': COUNTS['validations'] / requests,
+        'rps': requests / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'backend':<8} {'request':<22} {'constructions':>13} {'validations':>11} {'req/s':>8}")
+        for name, client in clients(os.path.join(directory, 'bench.db')).items():
+            for method, url in (('POST', '/bench_items'), ('PUT', '/bench_items/1')):
+                result = measure(client, method, url, args.requests)
+                print(f"{name:<8} {method + ' ' + url:<22} {result['constructions']:>13.2f} "
+                      f"{result['validations']:>11.2f} {result['rps']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,47 @@ HOST = "localhost"
 PORT = 8000
 
 
+# Pagination of the generated list routes
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Most sub-requests accepted by one `/batch` request (see api/batch.py)
+BATCH_MAX_OPERATIONS = 100
+
+# Seconds without changes after which the change feed routes send a keep-alive (see api/changes.py)
+CHANGE_FEED_KEEPALIVE = 15.0
+# Seconds after which a change feed stream ends (give or take a keep-alive interval):
+# clients reconnect, resuming with Last-Event-ID, so a subscriber never holds a worker for good
+CHANGE_FEED_MAX_STREAM = 300.0
 
 # Filesystem configuration
 SQLITE_DB_FILE = "pybend.db"
+
+# SQLite connection pool configuration
+SQLITE_MAX_READERS = 8
+# Worker threads of the executor running SQLite calls for async (FastAPI) handlers
+SQLITE_ASYNC_WORKERS = 8
+# PRAGMAs overriding the defaults of storage/sqlite_pool.py (WAL, synchronous=NORMAL,
+# mmap and cache sizes, busy_timeout from SQLITE_TIMEOUT), e.g. {"cache_size": -64000}
+SQLITE_PRAGMAS = {}
+# Seconds a request waits for a reader connection or the writer lock, then fails (503 for writes)
+SQLITE_TIMEOUT = 30.0
+# Group commit: writes are queued and committed together, up to SQLITE_COMMIT_BATCH
+# of them. With a window of 0 a group is whatever queued up during the previous
+# commit; a few milliseconds gather larger groups when fsync is slow.
+SQLITE_GROUP_COMMIT = False
+SQLITE_COMMIT_BATCH = 256
+SQLITE_COMMIT_WINDOW = 0.0
+# When writes are acknowledged: "full", "normal" or "async" (see storage/sqlite_group_commit.py),
+# None keeps the "synchronous" PRAGMA above
+SQLITE_DURABILITY = None
+
+# Storage call instrumentation (see storage/instrumented_storage.py): calls slower than
+# slow_threshold seconds are logged with their SQL and query plan, and summarized when
+# the storage closes. slow_log_path also appends them as JSON lines. None disables it,
+# e.g. {"slow_threshold": 0.1, "slow_log_size": 1000, "slow_log_path": None} enables it
+STORAGE_INSTRUMENTATION = None
+
+# Read-through cache of the Product model (see storage/caching_storage.py); the ttl
+# bounds how long writes made by other processes can go unseen. None disables it
+PRODUCT_CACHE = {"max_entries": 10000, "ttl": 30.0}
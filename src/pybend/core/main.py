@@ -3,17 +3,28 @@
 from fastapi import FastAPI
 
 import config
-from api.routes_fastapi import register_route
 from models.product_model import Product
 from api.backend import FastAPIBackend, FlaskBackend
 from models.user_model import User
-from storage.sqlite_storage import SQLiteStorage
+from storage.async_storage import AsyncSQLiteStorage
+from storage.instrumented_storage import with_instrumentation
 from utils.registrar import register_model, registered_models
 
 
 # Set up storage and register models
-storage_backend = SQLiteStorage(config.SQLITE_DB_FILE)
-register_model(Product, storage=storage_backend)
+# The async SQLite storage serves FastAPI's async handlers from a dedicated executor,
+# its wrapped SQLiteStorage serves synchronous callers
+storage_backend = AsyncSQLiteStorage(config.SQLITE_DB_FILE, pragmas=config.SQLITE_PRAGMAS,
+                                     max_readers=config.SQLITE_MAX_READERS,
+                                     max_workers=config.SQLITE_ASYNC_WORKERS,
+                                     group_commit=config.SQLITE_GROUP_COMMIT,
+                                     durability=config.SQLITE_DURABILITY,
+                                     commit_batch=config.SQLITE_COMMIT_BATCH,
+                                     commit_window=config.SQLITE_COMMIT_WINDOW,
+                                     timeout=config.SQLITE_TIMEOUT)
+if config.STORAGE_INSTRUMENTATION:
+    storage_backend = with_instrumentation(storage_backend, **config.STORAGE_INSTRUMENTATION)
+register_model(Product, storage=storage_backend, cache=config.PRODUCT_CACHE)
 register_model(User, storage=storage_backend)
 
 if config.BACKEND == "flask":
@@ -39,8 +50,6 @@ elif config.BACKEND == "fastapi":
 else:
     raise ValueError(f"Unsupported backend: {config.BACKEND}")
 
-register_route("/blueprint", lambda: {"name": "ROOT","message": "This is a root route for the API"}, method='GET')
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host=config.HOST, port=config.PORT, reload=True)
@@ -15,6 +15,7 @@ class Product(ProtoModel):
     """
     __tablename__: ClassVar[str] = 'products'
     __storable__: ClassVar[bool] = True
+    __trusted__: ClassVar[bool] = True
     name: str
     price: float
     description: str = ''
@@ -1,8 +1,8 @@
 # app/models/base_model.py
-import json
+import copy
 
 from pydantic import BaseModel as PydanticBaseModel
-from typing import Any, Dict, Type
+from typing import Any, ClassVar, Dict, List, Type
 
 from utils.decorators import expose_route
 from .storable_mixin import StorableMixin
@@ -10,7 +10,20 @@ from .storable_mixin import StorableMixin
 class ProtoModel(PydanticBaseModel):
     """
     Base model that optionally adds StorableMixin based on the 'storable' class attribute.
+
+    Storable subclasses can declare secondary indexes, built by the storage backend
+    at table creation: `__indexes__` and `__unique__` list field names, or tuples
+    of field names for composite indexes.
+
+    Rows read back from storage are validated again on every read by default. A
+    model whose rows are only ever written through its own validated write paths
+    can set `__trusted__ = True`: its rows are then built with `model_construct`
+    and the API serves them without building models at all. Keep it off for
+    tables also written by other programs, or models with custom serializers.
     """
+    __indexes__: ClassVar[List[Any]] = []
+    __unique__: ClassVar[List[Any]] = []
+    __trusted__: ClassVar[bool] = False
 
     def __init_subclass__(cls, **kwargs):
         # Checks if the class has a 'storable' attribute, defaulting to False
@@ -32,24 +45,15 @@ class ProtoModel(PydanticBaseModel):
     @expose_route('/schema', methods=['GET'])
     def schema(cls) -> Dict[str, Any]:
         """
-        Returns the schema for this model.
+        Returns the schema for this model, computed once by the schema registry.
         """
-        print("Hello from ProtoModel.schema()")
-        print(cls.schema_json())
-        schema = json.loads(cls.schema_json())
-        schema['__type__'] = 'schema'
-        schema['__name__'] = cls.__name__
-        schema['__tablename__'] = cls.__tablename__ if hasattr(cls, '__tablename__') else ""
-        return schema
+        from utils.schema_registry import schema_registry
+        return copy.deepcopy(schema_registry.schema(cls).schema)
 
     @staticmethod
     def blueprint():
         """
-        Returns the blueprint of registered models
+        Returns the blueprint of registered models, computed at registration by the schema registry.
         """
-        from utils.registrar import registered_models
-        print("Hello from ProtoModel.blueprint()")
-        blueprint = {}
-        for model_name, model_cls in registered_models.items():
-            blueprint[model_name] = model_cls.schema()
-        return blueprint
\ No newline at end of file
+        from utils.schema_registry import schema_registry
+        return copy.deepcopy(schema_registry.blueprint().schema)
\ No newline at end of file
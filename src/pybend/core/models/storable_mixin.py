@@ -1,23 +1,114 @@
 # app/models/storable_mixin.py
 
-from typing import ClassVar, Any, List
+from typing import ClassVar, Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 from storage.abstract_storage import AbstractStorage as StorageInterface
+from storage.async_storage import AsyncAbstractStorage as AsyncStorageInterface, AsyncStorageAdapter, as_async
+from storage.change_feed import CREATE, DELETE, UPDATE, change_feed
+from storage.filters import parse_filters
+from storage.pagination import check_order, decode_cursor, encode_cursor
+from storage.records import check_fields, field_aliases, record_id
 
 
 class StorableMixin:
     """
     Mixin that provides storage capabilities to models via dependency injection.
+
+    Writes accept model instances, already validated, or dicts (e.g. request
+    bodies), validated once here. Either way the storage receives a plain dict
+    and returns the stored object without validating it again. Bulk updates,
+    which carry only the fields they change, are validated merged over their
+    stored rows.
+
+    Writes publish their changes to the change feed (see storage.change_feed),
+    for the rows they actually changed.
     """
 
     __tablename__: ClassVar[str]
     storage: ClassVar[StorageInterface] = None  # This will be injected
+    async_storage: ClassVar[AsyncStorageInterface] = None  # Async view of `storage`, used by the a* methods
+
+    @classmethod
+    def set_storage(cls, storage: Any):
+        """
+        Sets the storage backend for the model. Accepts a synchronous storage (an async
+        adapter is derived from it) or an AsyncStorageAdapter (its wrapped storage
+        serves the synchronous methods).
+        """
+        if isinstance(storage, AsyncStorageAdapter):
+            cls.storage = storage.storage
+            cls.async_storage = storage
+        else:
+            cls.storage = storage
+            cls.async_storage = as_async(storage)
 
     @classmethod
-    def set_storage(cls, storage: StorageInterface):
+    def _record(cls, data: Any) -> Dict[str, Any]:
         """
-        Sets the storage backend for the model.
+        Returns the dict to store for a model instance, or for a dict validated into one.
         """
-        cls.storage = storage
+        if isinstance(data, dict):
+            data = cls.model_validate(data)
+        return data.model_dump(exclude_unset=True)
+
+    @classmethod
+    def _updated_ids(cls, data: List[Dict[str, Any]]) -> List[Any]:
+        if not all(isinstance(item, dict) and 'id' in item for item in data):
+            raise ValueError("Each update must be an object holding the 'id' of its record")
+        return [item['id'] for item in data]
+
+    @classmethod
+    def _updated_records(cls, data: List[Dict[str, Any]], stored: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validates bulk updates: each item, the 'id' of a record and the fields to
+        write, is merged over the stored row (raw, see `raw_record`) and the result
+        validated. Returns the items with their validated values.
+
+        Raises:
+            ValueError: On an unknown field or record, or an invalid value.
+        """
+        rows = {row['id']: row for row in stored}
+        aliases = field_aliases(cls)
+        records = []
+        for item in data:
+            fields = [field for field in item if field != 'id']
+            check_fields(cls, fields)
+            row = rows.get(item['id'])
+            if row is None:
+                raise ValueError(f"{cls.__name__} {item['id']} not found")
+            merged = {aliases.get(key, key): value for key, value in {**row, **item}.items()}
+            validated = cls.model_validate(merged).model_dump()
+            records.append({'id': item['id'], **{field: validated[field] for field in fields}})
+        return records
+
+    @classmethod
+    def _publish_created(cls, records: List[Dict[str, Any]], instances: List[Any]):
+        for record, instance in zip(records, instances):
+            id_ = record_id(instance)
+            change_feed.publish(cls.__tablename__, CREATE, id_, {**record, 'id': id_})
+
+    @staticmethod
+    def _written(ids: List[int], result: Any) -> Set[int]:
+        # Ids a storage update/delete wrote: it returns whether the record existed,
+        # or the ids written for the *_many calls; None (older storages) tells nothing
+        if result is None:
+            return set(ids)
+        if isinstance(result, bool):
+            return set(ids) if result else set()
+        return set(result)
+
+    @classmethod
+    def _publish_updated(cls, records: List[Dict[str, Any]], result: Any = None):
+        written = cls._written([record['id'] for record in records], result)
+        for record in records:
+            if record['id'] in written:
+                change_feed.publish(cls.__tablename__, UPDATE, record['id'], record)
+
+    @classmethod
+    def _publish_deleted(cls, ids: List[int], result: Any = None):
+        written = cls._written(ids, result)
+        for id_ in dict.fromkeys(ids):
+            if id_ in written:
+                change_feed.publish(cls.__tablename__, DELETE, id_)
 
     @classmethod
     def create_table(cls):
@@ -31,35 +122,215 @@ class StorableMixin:
         """
         Creates a new record using the storage backend.
         """
-        data_dict = data.model_dump(exclude_unset=True)
-        print(f'Creating {cls.__name__} with data: {data_dict}')
-        return cls.storage.create(cls, data_dict)
+        record = cls._record(data)
+        instance = cls.storage.create(cls, record)
+        cls._publish_created([record], [instance])
+        return instance
+
+    @classmethod
+    def list(cls, limit: int = None, after: int = None, order: str = 'asc',
+             fields: Sequence[str] = None, raw: bool = False) -> List[Any]:
+        """
+        Retrieves records ordered by id using the storage backend. With `fields`, only
+        those fields (and id) are read and partial models are returned. With `raw`,
+        rows are returned as plain dicts, without building models.
+        """
+        return cls.storage.list(cls, limit=limit, after=after, order=order, fields=fields, raw=raw)
 
     @classmethod
-    def list(cls) -> List[Any]:
+    def page(cls, limit: int, cursor: str = None, order: str = 'asc', filters: Dict[str, Any] = None,
+             fields: Sequence[str] = None, raw: bool = False) -> Tuple[List[Any], Optional[str]]:
         """
-        Retrieves all records using the storage backend.
+        Retrieves one page of records and the opaque cursor of the next page
+        (None on the last page). A cursor carries its own ordering.
         """
-        return cls.storage.list(cls)
+        after, order = cls._page_position(cursor, order)
+        items = cls.storage.list(cls, limit=limit + 1, after=after, order=order, filters=filters,
+                                 fields=fields, raw=raw)
+        return cls._page_result(items, limit, order)
+
+    @staticmethod
+    def _page_position(cursor: Optional[str], order: str) -> Tuple[Optional[int], str]:
+        if cursor:
+            return decode_cursor(cursor)
+        return None, order
+
+    @staticmethod
+    def _page_result(items: List[Any], limit: int, order: str) -> Tuple[List[Any], Optional[str]]:
+        # `items` were fetched with limit + 1: an extra item means there is a next page
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(record_id(items[-1]), order)
+        return items, next_cursor
+
+    @classmethod
+    def stream(cls, cursor: str = None, order: str = 'asc', filters: Dict[str, Any] = None,
+               fields: Sequence[str] = None, raw: bool = False) -> Iterator[Any]:
+        """
+        Lazily iterates over all matching records, starting after `cursor` if given.
+        Arguments are validated eagerly, so errors surface before iteration starts.
+        """
+        after, order = cls._stream_position(cursor, order, filters, fields)
+        return cls.storage.iter(cls, after=after, order=order, filters=filters, fields=fields, raw=raw)
+
+    @classmethod
+    def _stream_position(cls, cursor: Optional[str], order: str, filters: Optional[Dict[str, Any]],
+                         fields: Optional[Sequence[str]] = None) -> Tuple[Optional[int], str]:
+        after, order = cls._page_position(cursor, order)
+        check_order(order)
+        parse_filters(cls, filters)
+        check_fields(cls, fields)
+        return after, order
 
     @classmethod
-    def get(cls, id: int) -> Any:
+    def find(cls, limit: int = None, **filters) -> List[Any]:
+        """
+        Retrieves the records matching the filters, evaluated by the storage backend.
+        Filters are `field=value` or `field__op=value` with op one of
+        eq, ne, lt, lte, gt, gte, in, like, e.g. `Product.find(price__gte=10)`.
+        """
+        return cls.storage.list(cls, limit=limit, filters=filters)
+
+    @classmethod
+    def find_one(cls, **filters) -> Any:
+        """
+        Retrieves the first record matching the filters, or None.
+        """
+        found = cls.storage.list(cls, limit=1, filters=filters)
+        return found[0] if found else None
+
+    @classmethod
+    def get(cls, id: int, fields: Sequence[str] = None, raw: bool = False) -> Any:
         """
         Retrieves a record by ID using the storage backend.
         """
-        return cls.storage.get(cls, id)
+        return cls.storage.get(cls, id, fields=fields, raw=raw)
 
     @classmethod
     def update(cls, id: int, data: Any):
         """
         Updates a record using the storage backend.
         """
-        data_dict = data.model_dump(exclude_unset=True)
-        cls.storage.update(cls, id, data_dict)
+        record = cls._record(data)
+        written = cls.storage.update(cls, id, record)
+        cls._publish_updated([{**record, 'id': id}], written)
 
     @classmethod
     def delete(cls, id: int):
         """
         Deletes a record using the storage backend.
         """
-        cls.storage.delete(cls, id)
+        written = cls.storage.delete(cls, id)
+        cls._publish_deleted([id], written)
+
+    @classmethod
+    def create_many(cls, data: List[Any]) -> List[Any]:
+        """
+        Creates several records in a single storage operation.
+        """
+        records = [cls._record(item) for item in data]
+        instances = cls.storage.create_many(cls, records)
+        cls._publish_created(records, instances)
+        return instances
+
+    @classmethod
+    def get_many(cls, ids: List[int], fields: Sequence[str] = None, raw: bool = False) -> List[Any]:
+        """
+        Retrieves the records matching `ids`, in the same order. Missing ids are skipped.
+        """
+        return cls.storage.get_many(cls, ids, fields=fields, raw=raw)
+
+    @classmethod
+    def update_many(cls, data: List[Dict[str, Any]]):
+        """
+        Updates several records in a single storage operation. Each item must contain its 'id'.
+        """
+        stored = cls.storage.get_many(cls, cls._updated_ids(data), raw=True)
+        records = cls._updated_records(data, stored)
+        written = cls.storage.update_many(cls, records)
+        cls._publish_updated(records, written)
+
+    @classmethod
+    def delete_many(cls, ids: List[int]):
+        """
+        Deletes several records in a single storage operation.
+        """
+        written = cls.storage.delete_many(cls, ids)
+        cls._publish_deleted(ids, written)
+
+    # Async variants, for event-loop handlers. They run on the async storage, so
+    # a slow query never blocks the loop.
+
+    @classmethod
+    async def acreate(cls, data: Any) -> Any:
+        record = cls._record(data)
+        instance = await cls.async_storage.create(cls, record)
+        cls._publish_created([record], [instance])
+        return instance
+
+    @classmethod
+    async def alist(cls, limit: int = None, after: int = None, order: str = 'asc',
+                    fields: Sequence[str] = None, raw: bool = False) -> List[Any]:
+        return await cls.async_storage.list(cls, limit=limit, after=after, order=order, fields=fields, raw=raw)
+
+    @classmethod
+    async def apage(cls, limit: int, cursor: str = None, order: str = 'asc', filters: Dict[str, Any] = None,
+                    fields: Sequence[str] = None, raw: bool = False) -> Tuple[List[Any], Optional[str]]:
+        after, order = cls._page_position(cursor, order)
+        items = await cls.async_storage.list(cls, limit=limit + 1, after=after, order=order,
+                                             filters=filters, fields=fields, raw=raw)
+        return cls._page_result(items, limit, order)
+
+    @classmethod
+    def astream(cls, cursor: str = None, order: str = 'asc', filters: Dict[str, Any] = None,
+                fields: Sequence[str] = None, raw: bool = False) -> AsyncIterator[Any]:
+        after, order = cls._stream_position(cursor, order, filters, fields)
+        return cls.async_storage.iter(cls, after=after, order=order, filters=filters, fields=fields, raw=raw)
+
+    @classmethod
+    async def afind(cls, limit: int = None, **filters) -> List[Any]:
+        return await cls.async_storage.list(cls, limit=limit, filters=filters)
+
+    @classmethod
+    async def afind_one(cls, **filters) -> Any:
+        found = await cls.async_storage.list(cls, limit=1, filters=filters)
+        return found[0] if found else None
+
+    @classmethod
+    async def aget(cls, id: int, fields: Sequence[str] = None, raw: bool = False) -> Any:
+        return await cls.async_storage.get(cls, id, fields=fields, raw=raw)
+
+    @classmethod
+    async def aupdate(cls, id: int, data: Any):
+        record = cls._record(data)
+        written = await cls.async_storage.update(cls, id, record)
+        cls._publish_updated([{**record, 'id': id}], written)
+
+    @classmethod
+    async def adelete(cls, id: int):
+        written = await cls.async_storage.delete(cls, id)
+        cls._publish_deleted([id], written)
+
+    @classmethod
+    async def acreate_many(cls, data: List[Any]) -> List[Any]:
+        records = [cls._record(item) for item in data]
+        instances = await cls.async_storage.create_many(cls, records)
+        cls._publish_created(records, instances)
+        return instances
+
+    @classmethod
+    async def aget_many(cls, ids: List[int], fields: Sequence[str] = None, raw: bool = False) -> List[Any]:
+        return await cls.async_storage.get_many(cls, ids, fields=fields, raw=raw)
+
+    @classmethod
+    async def aupdate_many(cls, data: List[Dict[str, Any]]):
+        stored = await cls.async_storage.get_many(cls, cls._updated_ids(data), raw=True)
+        records = cls._updated_records(data, stored)
+        written = await cls.async_storage.update_many(cls, records)
+        cls._publish_updated(records, written)
+
+    @classmethod
+    async def adelete_many(cls, ids: List[int]):
+        written = await cls.async_storage.delete_many(cls, ids)
+        cls._publish_deleted(ids, written)
@@ -2,11 +2,12 @@
 from __future__ import annotations
 from .proto_model import ProtoModel
 from typing import ClassVar, Optional
+from pydantic import field_validator
 from utils.decorators import expose_route
-from flask import request, jsonify
 
 class Bot(ProtoModel):
     __storable__: ClassVar[bool] = True
+    __trusted__: ClassVar[bool] = True
     __tablename__: ClassVar[str] = 'bots'
     id: int = None
     name: str
@@ -19,16 +20,19 @@ class Bot(ProtoModel):
 
 class User(ProtoModel):
     __storable__: ClassVar[bool] = True
+    __trusted__: ClassVar[bool] = True
     __tablename__: ClassVar[str] = 'users'
+    __indexes__: ClassVar[list] = ['email']
     id: int = None
     name: str
     email: str
     age: Optional[int] = None
 
+    @field_validator('email')
     @classmethod
-    def create(cls, data):
-        data.email = data.email.lower()
-        return super().create(data)
+    def normalize_email(cls, email: str) -> str:
+        # Normalized on validation so that every write path (sync, async, bulk) stores it lowercase
+        return email.lower()
 
     @staticmethod
     @expose_route('/login', methods=['POST'])
@@ -68,8 +72,7 @@ class User(ProtoModel):
                       type: string
         """
         email = data.get('email')
-        users = User.list()
-        if any(u.email == email for u in users):
-            return jsonify({'message': 'Login successful'}), 200
+        if User.find_one(email=email) is not None:
+            return {'message': 'Login successful'}, 200
         else:
-            return jsonify({'error': 'Invalid credentials'}), 401
+            return {'error': 'Invalid credentials'}, 401
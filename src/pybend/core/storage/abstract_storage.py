@@ -1,7 +1,17 @@
 # app/storage/storage_interface.py
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Type
+from typing import Any, ContextManager, Dict, Iterator, List, Sequence, Type
+
+from .records import record_id
+from .versions import VersionTracker
+
+
+class StorageBusy(TimeoutError):
+    """
+    Raised when a storage could not get the lock it writes under within its
+    timeout. Nothing was written: the request can be retried.
+    """
 
 
 class AbstractStorage(ABC):
@@ -18,17 +28,107 @@ class AbstractStorage(ABC):
         pass
 
     @abstractmethod
-    def list(self, model_class: Type[Any]) -> List[Any]:
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        """
+        Lists records ordered by id. `after` is a keyset position: only records with
+        an id strictly after it (in `order` direction) are returned, at most `limit`.
+        `filters` are field lookups as parsed by `storage.filters.parse_filters`.
+        `fields` is a sparse fieldset: only those columns (and id) are read, and
+        partial models are returned (see `storage.records.partial_model`).
+        `raw` returns plain dicts shaped like `model_dump()` instead of models.
+        """
         pass
 
     @abstractmethod
-    def get(self, model_class: Type[Any], id_: int = None, **kwargs) -> Any:
+    def get(self, model_class: Type[Any], id_: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **kwargs) -> Any:
+        """
+        Retrieves a record by id, or the first record matching the `kwargs` filters.
+        """
         pass
 
     @abstractmethod
-    def update(self, model_class: Type[Any], id_: int, data: Dict[str, Any]):
+    def update(self, model_class: Type[Any], id_: int, data: Dict[str, Any]) -> bool:
+        """
+        Updates the given fields of a record; returns whether the record exists.
+        """
         pass
 
     @abstractmethod
-    def delete(self, model_class: Type[Any], id_: int):
+    def delete(self, model_class: Type[Any], id_: int) -> bool:
+        """
+        Deletes a record; returns whether it existed.
+        """
+        pass
+
+    def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+             filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             batch_size: int = 500, raw: bool = False) -> Iterator[Any]:
+        """
+        Lazily iterates over the matching records in id order, holding at most one
+        batch in memory. The default walks `list()` page by page on the id keyset.
+        """
+        while True:
+            batch = self.list(model_class, limit=batch_size, after=after, order=order,
+                              filters=filters, fields=fields, raw=raw)
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            after = record_id(batch[-1])
+
+    # Bulk operations. Backends should override these with a single round trip;
+    # the defaults fall back to the single-record operations.
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        return [self.create(model_class, data) for data in records]
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        instances = (self.get(model_class, id_, fields=fields, raw=raw) for id_ in ids)
+        return [instance for instance in instances if instance is not None]
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[int]:
+        """
+        Updates several records. Each record must contain its 'id'. Returns the ids
+        of the records updated, missing ones being skipped.
+        """
+        updated = []
+        for data in records:
+            data = dict(data)
+            id_ = data.pop('id')
+            if self.update(model_class, id_, data):
+                updated.append(id_)
+        return list(dict.fromkeys(updated))
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]) -> List[int]:
+        """
+        Deletes several records and returns the ids of those that existed.
+        """
+        return [id_ for id_ in dict.fromkeys(ids) if self.delete(model_class, id_)]
+
+    def transaction(self) -> ContextManager[Any]:
+        """
+        Returns a context manager running the writes made inside the block in one
+        transaction, committed when it exits and rolled back if it raises.
+        Backends without transactions raise NotImplementedError.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support transactions")
+
+    @property
+    def versions(self) -> VersionTracker:
+        """
+        Per-table and per-row versions, bumped by every create/update/delete of
+        the backend (see storage.versions). Created on first use.
+        """
+        versions = self.__dict__.get('_versions')
+        if versions is None:
+            versions = self.__dict__.setdefault('_versions', VersionTracker())
+        return versions
+
+    def close(self):
+        """
+        Releases any resources (connections, file handles) held by the backend.
+        """
         pass
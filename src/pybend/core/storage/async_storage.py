@@ -0,0 +1,288 @@
+# app/storage/async_storage.py
+
+import asyncio
+import contextvars
+import functools
+import itertools
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from .abstract_storage import AbstractStorage
+from .records import record_id
+
+DEFAULT_MAX_WORKERS = 8
+
+# Thread and context of the storage transaction held by the current context (see `transaction_thread`)
+_bound: "contextvars.ContextVar[Optional[Tuple[Executor, contextvars.Context]]]" = contextvars.ContextVar(
+    'async-storage-transaction', default=None
+)
+
+
+class AsyncAbstractStorage(ABC):
+    """
+    Asynchronous counterpart of AbstractStorage, for use from event-loop handlers.
+    """
+
+    @abstractmethod
+    async def create_table(self, model_class: Type[Any]):
+        pass
+
+    @abstractmethod
+    async def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
+        pass
+
+    @abstractmethod
+    async def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+                   order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+                   raw: bool = False) -> List[Any]:
+        pass
+
+    @abstractmethod
+    async def get(self, model_class: Type[Any], id_: int = None, fields: Sequence[str] = None, raw: bool = False,
+                  **kwargs) -> Any:
+        pass
+
+    @abstractmethod
+    async def update(self, model_class: Type[Any], id_: int, data: Dict[str, Any]) -> bool:
+        pass
+
+    @abstractmethod
+    async def delete(self, model_class: Type[Any], id_: int) -> bool:
+        pass
+
+    async def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+                   filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+                   batch_size: int = 500, raw: bool = False) -> AsyncIterator[Any]:
+        """
+        Lazily iterates over the matching records in id order, one batch at a time.
+        """
+        while True:
+            batch = await self.list(model_class, limit=batch_size, after=after, order=order,
+                                    filters=filters, fields=fields, raw=raw)
+            for item in batch:
+                yield item
+            if len(batch) < batch_size:
+                return
+            after = record_id(batch[-1])
+
+    async def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        return [await self.create(model_class, data) for data in records]
+
+    async def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                       raw: bool = False) -> List[Any]:
+        instances = [await self.get(model_class, id_, fields=fields, raw=raw) for id_ in ids]
+        return [instance for instance in instances if instance is not None]
+
+    async def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[int]:
+        updated = []
+        for data in records:
+            data = dict(data)
+            id_ = data.pop('id')
+            if await self.update(model_class, id_, data):
+                updated.append(id_)
+        return list(dict.fromkeys(updated))
+
+    async def delete_many(self, model_class: Type[Any], ids: List[int]) -> List[int]:
+        return [id_ for id_ in dict.fromkeys(ids) if await self.delete(model_class, id_)]
+
+    def close(self):
+        """
+        Releases any resources held by the backend.
+        """
+        pass
+
+
+class AsyncStorageAdapter(AsyncAbstractStorage):
+    """
+    Runs a synchronous AbstractStorage on a bounded, dedicated thread pool so that
+    storage calls never block the event loop. The caller's context variables are
+    propagated to the worker thread. Inside a `transaction_thread()`, calls run on
+    the transaction's thread instead.
+    """
+
+    def __init__(self, storage: AbstractStorage, max_workers: int = DEFAULT_MAX_WORKERS,
+                 executor: ThreadPoolExecutor = None):
+        self.storage = storage
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{type(storage).__name__.lower()}-io"
+        )
+
+    def wrapping(self, storage: AbstractStorage) -> "AsyncStorageAdapter":
+        """
+        Returns the adapter of `storage`, a wrapper of this adapter's storage (a
+        cache, instrumentation), running on this adapter's executor: calls through
+        either adapter share its workers.
+        """
+        adapter = _adapters.get(storage)
+        if adapter is None:
+            adapter = _adapters[storage] = AsyncStorageAdapter(storage, executor=self.executor)
+        return adapter
+
+    async def _run(self, fn, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        bound = _bound.get()
+        if bound is not None:
+            executor, context = bound
+        else:
+            executor, context = self.executor, contextvars.copy_context()
+        return await loop.run_in_executor(executor, functools.partial(context.run, fn, *args, **kwargs))
+
+    async def create_table(self, model_class: Type[Any]):
+        return await self._run(self.storage.create_table, model_class)
+
+    async def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
+        return await self._run(self.storage.create, model_class, data)
+
+    async def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+                   order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+                   raw: bool = False) -> List[Any]:
+        return await self._run(self.storage.list, model_class, limit=limit, after=after,
+                               order=order, filters=filters, fields=fields, raw=raw)
+
+    async def get(self, model_class: Type[Any], id_: int = None, fields: Sequence[str] = None, raw: bool = False,
+                  **kwargs) -> Any:
+        return await self._run(self.storage.get, model_class, id_, fields=fields, raw=raw, **kwargs)
+
+    async def update(self, model_class: Type[Any], id_: int, data: Dict[str, Any]):
+        return await self._run(self.storage.update, model_class, id_, data)
+
+    async def delete(self, model_class: Type[Any], id_: int):
+        return await self._run(self.storage.delete, model_class, id_)
+
+    async def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+                   filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+                   batch_size: int = 500, raw: bool = False) -> AsyncIterator[Any]:
+        """
+        Drives the storage's synchronous iterator on the executor, one batch per hop.
+        """
+        batches = _batched(self.storage.iter(model_class, after=after, order=order, filters=filters,
+                                             fields=fields, batch_size=batch_size, raw=raw), batch_size)
+        try:
+            while True:
+                batch = await self._run(next, batches, None)
+                if batch is None:
+                    return
+                for item in batch:
+                    yield item
+        finally:
+            # Releases the storage cursor/connection, also when the consumer stops early
+            await self._run(batches.close)
+
+    async def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        return await self._run(self.storage.create_many, model_class, records)
+
+    async def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                       raw: bool = False) -> List[Any]:
+        return await self._run(self.storage.get_many, model_class, ids, fields=fields, raw=raw)
+
+    async def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]):
+        return await self._run(self.storage.update_many, model_class, records)
+
+    async def delete_many(self, model_class: Type[Any], ids: List[int]):
+        return await self._run(self.storage.delete_many, model_class, ids)
+
+    def close(self):
+        """
+        Waits for pending storage calls and stops the worker threads, those shared
+        with `wrapping()` adapters included. The wrapped storage is left open, it is
+        closed by its owner.
+        """
+        self.executor.shutdown(wait=True)
+
+
+class AsyncSQLiteStorage(AsyncStorageAdapter):
+    """
+    SQLite storage for async code: a SQLiteStorage driven by a dedicated executor
+    sized to its reader pool.
+    """
+
+    def __init__(self, database: str = 'database.db', pragmas: Optional[Dict[str, Any]] = None,
+                 max_readers: int = 8, max_workers: int = None, group_commit: bool = False,
+                 durability: str = None, commit_batch: int = 256, commit_window: float = 0.0,
+                 timeout: float = 30.0):
+        from .sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage(database, pragmas=pragmas, max_readers=max_readers, group_commit=group_commit,
+                                durability=durability, commit_batch=commit_batch, commit_window=commit_window,
+                                timeout=timeout)
+        super().__init__(storage, max_workers=max_workers or max_readers)
+
+    def close(self):
+        super().close()
+        self.storage.close()
+
+
+@asynccontextmanager
+async def transaction_thread(transaction: Callable[[], ContextManager[Any]]):
+    """
+    Holds a synchronous storage transaction, `transaction()`, on a thread of its
+    own for the duration of the block. The async storage calls made from the
+    current context run on that thread, in the transaction, rather than on the
+    adapters' executors: their workers may all be waiting for the writer lock
+    the transaction holds. Calls from other contexts are not affected.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage-transaction')
+    context = contextvars.copy_context()
+    manager = transaction()
+
+    def call(fn, *args) -> Any:
+        # Shielded: the transaction thread finishes its step even if the caller is cancelled
+        return asyncio.shield(asyncio.wrap_future(executor.submit(context.run, fn, *args)))
+
+    def exit_if_entered(entered):
+        if entered.exception() is None:
+            context.run(manager.__exit__, None, None, None)
+
+    try:
+        entered = executor.submit(context.run, manager.__enter__)
+        try:
+            await asyncio.shield(asyncio.wrap_future(entered))
+        except asyncio.CancelledError:
+            # Runs after the transaction is entered, on its thread, so that it never stays held
+            executor.submit(exit_if_entered, entered)
+            raise
+        token = _bound.set((executor, context))
+        try:
+            yield
+        except BaseException as e:
+            _bound.reset(token)
+            if not await call(manager.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            _bound.reset(token)
+            await call(manager.__exit__, None, None, None)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def _batched(iterator: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    try:
+        while True:
+            batch = list(itertools.islice(iterator, size))
+            if not batch:
+                return
+            yield batch
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+# One adapter (and executor) per synchronous storage, shared by the models using it
+_adapters: "weakref.WeakKeyDictionary[AbstractStorage, AsyncStorageAdapter]" = weakref.WeakKeyDictionary()
+
+
+def as_async(storage: Any, max_workers: int = DEFAULT_MAX_WORKERS) -> AsyncAbstractStorage:
+    """
+    Returns an async view of a storage backend: async backends are returned as is,
+    synchronous ones are wrapped in a (cached) AsyncStorageAdapter.
+    """
+    if isinstance(storage, AsyncAbstractStorage):
+        return storage
+    adapter = _adapters.get(storage)
+    if adapter is None:
+        adapter = _adapters[storage] = AsyncStorageAdapter(storage, max_workers=max_workers)
+    return adapter
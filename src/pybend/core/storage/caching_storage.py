@@ -0,0 +1,229 @@
+# app/storage/caching_storage.py
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Type
+
+from .abstract_storage import AbstractStorage
+from .async_storage import AsyncStorageAdapter
+from .records import build_model, check_fields, record_id
+from .storage_wrapper import StorageWrapper
+
+_MISSING = object()
+
+
+def _filters_key(filters: Optional[Dict[str, Any]]) -> Any:
+    """
+    Returns a hashable form of list filters, or _MISSING when they cannot be cached.
+    """
+    key = tuple(sorted(
+        (name, tuple(value) if isinstance(value, (list, set)) else value)
+        for name, value in (filters or {}).items()
+    ))
+    try:
+        hash(key)
+    except TypeError:
+        return _MISSING
+    return key
+
+
+class CachingStorage(StorageWrapper):
+    """
+    Read-through cache in front of another storage. `get` by id is cached per
+    (table, id) and `list` results per table and arguments, in one LRU of at
+    most `max_entries` entries, each expiring after `ttl` seconds (None: never).
+
+    Writes through the wrapper invalidate the affected entries: the updated or
+    deleted ids, and every cached list of the table. Writes made by other
+    processes, or on the wrapped storage directly, are only seen once the
+    entries expire, so set a `ttl` when there are any.
+
+    Entries are the stored records as plain dicts; each hit builds a new model
+    (without validation for trusted models), so callers never share instances.
+    `iter` (streaming) is not cached. Inside a `transaction()` reads bypass the
+    cache, which only ever holds committed rows.
+    """
+
+    def __init__(self, storage: AbstractStorage, max_entries: int = 10000, ttl: float = None):
+        super().__init__(storage)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, Tuple[Any, Optional[float]]]" = OrderedDict()
+        # Bumped by every write to a table: list entries are keyed by it, and reads
+        # that started before a write do not fill the cache with what they read
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Tables (and ids) written by the current context's transaction, None outside of one
+        self._written: "contextvars.ContextVar[Optional[Dict[str, Set[int]]]]" = contextvars.ContextVar(
+            f'cache-transaction-{id(self)}', default=None
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the hit, miss and eviction counters and the current number of entries.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries)}
+
+    def clear(self):
+        """
+        Drops every entry; the counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            for table in self._generations:
+                self._generations[table] += 1
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the block in a transaction of the wrapped storage. Its reads bypass the
+        cache: they may see its uncommitted writes, which must not be served to
+        others. The tables it wrote are invalidated again when it ends, as other
+        readers may have cached their previous rows meanwhile.
+        """
+        if self._written.get() is not None:
+            with self.storage.transaction():
+                yield self
+            return
+        written: Dict[str, Set[int]] = {}
+        token = self._written.set(written)
+        try:
+            with self.storage.transaction():
+                yield self
+        finally:
+            self._written.reset(token)
+            for table, ids in written.items():
+                self._invalidate(table, ids)
+
+    def _lookup(self, key: Any) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return _MISSING
+
+    def _store(self, table: str, generation: int, key: Any, value: Any):
+        with self._lock:
+            if self._generations.get(table, 0) != generation:
+                return
+            expires = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _invalidate(self, table: str, ids: Sequence[int] = ()):
+        written = self._written.get()
+        if written is not None:
+            written.setdefault(table, set()).update(ids)
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            for id_ in ids:
+                self._entries.pop((table, id_), None)
+
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        filters_key = _filters_key(filters)
+        if filters_key is _MISSING or self._written.get() is not None:
+            return super().list(model_class, limit=limit, after=after, order=order, filters=filters,
+                                fields=fields, raw=raw)
+        fields = check_fields(model_class, fields)
+        table = model_class.__tablename__
+        generation = self._generations.get(table, 0)
+        key = ('list', table, generation, limit, after, order, filters_key, fields)
+        records = self._lookup(key)
+        if records is _MISSING:
+            records = self.storage.list(model_class, limit=limit, after=after, order=order, filters=filters,
+                                        fields=fields, raw=True)
+            self._store(table, generation, key, records)
+        return [build_model(model_class, record, fields, raw) for record in records]
+
+    def get(self, model_class: Type[Any], id_: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **kwargs) -> Any:
+        if id_ is None or kwargs or self._written.get() is not None:
+            return super().get(model_class, id_, fields=fields, raw=raw, **kwargs)
+        found = self.get_many(model_class, [id_], fields=fields, raw=raw)
+        return found[0] if found else None
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        if self._written.get() is not None:
+            return super().get_many(model_class, ids, fields=fields, raw=raw)
+        fields = check_fields(model_class, fields)
+        table = model_class.__tablename__
+        generation = self._generations.get(table, 0)
+        records = {}
+        for id_ in ids:
+            record = self._lookup((table, id_))
+            if record is not _MISSING:
+                records[id_] = record
+        missing = [id_ for id_ in ids if id_ not in records]
+        if missing:
+            # Whole records are cached, whatever the fieldset asked for
+            for record in self.storage.get_many(model_class, missing, raw=True):
+                records[record_id(record)] = record
+                self._store(table, generation, (table, record_id(record)), record)
+        return [build_model(model_class, records[id_], fields, raw) for id_ in ids if id_ in records]
+
+    def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
+        try:
+            return self.storage.create(model_class, data)
+        finally:
+            self._invalidate(model_class.__tablename__)
+
+    def update(self, model_class: Type[Any], id_: int, data: Dict[str, Any]):
+        try:
+            return self.storage.update(model_class, id_, data)
+        finally:
+            self._invalidate(model_class.__tablename__, [id_])
+
+    def delete(self, model_class: Type[Any], id_: int):
+        try:
+            return self.storage.delete(model_class, id_)
+        finally:
+            self._invalidate(model_class.__tablename__, [id_])
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        try:
+            return self.storage.create_many(model_class, records)
+        finally:
+            self._invalidate(model_class.__tablename__)
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]):
+        try:
+            return self.storage.update_many(model_class, records)
+        finally:
+            self._invalidate(model_class.__tablename__, [data.get('id') for data in records])
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]):
+        try:
+            return self.storage.delete_many(model_class, ids)
+        finally:
+            self._invalidate(model_class.__tablename__, ids)
+
+
+def with_cache(storage: Any, **options) -> Any:
+    """
+    Wraps a storage in a CachingStorage. For an AsyncStorageAdapter, its
+    synchronous storage is wrapped and an async adapter over the cache returned,
+    running on the executor (and so the workers) of the given adapter.
+    """
+    if isinstance(storage, AsyncStorageAdapter):
+        return storage.wrapping(CachingStorage(storage.storage, **options))
+    return CachingStorage(storage, **options)
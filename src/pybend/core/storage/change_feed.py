@@ -0,0 +1,195 @@
+# app/storage/change_feed.py
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from .filters import Condition, matches
+
+DEFAULT_BUFFER_SIZE = 1000
+
+# Operations of the changes; RESET tells a subscriber its position is no longer
+# buffered, so it has to reload the table instead of applying deltas
+CREATE, UPDATE, DELETE, RESET = 'create', 'update', 'delete', 'reset'
+
+
+class Change(NamedTuple):
+    seq: int
+    table: str
+    op: str
+    id: Any
+    data: Optional[Dict[str, Any]]  # the fields written (with id), None for deletes
+    timestamp: float  # unix timestamp
+
+
+class ChangeFeed:
+    """
+    In-process broker of the changes made through StorableMixin writes. Every
+    change gets a sequence number, increasing across all tables, and the last
+    `buffer_size` changes of each table are kept so that subscribers can resume
+    from the sequence they last saw (e.g. an SSE `Last-Event-ID`).
+
+    Subscribers (`subscribe` for threads, `asubscribe` for event loops) are woken
+    by each publish. Changes made by other processes are not seen.
+    """
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._logs: Dict[str, Deque[Change]] = {}
+        # Sequence of the last change dropped from each table's buffer
+        self._evicted: Dict[str, int] = {}
+        self._waiters: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        # Changes held back by `deferred()` in the current context
+        self._pending: "contextvars.ContextVar[Optional[List[Tuple[str, str, Any, Any]]]]" = contextvars.ContextVar(
+            f'change-feed-pending-{id(self)}', default=None
+        )
+
+    @property
+    def seq(self) -> int:
+        """
+        Sequence number of the last change published.
+        """
+        return self._seq
+
+    def publish(self, table: str, op: str, id_: Any, data: Optional[Dict[str, Any]] = None):
+        """
+        Publishes a change to `table` and wakes its subscribers.
+        """
+        pending = self._pending.get()
+        if pending is not None:
+            pending.append((table, op, id_, data))
+            return
+        with self._condition:
+            self._seq += 1
+            log = self._logs.get(table)
+            if log is None:
+                log = self._logs[table] = deque(maxlen=self.buffer_size)
+            if len(log) == log.maxlen:
+                self._evicted[table] = log[0].seq
+            log.append(Change(self._seq, table, op, id_, data, time.time()))
+            self._condition.notify_all()
+            waiters = self._waiters.pop(table, ())
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:  # the subscriber's loop is closed
+                pass
+
+    @contextmanager
+    def deferred(self):
+        """
+        Holds back the changes published from the current context until the block
+        exits, then publishes them, or drops them if it raised: wrapped around a
+        storage transaction, subscribers only see committed changes.
+        """
+        if self._pending.get() is not None:
+            yield
+            return
+        pending: List[Tuple[str, str, Any, Any]] = []
+        token = self._pending.set(pending)
+        try:
+            yield
+        finally:
+            self._pending.reset(token)
+        for change in pending:
+            self.publish(*change)
+
+    def since(self, table: str, seq: int) -> Optional[List[Change]]:
+        """
+        Returns the buffered changes of `table` after sequence `seq`, oldest first,
+        or None when some of them were already dropped from the buffer.
+        """
+        with self._condition:
+            if seq < self._evicted.get(table, 0):
+                return None
+            changes = []
+            for change in reversed(self._logs.get(table, ())):
+                if change.seq <= seq:
+                    break
+                changes.append(change)
+        changes.reverse()
+        return changes
+
+    def _last_seq(self, table: str) -> int:
+        log = self._logs.get(table)
+        return log[-1].seq if log else 0
+
+    def _next(self, table: str, seq: int,
+              conditions: Optional[List[Condition]]) -> Tuple[Optional[List[Change]], int]:
+        """
+        Returns the changes to deliver after `seq` and the new position, or None
+        when there are no new changes.
+        """
+        changes = self.since(table, seq)
+        if changes is None:
+            seq = self._seq
+            return [Change(seq, table, RESET, None, None, time.time())], seq
+        if not changes:
+            return None, seq
+        # Filters apply to the fields a change carries: deletes, and updates not
+        # writing a filtered field, cannot be excluded and are always delivered
+        delivered = [
+            change for change in changes
+            if not conditions or change.data is None
+            or not all(condition.field in change.data for condition in conditions)
+            or matches(change.data, conditions)
+        ]
+        return delivered, changes[-1].seq
+
+    def subscribe(self, table: str, since: int = None, conditions: Optional[List[Condition]] = None,
+                  timeout: float = None) -> Iterator[Optional[Change]]:
+        """
+        Yields the changes of `table` after sequence `since` (None: from now on), as
+        they are published, matching the `conditions` (see storage.filters). Yields
+        None after `timeout` seconds without changes, e.g. to send a keep-alive.
+        Blocks the calling thread while waiting.
+        """
+        seq = self._seq if since is None else since
+        while True:
+            changes, seq = self._next(table, seq, conditions)
+            if changes is None:
+                with self._condition:
+                    woken = self._condition.wait_for(lambda: self._last_seq(table) > seq, timeout)
+                if not woken:
+                    yield None
+                continue
+            yield from changes
+
+    async def asubscribe(self, table: str, since: int = None, conditions: Optional[List[Condition]] = None,
+                         timeout: float = None) -> AsyncIterator[Optional[Change]]:
+        """
+        `subscribe` for event loops: waits without blocking the loop.
+        """
+        seq = self._seq if since is None else since
+        while True:
+            changes, seq = self._next(table, seq, conditions)
+            if changes is None:
+                if not await self._wait(table, seq, timeout):
+                    yield None
+                continue
+            for change in changes:
+                yield change
+
+    async def _wait(self, table: str, seq: int, timeout: Optional[float]) -> bool:
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            if self._last_seq(table) > seq:
+                return True
+            self._waiters.setdefault(table, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._condition:
+                self._waiters.get(table, set()).discard(waiter)
+
+
+change_feed = ChangeFeed()
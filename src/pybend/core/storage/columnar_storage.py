@@ -0,0 +1,515 @@
+# app/storage/columnar_storage.py
+
+import json
+import operator
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, only required by ColumnarStorage
+    np = None
+
+from .abstract_storage import AbstractStorage
+from .filters import Condition, _like_to_regex, field_type, parse_filters
+from .pagination import check_order
+from .records import build_model, check_fields, written_model
+
+# Column storage of each python field type: numbers and booleans in native NumPy
+# arrays, anything else as dictionary-encoded strings (int32 codes into a table
+# of distinct values, NULL_CODE for None)
+DTYPES = {'int': 'int64', 'float': 'float64', 'bool': 'bool', 'str': 'int32'}
+NULL_CODE = -1
+
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max')
+
+COMPARISONS = {'lt': operator.lt, 'lte': operator.le, 'gt': operator.gt, 'gte': operator.ge}
+
+
+def column_kind(python_type: Any) -> str:
+    """
+    Maps a (non-Optional) python field type to a column kind, like `sqlite_plan.sql_type`.
+    """
+    if python_type is bool:
+        return 'bool'
+    elif python_type is int:
+        return 'int'
+    elif python_type is float:
+        return 'float'
+    return 'str'  # Default to dictionary-encoded strings
+
+
+class _Column:
+    """
+    One memory-mapped column: `<name>.npy` holds the values (or the string codes),
+    numeric columns have a `<name>.null.npy` mask and string columns an append-only
+    `<name>.dict.jsonl` table of their distinct values.
+    """
+
+    def __init__(self, directory: str, name: str, kind: str, capacity: int):
+        self.name = name
+        self.kind = kind
+        self.path = os.path.join(directory, f"{name}.npy")
+        self.values = _open_array(self.path, DTYPES[kind], capacity, NULL_CODE if kind == 'str' else 0)
+        self.nulls = None
+        self.dictionary: List[str] = []
+        self.codes: Dict[str, int] = {}
+        if kind == 'str':
+            self.dict_path = os.path.join(directory, f"{name}.dict.jsonl")
+            if os.path.exists(self.dict_path):
+                with open(self.dict_path) as f:
+                    self.dictionary = [json.loads(line) for line in f if line.strip()]
+            self.codes = {value: code for code, value in enumerate(self.dictionary)}
+        else:
+            # A column added to an existing table starts as all NULL
+            self.nulls = _open_array(os.path.join(directory, f"{name}.null.npy"), 'bool', capacity, True)
+
+    def encode(self, values: List[Any]) -> List[Any]:
+        if self.kind != 'str':
+            return [0 if value is None else value for value in values]
+        added = []
+        encoded = []
+        for value in values:
+            if value is None:
+                encoded.append(NULL_CODE)
+                continue
+            value = str(value)
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.dictionary)
+                self.dictionary.append(value)
+                added.append(value)
+            encoded.append(code)
+        if added:
+            with open(self.dict_path, 'a') as f:
+                f.write(''.join(json.dumps(value) + '\n' for value in added))
+        return encoded
+
+    def write(self, rows: Any, values: List[Any]):
+        self.values[rows] = self.encode(values)
+        if self.nulls is not None:
+            self.nulls[rows] = [value is None for value in values]
+
+    def read(self, row: int) -> Any:
+        if self.kind == 'str':
+            code = int(self.values[row])
+            return None if code == NULL_CODE else self.dictionary[code]
+        if self.nulls[row]:
+            return None
+        return self.values[row].item()
+
+    def array(self, rows: Any) -> Any:
+        """
+        Returns the column values at `rows`: decoded strings (object array) or a
+        masked array for numbers, NULLs being masked.
+        """
+        if self.kind == 'str':
+            return np.asarray(self.dictionary + [None], dtype=object)[self.values[rows]]
+        return np.ma.MaskedArray(np.asarray(self.values[rows]), mask=np.asarray(self.nulls[rows]))
+
+    def resize(self, capacity: int):
+        self.values = _grow(self.values, self.path, capacity, NULL_CODE if self.kind == 'str' else 0)
+        if self.nulls is not None:
+            self.nulls = _grow(self.nulls, self.nulls.filename, capacity, True)
+
+    def flush(self):
+        self.values.flush()
+        if self.nulls is not None:
+            self.nulls.flush()
+
+
+def _open_array(path: str, dtype: str, capacity: int, fill: Any) -> Any:
+    if os.path.exists(path):
+        array = np.load(path, mmap_mode='r+')
+        return _grow(array, path, capacity, fill) if len(array) < capacity else array
+    array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(capacity,))
+    array[:] = fill
+    return array
+
+
+def _grow(array: Any, path: str, capacity: int, fill: Any) -> Any:
+    tmp_path = path + '.tmp.npy'
+    grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=array.dtype, shape=(capacity,))
+    grown[:len(array)] = array
+    grown[len(array):] = fill
+    grown.flush()
+    del grown, array
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode='r+')
+
+
+class _Table:
+    """
+    The columns of one model: the `id` and `_live` arrays plus one _Column per
+    field. Rows are appended with increasing ids, so the id array is sorted and
+    lookups by id are a binary search. Deleted rows are only marked dead.
+    """
+
+    def __init__(self, directory: str, model_class: Type[Any]):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.meta_path = os.path.join(directory, '_meta.json')
+        meta = {'count': 0, 'last_id': 0}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        self.count: int = meta['count']
+        self.last_id: int = meta['last_id']
+        self.capacity = max(1024, self.count)
+        self.ids = _open_array(os.path.join(directory, 'id.npy'), 'int64', self.capacity, 0)
+        self.live = _open_array(os.path.join(directory, '_live.npy'), 'bool', self.capacity, False)
+        self.capacity = len(self.ids)
+        self.columns: Dict[str, _Column] = {
+            name: _Column(directory, name, column_kind(field_type(model_class, name)), self.capacity)
+            for name in model_class.model_fields if name != 'id'
+        }
+        self.lock = threading.RLock()
+
+    def save_meta(self):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'count': self.count, 'last_id': self.last_id}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def reserve(self, rows: int):
+        if self.count + rows <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < self.count + rows:
+            capacity *= 2
+        self.ids = _grow(self.ids, self.ids.filename, capacity, 0)
+        self.live = _grow(self.live, self.live.filename, capacity, False)
+        for column in self.columns.values():
+            column.resize(capacity)
+        self.capacity = capacity
+
+    def row(self, id_: int) -> Optional[int]:
+        row = int(np.searchsorted(self.ids[:self.count], id_))
+        if row < self.count and self.ids[row] == id_ and self.live[row]:
+            return row
+        return None
+
+    def read(self, row: int, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        record = {'id': int(self.ids[row])}
+        for name in (fields or self.columns):
+            if name != 'id':
+                record[name] = self.columns[name].read(row)
+        return record
+
+    def mask(self, conditions: List[Condition]) -> Any:
+        """
+        Evaluates conditions over all rows at once. NULLs only match `eq None`
+        (and `ne None` excludes them), like SQL.
+        """
+        n = self.count
+        mask = np.array(self.live[:n])
+        for field, op, value in conditions:
+            mask &= self._condition(field, op, value, n)
+        return mask
+
+    def _condition(self, field: str, op: str, value: Any, n: int) -> Any:
+        if field == 'id':
+            values, nulls, column = self.ids[:n], np.zeros(n, dtype=bool), None
+        else:
+            column = self.columns[field]
+            values = column.values[:n]
+            nulls = values == NULL_CODE if column.kind == 'str' else column.nulls[:n]
+
+        if value is None and op in ('eq', 'ne'):
+            return nulls if op == 'eq' else ~nulls
+        if op == 'in':
+            matched = self._isin(column, values, [item for item in value if item is not None]) & ~nulls
+            return matched | nulls if None in value else matched
+        if value is None:
+            return np.zeros(n, dtype=bool)
+
+        if column is not None and column.kind == 'str':
+            # Evaluated once per distinct value, then mapped onto the codes
+            if op == 'like':
+                regex = _like_to_regex(str(value))
+                keep = [code for code, item in enumerate(column.dictionary) if regex.match(item)]
+            elif op in ('eq', 'ne'):
+                return self._isin(column, values, [value]) if op == 'eq' else ~self._isin(column, values, [value]) & ~nulls
+            else:
+                compare = COMPARISONS[op]
+                keep = [code for code, item in enumerate(column.dictionary) if compare(item, str(value))]
+            return np.isin(values, keep)
+
+        if op == 'like':
+            regex = _like_to_regex(str(value))
+            return np.fromiter((regex.match(str(item)) is not None for item in values.tolist()), bool, n) & ~nulls
+        if op in ('eq', 'ne'):
+            return ((values == value) if op == 'eq' else (values != value)) & ~nulls
+        return COMPARISONS[op](values, value) & ~nulls
+
+    @staticmethod
+    def _isin(column: Optional[_Column], values: Any, items: List[Any]) -> Any:
+        if column is not None and column.kind == 'str':
+            items = [column.codes[str(item)] for item in items if str(item) in column.codes]
+        return np.isin(values, items)
+
+    def select(self, conditions: List[Condition], after: Optional[int], descending: bool) -> Any:
+        """
+        Returns the row numbers matching the conditions, in id order, after the keyset position.
+        """
+        mask = self.mask(conditions)
+        if after is not None:
+            ids = self.ids[:self.count]
+            if descending:
+                mask[int(np.searchsorted(ids, after, side='left')):] = False
+            else:
+                mask[:int(np.searchsorted(ids, after, side='right'))] = False
+        rows = np.flatnonzero(mask)
+        return rows[::-1] if descending else rows
+
+    def flush(self):
+        self.ids.flush()
+        self.live.flush()
+        for column in self.columns.values():
+            column.flush()
+        self.save_meta()
+
+
+class ColumnarStorage(AbstractStorage):
+    """
+    Column-oriented storage backend for analytical reads: each field is kept in a
+    memory-mapped NumPy array under `<directory>/<table>/`, typed from the model
+    annotations (see `column_kind`). Strings are dictionary-encoded.
+
+    Besides the regular CRUD interface, `scan()` and `aggregate()` evaluate
+    filters and aggregations on whole columns at once, without building models.
+    Requires numpy.
+    """
+
+    def __init__(self, directory: str = 'data'):
+        if np is None:
+            raise ImportError("ColumnarStorage requires numpy, install it with `pip install numpy`")
+        self.directory = directory
+        self._tables: Dict[Type[Any], _Table] = {}
+        self._tables_lock = threading.Lock()
+
+    def _table(self, model_class: Type[Any]) -> _Table:
+        table = self._tables.get(model_class)
+        if table is None:
+            with self._tables_lock:
+                table = self._tables.get(model_class)
+                if table is None:
+                    table = self._tables[model_class] = _Table(
+                        os.path.join(self.directory, model_class.__tablename__), model_class
+                    )
+        return table
+
+    def close(self):
+        """
+        Flushes every column to disk.
+        """
+        with self._tables_lock:
+            for table in self._tables.values():
+                with table.lock:
+                    table.flush()
+
+    def create_table(self, model_class: Type[Any]):
+        self._table(model_class)
+
+    def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
+        return self.create_many(model_class, [data])[0]
+
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        conditions = parse_filters(model_class, filters)
+        fields = check_fields(model_class, fields)
+        descending = check_order(order) == 'desc'
+        table = self._table(model_class)
+        with table.lock:
+            rows = table.select(conditions, after, descending)[:limit]
+            records = [table.read(row, fields) for row in rows.tolist()]
+        return [build_model(model_class, record, fields, raw) for record in records]
+
+    def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+             filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             batch_size: int = 500, raw: bool = False) -> Iterator[Any]:
+        conditions = parse_filters(model_class, filters)
+        fields = check_fields(model_class, fields)
+        descending = check_order(order) == 'desc'
+        table = self._table(model_class)
+        with table.lock:
+            rows = table.select(conditions, after, descending).tolist()
+        for start in range(0, len(rows), batch_size):
+            with table.lock:
+                records = [table.read(row, fields) for row in rows[start:start + batch_size] if table.live[row]]
+            for record in records:
+                yield build_model(model_class, record, fields, raw)
+
+    def get(self, model_class: Type[Any], id: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **filters) -> Any:
+        if id is not None:
+            filters = {**filters, 'id': id}
+        found = self.list(model_class, limit=1, filters=filters, fields=fields, raw=raw)
+        return found[0] if found else None
+
+    def update(self, model_class: Type[Any], id: int, data: Dict[str, Any]):
+        return bool(self.update_many(model_class, [{**data, 'id': id}]))
+
+    def delete(self, model_class: Type[Any], id: int):
+        return bool(self.delete_many(model_class, [id]))
+
+    # Bulk operations: one vectorized write per column
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        if not records:
+            return []
+        table = self._table(model_class)
+        fields = model_class.model_fields
+        with table.lock:
+            table.reserve(len(records))
+            rows = slice(table.count, table.count + len(records))
+            first_id = table.last_id + 1
+            for offset, data in enumerate(records):
+                data['id'] = first_id + offset
+            table.ids[rows] = [data['id'] for data in records]
+            table.live[rows] = True
+            for name, column in table.columns.items():
+                default = fields[name].get_default(call_default_factory=True) if not fields[name].is_required() else None
+                column.write(rows, [data.get(name, default) for data in records])
+            table.count += len(records)
+            table.last_id += len(records)
+            table.save_meta()
+            self.versions.bump(model_class.__tablename__)
+        return [written_model(model_class, data) for data in records]
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        fields = check_fields(model_class, fields)
+        table = self._table(model_class)
+        with table.lock:
+            rows = [table.row(id_) for id_ in ids]
+            records = [table.read(row, fields) for row in rows if row is not None]
+        return [build_model(model_class, record, fields, raw) for record in records]
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[int]:
+        for data in records:
+            if data.get('id') is None:
+                raise ValueError("Each record to update must contain an 'id'.")
+        table = self._table(model_class)
+        updated = []
+        with table.lock:
+            for data in records:
+                row = table.row(data['id'])
+                if row is None:
+                    continue
+                for name, value in data.items():
+                    if name in table.columns:
+                        table.columns[name].write([row], [value])
+                updated.append(data['id'])
+            updated = list(dict.fromkeys(updated))
+            if updated:
+                self.versions.bump(model_class.__tablename__, updated)
+        return updated
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]) -> List[int]:
+        table = self._table(model_class)
+        with table.lock:
+            deleted = [id_ for id_ in dict.fromkeys(ids) if table.row(id_) is not None]
+            table.live[[table.row(id_) for id_ in deleted]] = False
+            if deleted:
+                self.versions.bump(model_class.__tablename__, deleted)
+        return deleted
+
+    # Analytical reads
+
+    def scan(self, model_class: Type[Any], fields: Sequence[str] = None,
+             filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Returns the matching rows as whole columns, {field: array} in id order:
+        object arrays for strings, masked arrays (NULLs masked) for numbers.
+        """
+        conditions = parse_filters(model_class, filters)
+        fields = check_fields(model_class, fields) or ('id',) + tuple(f for f in model_class.model_fields if f != 'id')
+        table = self._table(model_class)
+        with table.lock:
+            rows = table.select(conditions, None, False)
+            return {
+                name: np.asarray(table.ids[rows]) if name == 'id' else table.columns[name].array(rows)
+                for name in fields
+            }
+
+    def aggregate(self, model_class: Type[Any], op: str, field: str = None, filters: Dict[str, Any] = None,
+                  group_by: str = None) -> Any:
+        """
+        Computes `op` (one of count, sum, mean, min, max) over a numeric field of
+        the matching rows, NULLs excluded, e.g. `aggregate(Product, 'sum', 'price')`.
+        With `group_by`, returns {group value: result}, e.g.
+        `aggregate(Bot, 'count', group_by='status')`.
+        """
+        if op not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{op}', expected one of {list(AGGREGATES)}")
+        if field is None and op != 'count':
+            raise ValueError(f"Aggregate '{op}' requires a field")
+        for name in (field, group_by):
+            if name is not None and name not in model_class.model_fields:
+                raise ValueError(f"Unknown field '{name}' for {model_class.__name__}")
+        conditions = parse_filters(model_class, filters)
+        table = self._table(model_class)
+        with table.lock:
+            rows = table.select(conditions, None, False)
+            if field is not None and field != 'id':
+                column = table.columns[field]
+                if column.kind == 'str':
+                    if op != 'count':
+                        raise ValueError(f"Aggregate '{op}' requires a numeric field, '{field}' is not")
+                    rows = rows[np.asarray(column.values[rows]) != NULL_CODE]
+                    values = None
+                else:
+                    rows = rows[~np.asarray(column.nulls[rows])]
+                    values = np.asarray(column.values[rows])
+            else:
+                values = np.asarray(table.ids[rows]) if field == 'id' else None
+            if group_by is None:
+                return _reduce(op, values, len(rows))
+            if group_by == 'id':
+                keys, nulls, decode = np.asarray(table.ids[rows]), None, lambda key: key
+            else:
+                column = table.columns[group_by]
+                keys = np.asarray(column.values[rows])
+                if column.kind == 'str':
+                    dictionary = list(column.dictionary)
+                    nulls, decode = keys == NULL_CODE, dictionary.__getitem__
+                else:
+                    nulls, decode = np.asarray(column.nulls[rows]), lambda key: key
+        return _group(op, values, keys, nulls, decode)
+
+
+def _reduce(op: str, values: Any, count: int) -> Any:
+    if op == 'count':
+        return count
+    if count == 0:
+        return 0 if op == 'sum' else None
+    return getattr(np, op)(values).item()
+
+
+def _group(op: str, values: Any, keys: Any, nulls: Any, decode: Any) -> Dict[Any, Any]:
+    """
+    Reduces `values` per distinct key: one sort, then a reduceat per group.
+    """
+    result = {}
+    if nulls is not None and nulls.any():
+        result[None] = _reduce(op, values[nulls] if values is not None else None, int(nulls.sum()))
+        keys = keys[~nulls]
+        values = values[~nulls] if values is not None else None
+    if not len(keys):
+        return result
+    groups, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    if op == 'count':
+        reduced = counts
+    else:
+        order = np.argsort(inverse, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        ufunc = {'sum': np.add, 'mean': np.add, 'min': np.minimum, 'max': np.maximum}[op]
+        reduced = ufunc.reduceat(values[order], starts)
+        if op == 'mean':
+            reduced = reduced / counts
+    for key, value in zip(groups.tolist(), reduced.tolist()):
+        result[decode(key)] = value
+    return result
@@ -0,0 +1,139 @@
+# app/storage/filters.py
+
+import re
+import types
+from typing import Any, Dict, List, Mapping, NamedTuple, Tuple, Type, Union, get_args, get_origin
+
+# Filter keys are `<field>` or `<field>__<operator>`, e.g. `price__gte=10`, `id__in=[1, 2]`
+OPERATORS = {
+    'eq': '=',
+    'ne': '!=',
+    'lt': '<',
+    'lte': '<=',
+    'gt': '>',
+    'gte': '>=',
+    'in': 'IN',
+    'like': 'LIKE',
+}
+
+
+class Condition(NamedTuple):
+    field: str
+    op: str
+    value: Any
+
+
+def field_type(model_class: Type[Any], field: str) -> Any:
+    """
+    Returns the python type of a model field, unwrapping Optional[...].
+    """
+    annotation = model_class.model_fields[field].annotation
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            annotation = args[0]
+    return annotation
+
+
+def coerce_value(model_class: Type[Any], field: str, value: Any) -> Any:
+    """
+    Converts a string value (e.g. from a query string) to the type of the field.
+    """
+    if not isinstance(value, str):
+        return value
+    python_type = field_type(model_class, field)
+    if python_type is bool:
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    if python_type in (int, float):
+        return python_type(value)
+    return value
+
+
+def parse_filters(model_class: Type[Any], filters: Dict[str, Any]) -> List[Condition]:
+    """
+    Validates filter keyword arguments against the model fields and operators.
+
+    Raises:
+        ValueError: On an unknown field or operator, or a value of the wrong type.
+    """
+    conditions = []
+    for key, value in (filters or {}).items():
+        field, _, op = key.partition('__')
+        op = op or 'eq'
+        if field not in model_class.model_fields:
+            raise ValueError(f"Unknown field '{field}' for {model_class.__name__}")
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown filter operator '{op}', expected one of {list(OPERATORS)}")
+        if op == 'in':
+            if isinstance(value, str):
+                value = value.split(',') if value else []
+            value = [coerce_value(model_class, field, item) for item in value]
+        else:
+            value = coerce_value(model_class, field, value)
+        conditions.append(Condition(field, op, value))
+    return conditions
+
+
+def filters_from_query(model_class: Type[Any], params: Mapping[str, str]) -> Dict[str, str]:
+    """
+    Extracts the filter parameters (those naming a model field) from a query string mapping.
+    """
+    return {
+        key: value for key, value in params.items()
+        if key.partition('__')[0] in model_class.model_fields
+    }
+
+
+def compile_where(conditions: List[Condition]) -> Tuple[str, List[Any]]:
+    """
+    Compiles conditions into a parameterized SQL boolean expression (without `WHERE`).
+    Field names have been validated by `parse_filters`, values are always bound.
+    """
+    clauses = []
+    params = []
+    for field, op, value in conditions:
+        if op == 'in':
+            if not value:
+                clauses.append("0")
+                continue
+            clauses.append(f"{field} IN ({', '.join(['?'] * len(value))})")
+            params.extend(value)
+        elif value is None and op in ('eq', 'ne'):
+            clauses.append(f"{field} IS {'NOT ' if op == 'ne' else ''}NULL")
+        else:
+            clauses.append(f"{field} {OPERATORS[op]} ?")
+            params.append(value)
+    return " AND ".join(clauses), params
+
+
+def _like_to_regex(pattern: str) -> "re.Pattern":
+    regex = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in pattern)
+    return re.compile(f"^{regex}$", re.IGNORECASE | re.DOTALL)
+
+
+def matches(record: Mapping[str, Any], conditions: List[Condition]) -> bool:
+    """
+    Evaluates conditions against a record dict, with the same semantics as `compile_where`.
+    """
+    for field, op, value in conditions:
+        actual = record.get(field)
+        if op == 'eq':
+            ok = actual == value
+        elif op == 'ne':
+            # As SQL `!=`, a NULL field matches no comparison with a value
+            ok = actual != value if value is None else actual is not None and actual != value
+        elif op == 'in':
+            ok = actual in value
+        elif actual is None or value is None:
+            ok = False
+        elif op == 'like':
+            ok = _like_to_regex(str(value)).match(str(actual)) is not None
+        else:
+            try:
+                ok = {'lt': actual < value, 'lte': actual <= value,
+                      'gt': actual > value, 'gte': actual >= value}[op]
+            except TypeError:
+                ok = False
+        if not ok:
+            return False
+    return True
@@ -0,0 +1,33 @@
+# app/storage/indexes.py
+
+from typing import Any, List, NamedTuple, Tuple, Type
+
+
+class IndexSpec(NamedTuple):
+    columns: Tuple[str, ...]
+    unique: bool = False
+
+
+def declared_indexes(model_class: Type[Any]) -> List[IndexSpec]:
+    """
+    Collects the secondary indexes declared on a model through the `__indexes__`
+    and `__unique__` class attributes. Each entry is a field name, or a tuple of
+    field names for a composite index:
+
+        __indexes__: ClassVar[list] = ['email', ('owner', 'status')]
+        __unique__: ClassVar[list] = ['name']
+    """
+    specs = []
+    for attribute, unique in (('__indexes__', False), ('__unique__', True)):
+        for entry in getattr(model_class, attribute, None) or []:
+            columns = (entry,) if isinstance(entry, str) else tuple(entry)
+            for column in columns:
+                if column not in model_class.model_fields:
+                    raise ValueError(f"Cannot index unknown field '{column}' of {model_class.__name__}")
+            specs.append(IndexSpec(columns, unique))
+    return specs
+
+
+def index_name(table_name: str, spec: IndexSpec) -> str:
+    prefix = 'ux' if spec.unique else 'ix'
+    return f"{prefix}_{table_name}_{'_'.join(spec.columns)}"
@@ -0,0 +1,307 @@
+# app/storage/instrumented_storage.py
+
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+from .abstract_storage import AbstractStorage
+from .async_storage import AsyncStorageAdapter
+from .storage_wrapper import StorageWrapper
+
+# At most this many distinct statements of one call are kept
+MAX_STATEMENTS = 10
+_EXPLAINED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+logger = logging.getLogger(__name__)
+
+# SQL traced for the storage call running in the current context, with the parameters
+# it first ran with (kept to explain it, never logged), None outside of a call
+_statements: "contextvars.ContextVar[Optional[Dict[str, Sequence[Any]]]]" = contextvars.ContextVar(
+    'traced-statements', default=None
+)
+
+
+def _trace(sql: str, parameters: Sequence[Any]):
+    statements = _statements.get()
+    if statements is not None and len(statements) < MAX_STATEMENTS and sql not in statements:
+        statements[sql] = parameters
+
+
+class Statement(NamedTuple):
+    sql: str
+    plan: List[str]  # EXPLAIN QUERY PLAN details
+    full_scan: bool
+
+
+class SlowQuery(NamedTuple):
+    operation: str
+    table: str
+    model: str
+    seconds: float
+    rows: int
+    filters: Tuple[str, ...]  # the fields filtered on
+    statements: List[Statement]
+    timestamp: float  # unix timestamp
+
+
+class CallStats:
+    __slots__ = ('calls', 'rows', 'seconds', 'max_seconds', 'slow', 'full_scans')
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.slow = 0
+        self.full_scans = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def is_full_scan(detail: str) -> bool:
+    """
+    Whether an EXPLAIN QUERY PLAN step reads a whole table rather than searching an index.
+    """
+    return detail.startswith('SCAN ') and 'INDEX' not in detail and 'CONSTANT ROW' not in detail
+
+
+def _filtered_fields(filters: Optional[Dict[str, Any]]) -> Tuple[str, ...]:
+    return tuple(sorted({key.partition('__')[0] for key in (filters or {})}))
+
+
+class InstrumentedStorage(StorageWrapper):
+    """
+    Records every call to the wrapped storage: operation, table, rows returned
+    or written and duration, aggregated per (operation, table) in `stats()`.
+
+    Calls slower than `slow_threshold` seconds go to the slow-query log (the
+    last `slow_log_size` of them, in `slow_queries()`, also appended as JSON
+    lines to `slow_log_path` if set). Over a SQLite storage, their SQL (traced
+    on the pool connections, with its placeholders: the values bound are never
+    logged) and its EXPLAIN QUERY PLAN are captured too, so `report()` can flag
+    full table scans and the indexes that would avoid them. Writes committed by the group commit thread are not
+    traced.
+    """
+
+    def __init__(self, storage: AbstractStorage, slow_threshold: float = 0.1, slow_log_size: int = 1000,
+                 slow_log_path: str = None):
+        super().__init__(storage)
+        self.slow_threshold = slow_threshold
+        self.slow_log_path = slow_log_path
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], CallStats] = {}
+        self._slow: "deque[SlowQuery]" = deque(maxlen=slow_log_size)
+        # Found through wrappers too (e.g. a CachingStorage over a SQLiteStorage)
+        self.pool = getattr(storage, 'pool', None)
+        if self.pool is not None:
+            self.pool.set_trace_callback(_trace)
+
+    def stats(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Returns the calls, rows, total and max seconds, slow calls and full table scans per (operation, table).
+        """
+        with self._lock:
+            return {key: stats.as_dict() for key, stats in self._stats.items()}
+
+    def slow_queries(self) -> List[SlowQuery]:
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+
+    def _call(self, operation: str, model_class: Type[Any], fn: Callable[[], Any],
+              count: Callable[[Any], int], filters: Dict[str, Any] = None) -> Any:
+        statements: Dict[str, Sequence[Any]] = {}
+        token = _statements.set(statements)
+        start = time.perf_counter()
+        try:
+            result = fn()
+        finally:
+            seconds = time.perf_counter() - start
+            _statements.reset(token)
+        self._record(operation, model_class, seconds, count(result), filters, statements)
+        return result
+
+    def _record(self, operation: str, model_class: Type[Any], seconds: float, rows: int,
+                filters: Optional[Dict[str, Any]], statements: Dict[str, Sequence[Any]]):
+        table = getattr(model_class, '__tablename__', model_class.__name__)
+        slow = None
+        if seconds >= self.slow_threshold:
+            explained = [self._explain(sql, parameters) for sql, parameters in statements.items()]
+            slow = SlowQuery(operation, table, model_class.__name__, seconds, rows, _filtered_fields(filters),
+                             explained, time.time())
+        with self._lock:
+            stats = self._stats.get((operation, table))
+            if stats is None:
+                stats = self._stats[(operation, table)] = CallStats()
+            stats.calls += 1
+            stats.rows += rows
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            if slow is not None:
+                stats.slow += 1
+                stats.full_scans += any(statement.full_scan for statement in slow.statements)
+                self._slow.append(slow)
+        if slow is not None:
+            self._log_slow(slow)
+
+    def _explain(self, sql: str, parameters: Sequence[Any]) -> Statement:
+        if self.pool is None or not sql.lstrip().upper().startswith(_EXPLAINED):
+            return Statement(sql, [], False)
+        try:
+            with self.pool.reader() as conn:
+                plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()]
+        except Exception as e:
+            plan = [f"EXPLAIN failed: {e}"]
+        return Statement(sql, plan, any(is_full_scan(detail) for detail in plan))
+
+    def _log_slow(self, slow: SlowQuery):
+        scan = " (full table scan)" if any(statement.full_scan for statement in slow.statements) else ""
+        logger.warning("Slow storage call: %s on %s took %.1f ms, %d rows%s",
+                       slow.operation, slow.table, slow.seconds * 1000, slow.rows, scan)
+        if self.slow_log_path:
+            entry = slow._asdict()
+            entry['statements'] = [statement._asdict() for statement in slow.statements]
+            with self._lock, open(self.slow_log_path, 'a') as f:
+                f.write(json.dumps(entry, default=str) + '\n')
+
+    def report(self) -> str:
+        """
+        Returns a summary: the operations by total time, then the slow calls
+        that scanned a whole table, with the index that would avoid each scan.
+        """
+        with self._lock:
+            stats = sorted(self._stats.items(), key=lambda item: item[1].seconds, reverse=True)
+            slow = list(self._slow)
+        lines = [f"{'operation':<14}{'table':<20}{'calls':>8}{'rows':>10}{'total ms':>12}{'max ms':>10}"
+                 f"{'slow':>6}{'scans':>7}"]
+        for (operation, table), s in stats:
+            lines.append(f"{operation:<14}{table:<20}{s.calls:>8}{s.rows:>10}{s.seconds * 1000:>12.1f}"
+                         f"{s.max_seconds * 1000:>10.1f}{s.slow:>6}{s.full_scans:>7}")
+
+        scans: Dict[Tuple[str, str, str, Tuple[str, ...]], List[SlowQuery]] = {}
+        for query in slow:
+            if any(statement.full_scan for statement in query.statements):
+                scans.setdefault((query.operation, query.table, query.model, query.filters), []).append(query)
+        if scans:
+            lines.append("")
+            lines.append("Full table scans in slow calls:")
+            for (operation, table, model, filters), queries in scans.items():
+                worst = max(queries, key=lambda query: query.seconds)
+                lines.append(f"  {operation} on {table}: {len(queries)} slow calls, "
+                             f"worst {worst.seconds * 1000:.1f} ms")
+                for statement in worst.statements:
+                    if statement.full_scan:
+                        lines.append(f"    {statement.sql}")
+                        lines.extend(f"      {detail}" for detail in statement.plan)
+                if filters:
+                    entry = repr(filters[0]) if len(filters) == 1 else repr(filters)
+                    lines.append(f"    -> declare an index on the filtered fields: "
+                                 f"{model}.__indexes__ = [..., {entry}]")
+        return '\n'.join(lines)
+
+    # Instrumented operations
+
+    def create_table(self, model_class: Type[Any]):
+        return self._call('create_table', model_class, lambda: self.storage.create_table(model_class),
+                          lambda result: 0)
+
+    def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
+        return self._call('create', model_class, lambda: self.storage.create(model_class, data), lambda result: 1)
+
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        return self._call('list', model_class, lambda: self.storage.list(
+            model_class, limit=limit, after=after, order=order, filters=filters, fields=fields, raw=raw
+        ), len, filters)
+
+    def get(self, model_class: Type[Any], id_: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **kwargs) -> Any:
+        return self._call('get', model_class, lambda: self.storage.get(
+            model_class, id_, fields=fields, raw=raw, **kwargs
+        ), lambda result: int(result is not None), kwargs)
+
+    def update(self, model_class: Type[Any], id_: int, data: Dict[str, Any]):
+        return self._call('update', model_class, lambda: self.storage.update(model_class, id_, data),
+                          lambda result: 1)
+
+    def delete(self, model_class: Type[Any], id_: int):
+        return self._call('delete', model_class, lambda: self.storage.delete(model_class, id_), lambda result: 1)
+
+    def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+             filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             batch_size: int = 500, raw: bool = False) -> Iterator[Any]:
+        """
+        Times the iteration as one call: the time spent in the wrapped storage, not in the consumer.
+        """
+        iterator = self.storage.iter(model_class, after=after, order=order, filters=filters, fields=fields,
+                                     batch_size=batch_size, raw=raw)
+        statements: Dict[str, Sequence[Any]] = {}
+        seconds = 0.0
+        rows = 0
+        try:
+            while True:
+                token = _statements.set(statements)
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += time.perf_counter() - start
+                    _statements.reset(token)
+                rows += 1
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+            self._record('iter', model_class, seconds, rows, filters, statements)
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        return self._call('create_many', model_class, lambda: self.storage.create_many(model_class, records), len)
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        return self._call('get_many', model_class, lambda: self.storage.get_many(
+            model_class, ids, fields=fields, raw=raw
+        ), len)
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]):
+        return self._call('update_many', model_class, lambda: self.storage.update_many(model_class, records),
+                          lambda result: len(records))
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]):
+        return self._call('delete_many', model_class, lambda: self.storage.delete_many(model_class, ids),
+                          lambda result: len(ids))
+
+    def close(self):
+        """
+        Logs the summary report if there were slow calls, then closes the wrapped storage.
+        """
+        if self._slow:
+            logger.warning("Storage calls report:\n%s", self.report())
+            self._slow.clear()
+        if self.pool is not None:
+            self.pool.set_trace_callback(None)
+        return self.storage.close()
+
+
+def with_instrumentation(storage: Any, **options) -> Any:
+    """
+    Wraps a storage in an InstrumentedStorage. For an AsyncStorageAdapter, its
+    synchronous storage is wrapped and an async adapter over it returned, running
+    on the executor (and so the workers) of the given adapter.
+    """
+    if isinstance(storage, AsyncStorageAdapter):
+        return storage.wrapping(InstrumentedStorage(storage.storage, **options))
+    return InstrumentedStorage(storage, **options)
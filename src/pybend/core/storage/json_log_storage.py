@@ -0,0 +1,362 @@
+# app/storage/json_log_storage.py
+
+import bisect
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Type
+
+from .abstract_storage import AbstractStorage
+from .filters import matches, parse_filters
+from .pagination import check_order
+from .records import build_model, check_fields, new_record, written_model
+
+# Key marking a tombstone line: {"id": 3, "__deleted__": true}
+TOMBSTONE = '__deleted__'
+
+
+def _replay(index: Dict[int, int], record: Dict[str, Any], offset: int) -> int:
+    """
+    Applies a log line, read at `offset`, to an index of the live ids; returns the
+    number of lines it made garbage.
+    """
+    id_ = record['id']
+    garbage = int(id_ in index)
+    if record.get(TOMBSTONE):
+        index.pop(id_, None)
+        garbage += 1
+    else:
+        index[id_] = offset
+    return garbage
+
+
+class _TableLog:
+    """
+    One table's append-only log: `<table>.jsonl` holds one JSON record per line,
+    the latest line of an id wins and a tombstone line deletes it. The in-memory
+    index maps each live id to the offset of its latest line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.seq_path = os.path.splitext(path)[0] + '.seq'
+        self.lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self.index: Dict[int, int] = {}
+        self.ids: List[int] = []  # live ids, sorted
+        self.garbage = 0  # superseded lines and tombstones
+        self.last_id = 0
+        self.compacting = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            open(self.path, 'ab').close()
+        if os.path.exists(self.seq_path):
+            with open(self.seq_path) as f:
+                self.last_id = int(f.read().strip() or 0)
+        offset = 0
+        with open(self.path, 'rb+') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Torn write of the last line: the write never completed, drop it
+                    f.truncate(offset)
+                    break
+                if line.strip():
+                    record = json.loads(line)
+                    self.garbage += _replay(self.index, record, offset)
+                    self.last_id = max(self.last_id, record['id'])
+                offset += len(line)
+        self.ids = sorted(self.index)
+        self.end = offset
+        self.writer = open(self.path, 'ab')
+        self.reader = open(self.path, 'rb')
+
+    def read(self, id_: int) -> Optional[Dict[str, Any]]:
+        offset = self.index.get(id_)
+        if offset is None:
+            return None
+        self.reader.seek(offset)
+        return json.loads(self.reader.readline())
+
+    def append(self, records: List[Dict[str, Any]]) -> List[int]:
+        """
+        Appends records (or tombstones) in a single write and returns their offsets.
+        """
+        offsets, chunks = [], []
+        offset = self.end
+        for record in records:
+            chunk = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+            offsets.append(offset)
+            chunks.append(chunk)
+            offset += len(chunk)
+        self.writer.write(b''.join(chunks))
+        self.writer.flush()
+        self.end = offset
+        return offsets
+
+    def put(self, records: List[Dict[str, Any]]):
+        for record, offset in zip(records, self.append(records)):
+            id_ = record['id']
+            if id_ in self.index:
+                self.garbage += 1
+            else:
+                bisect.insort(self.ids, id_)
+            self.index[id_] = offset
+
+    def remove(self, ids: List[int]) -> List[int]:
+        """
+        Deletes the live records of `ids` and returns their ids.
+        """
+        ids = [id_ for id_ in dict.fromkeys(ids) if id_ in self.index]
+        if not ids:
+            return ids
+        self.append([{'id': id_, TOMBSTONE: True} for id_ in ids])
+        for id_ in ids:
+            del self.index[id_]
+            del self.ids[bisect.bisect_left(self.ids, id_)]
+        self.garbage += 2 * len(ids)
+        return ids
+
+    def save_seq(self):
+        tmp_path = self.seq_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(self.last_id))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.seq_path)
+
+    def compact(self):
+        """
+        Rewrites the log with only the latest line of each live record, in id order.
+        The sequence is saved first, so ids of deleted records are never reused.
+
+        The table lock is only held to snapshot the index, then to copy the lines
+        appended during the rewrite and swap the files: reads and writes go on
+        while the live records are copied and synced.
+        """
+        with self._compact_lock:
+            with self.lock:
+                self.save_seq()
+                snapshot = [(id_, self.index[id_]) for id_ in self.ids]
+                end = self.end
+            tmp_path = self.path + '.tmp'
+            index, offset = {}, 0
+            with open(self.path, 'rb') as source, open(tmp_path, 'wb') as f:
+                for id_, at in snapshot:
+                    source.seek(at)
+                    line = source.readline()
+                    index[id_] = offset
+                    f.write(line)
+                    offset += len(line)
+                f.flush()
+                os.fsync(f.fileno())
+            with self.lock:
+                garbage = 0
+                with open(self.path, 'rb') as source, open(tmp_path, 'ab') as f:
+                    source.seek(end)
+                    for line in source:
+                        garbage += _replay(index, json.loads(line), offset)
+                        f.write(line)
+                        offset += len(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.writer.close()
+                self.reader.close()
+                os.replace(tmp_path, self.path)
+                self.index, self.end, self.garbage = index, offset, garbage
+                self.writer = open(self.path, 'ab')
+                self.reader = open(self.path, 'rb')
+
+    def close(self):
+        with self.lock:
+            self.save_seq()
+            self.writer.close()
+            self.reader.close()
+
+
+class JSONLogStorage(AbstractStorage):
+    """
+    JSON storage backend keeping each table in an append-only JSONL log.
+
+    Writes are O(1) appends (updates append the new version of the record,
+    deletes a tombstone) and point reads are a single seek, through an id -> offset
+    index rebuilt by scanning the log once at startup. The id sequence is
+    persisted in `<table>.seq`. Once superseded lines and tombstones exceed
+    `compact_ratio` of the live records (and at least `compact_min` lines), the
+    log is compacted on a background thread.
+
+    Existing `<table>.json` files written by JSONStorage are imported on first use.
+    """
+
+    def __init__(self, directory: str = 'data', compact_ratio: float = 1.0, compact_min: int = 1000):
+        self.directory = directory
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self._tables: Dict[str, _TableLog] = {}
+        self._tables_lock = threading.Lock()
+        self._compactions: List[threading.Thread] = []
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def _get_file_path(self, model_class: Type[Any]) -> str:
+        return os.path.join(self.directory, f"{model_class.__tablename__}.jsonl")
+
+    def _table(self, model_class: Type[Any]) -> _TableLog:
+        name = model_class.__tablename__
+        table = self._tables.get(name)
+        if table is None:
+            with self._tables_lock:
+                table = self._tables.get(name)
+                if table is None:
+                    table = self._tables[name] = self._open(model_class)
+        return table
+
+    def _open(self, model_class: Type[Any]) -> _TableLog:
+        path = self._get_file_path(model_class)
+        legacy_path = os.path.join(self.directory, f"{model_class.__tablename__}.json")
+        if not os.path.exists(path) and os.path.exists(legacy_path):
+            with open(legacy_path) as f:
+                records = json.load(f)
+            with open(path, 'w') as f:
+                for record in sorted(records, key=lambda record: record['id']):
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        return _TableLog(path)
+
+    def _maybe_compact(self, table: _TableLog):
+        # Called with the table lock held
+        if table.compacting or table.garbage < max(self.compact_min, self.compact_ratio * len(table.ids)):
+            return
+        table.compacting = True
+
+        def compact():
+            try:
+                table.compact()
+            finally:
+                table.compacting = False
+        thread = threading.Thread(target=compact, name=f'compact-{os.path.basename(table.path)}', daemon=True)
+        self._compactions = [t for t in self._compactions if t.is_alive()] + [thread]
+        thread.start()
+
+    def compact(self, model_class: Type[Any]):
+        """
+        Compacts a table's log now.
+        """
+        self._table(model_class).compact()
+
+    def close(self):
+        """
+        Waits for running compactions, saves the id sequences and closes the logs.
+        """
+        for thread in self._compactions:
+            thread.join()
+        with self._tables_lock:
+            for table in self._tables.values():
+                table.close()
+            self._tables = {}
+
+    def create_table(self, model_class: Type[Any]):
+        self._table(model_class)
+
+    def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
+        return self.create_many(model_class, [data])[0]
+
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        items = []
+        if limit == 0:
+            return items
+        for item in self.iter(model_class, after=after, order=order, filters=filters, fields=fields, raw=raw):
+            items.append(item)
+            if len(items) == limit:
+                break
+        return items
+
+    def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+             filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             batch_size: int = 500, raw: bool = False) -> Iterator[Any]:
+        """
+        Walks the sorted index from the `after` position, reading one batch of
+        records at a time under the table lock.
+        """
+        conditions = parse_filters(model_class, filters)
+        fields = check_fields(model_class, fields)
+        descending = check_order(order) == 'desc'
+        table = self._table(model_class)
+        while True:
+            with table.lock:
+                ids = table.ids
+                if descending:
+                    end = bisect.bisect_left(ids, after) if after is not None else len(ids)
+                    batch_ids = ids[max(end - batch_size, 0):end][::-1]
+                else:
+                    start = bisect.bisect_right(ids, after) if after is not None else 0
+                    batch_ids = ids[start:start + batch_size]
+                records = [table.read(id_) for id_ in batch_ids]
+            for record in records:
+                if matches(record, conditions):
+                    yield build_model(model_class, record, fields, raw)
+            if len(batch_ids) < batch_size:
+                return
+            after = batch_ids[-1]
+
+    def get(self, model_class: Type[Any], id: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **filters) -> Any:
+        if id is None:
+            found = self.list(model_class, limit=1, filters=filters, fields=fields, raw=raw)
+            return found[0] if found else None
+        found = self.get_many(model_class, [id], fields=fields, raw=raw)
+        return found[0] if found else None
+
+    def update(self, model_class: Type[Any], id: int, data: Dict[str, Any]):
+        return bool(self.update_many(model_class, [{**data, 'id': id}]))
+
+    def delete(self, model_class: Type[Any], id: int):
+        return bool(self.delete_many(model_class, [id]))
+
+    # Bulk operations: a single append each
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        table = self._table(model_class)
+        with table.lock:
+            first_id = table.last_id + 1
+            records = [new_record(model_class, data, first_id + offset) for offset, data in enumerate(records)]
+            table.put(records)
+            table.last_id += len(records)
+            self.versions.bump(model_class.__tablename__)
+        return [written_model(model_class, data) for data in records]
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        fields = check_fields(model_class, fields)
+        table = self._table(model_class)
+        with table.lock:
+            records = [table.read(id_) for id_ in ids]
+        return [build_model(model_class, record, fields, raw) for record in records if record is not None]
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[int]:
+        for data in records:
+            if data.get('id') is None:
+                raise ValueError("Each record to update must contain an 'id'.")
+        table = self._table(model_class)
+        with table.lock:
+            updated = {}
+            for data in records:
+                current = updated.get(data['id']) or table.read(data['id'])
+                if current is not None:
+                    updated[data['id']] = {**current, **data}
+            if updated:
+                table.put(list(updated.values()))
+                self.versions.bump(model_class.__tablename__, list(updated))
+                self._maybe_compact(table)
+        return list(updated)
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]) -> List[int]:
+        table = self._table(model_class)
+        with table.lock:
+            deleted = table.remove(ids)
+            if deleted:
+                self.versions.bump(model_class.__tablename__, deleted)
+                self._maybe_compact(table)
+        return deleted
@@ -2,8 +2,11 @@
 
 import json
 import os
-from typing import Any, Dict, List, Type
+from typing import Any, Dict, Iterator, List, Sequence, Type
 from .abstract_storage import AbstractStorage
+from .filters import matches, parse_filters
+from .pagination import check_order
+from .records import build_model, check_fields, new_record, written_model
 
 
 class JSONStorage(AbstractStorage):
@@ -30,17 +33,53 @@ class JSONStorage(AbstractStorage):
         file_path = self._get_file_path(model_class)
         with open(file_path, 'r+') as f:
             records = json.load(f)
-            data['id'] = max((record['id'] for record in records), default=0) + 1
+            data = new_record(model_class, data, max((record['id'] for record in records), default=0) + 1)
             records.append(data)
             f.seek(0)
             json.dump(records, f, indent=4)
-        return model_class(**data)
+        self.versions.bump(model_class.__tablename__)
+        return written_model(model_class, data)
 
     def get_all(self, model_class: Type[Any]) -> List[Any]:
         file_path = self._get_file_path(model_class)
         with open(file_path, 'r') as f:
             records = json.load(f)
-        return [model_class(**record) for record in records]
+        return [build_model(model_class, record) for record in records]
+
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        conditions = parse_filters(model_class, filters)
+        fields = check_fields(model_class, fields)
+        file_path = self._get_file_path(model_class)
+        with open(file_path, 'r') as f:
+            records = json.load(f)
+        if conditions:
+            records = [record for record in records if matches(record, conditions)]
+        descending = check_order(order) == 'desc'
+        records.sort(key=lambda record: record['id'], reverse=descending)
+        if after is not None:
+            records = [r for r in records if (r['id'] < after if descending else r['id'] > after)]
+        if limit is not None:
+            records = records[:limit]
+        return [build_model(model_class, record, fields, raw) for record in records]
+
+    def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+             filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             batch_size: int = 500, raw: bool = False) -> Iterator[Any]:
+        # The file is parsed once, models are built lazily
+        conditions = parse_filters(model_class, filters)
+        fields = check_fields(model_class, fields)
+        file_path = self._get_file_path(model_class)
+        with open(file_path, 'r') as f:
+            records = json.load(f)
+        descending = check_order(order) == 'desc'
+        records.sort(key=lambda record: record['id'], reverse=descending)
+        for record in records:
+            if after is not None and (record['id'] >= after if descending else record['id'] <= after):
+                continue
+            if matches(record, conditions):
+                yield build_model(model_class, record, fields, raw)
 
     def get_by_id(self, model_class: Type[Any], id: int) -> Any:
         file_path = self._get_file_path(model_class)
@@ -48,9 +87,17 @@ class JSONStorage(AbstractStorage):
             records = json.load(f)
         for record in records:
             if record['id'] == id:
-                return model_class(**record)
+                return build_model(model_class, record)
         return None
 
+    def get(self, model_class: Type[Any], id: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **filters) -> Any:
+        if id is None or fields or raw:
+            found = self.list(model_class, limit=1, filters={**filters, 'id': id} if id is not None else filters,
+                              fields=fields, raw=raw)
+            return found[0] if found else None
+        return self.get_by_id(model_class, id)
+
     def update(self, model_class: Type[Any], id: int, data: Dict[str, Any]):
         file_path = self._get_file_path(model_class)
         updated = False
@@ -65,12 +112,70 @@ class JSONStorage(AbstractStorage):
                 f.seek(0)
                 f.truncate()
                 json.dump(records, f, indent=4)
+        if updated:
+            self.versions.bump(model_class.__tablename__, [id])
+        return updated
 
     def delete(self, model_class: Type[Any], id: int):
+        return bool(self.delete_many(model_class, [id]))
+
+    # Bulk operations: a single read-modify-write of the table file each
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
         file_path = self._get_file_path(model_class)
         with open(file_path, 'r+') as f:
-            records = json.load(f)
-            records = [record for record in records if record['id'] != id]
+            stored = json.load(f)
+            next_id = max((record['id'] for record in stored), default=0) + 1
+            records = [new_record(model_class, data, next_id + offset) for offset, data in enumerate(records)]
+            stored.extend(records)
             f.seek(0)
             f.truncate()
-            json.dump(records, f, indent=4)
+            json.dump(stored, f, indent=4)
+        self.versions.bump(model_class.__tablename__)
+        return [written_model(model_class, data) for data in records]
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        fields = check_fields(model_class, fields)
+        file_path = self._get_file_path(model_class)
+        with open(file_path, 'r') as f:
+            records = {record['id']: record for record in json.load(f)}
+        return [build_model(model_class, records[id_], fields, raw) for id_ in ids if id_ in records]
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[int]:
+        updates = {}
+        for data in records:
+            if data.get('id') is None:
+                raise ValueError("Each record to update must contain an 'id'.")
+            updates[data['id']] = data
+        file_path = self._get_file_path(model_class)
+        with open(file_path, 'r+') as f:
+            stored = json.load(f)
+            found = {record['id'] for record in stored if record['id'] in updates}
+            for record in stored:
+                if record['id'] in found:
+                    record.update(updates[record['id']])
+            if found:
+                f.seek(0)
+                f.truncate()
+                json.dump(stored, f, indent=4)
+        updated = [id_ for id_ in updates if id_ in found]
+        if updated:
+            self.versions.bump(model_class.__tablename__, updated)
+        return updated
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]) -> List[int]:
+        wanted = set(ids)
+        file_path = self._get_file_path(model_class)
+        with open(file_path, 'r+') as f:
+            records = json.load(f)
+            found = {record['id'] for record in records if record['id'] in wanted}
+            if found:
+                records = [record for record in records if record['id'] not in found]
+                f.seek(0)
+                f.truncate()
+                json.dump(records, f, indent=4)
+        deleted = [id_ for id_ in dict.fromkeys(ids) if id_ in found]
+        if deleted:
+            self.versions.bump(model_class.__tablename__, deleted)
+        return deleted
@@ -0,0 +1,230 @@
+# app/storage/kv_storage.py
+
+import bisect
+import dbm
+import marshal
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from .abstract_storage import AbstractStorage
+from .filters import matches, parse_filters
+from .pagination import check_order
+from .records import build_model, check_fields, written_model
+
+# Record keys are the id packed as an unsigned 64-bit big-endian integer, always
+# 8 bytes; the metadata keys below are of any other length, so they never collide
+# with them and are not taken for ids when the keys are listed
+SEQ_KEY = b'__seq__'
+SCHEMA_KEY = b'__schema__'
+_ID = struct.Struct('>Q')
+
+
+class _KVTable:
+    """
+    One table's key-value store. Values are the record's field values packed in
+    schema order with marshal, the schema (field names) being stored once in the
+    store. dbm handles are not thread-safe: every access holds `lock`.
+    """
+
+    def __init__(self, path: str, model_class: Type[Any]):
+        self.lock = threading.RLock()
+        self.db = dbm.open(path, 'c')
+        model_fields = model_class.model_fields
+        self.fields: Tuple[str, ...] = tuple(f for f in model_fields if f != 'id')
+        self.defaults = {
+            f: model_fields[f].get_default(call_default_factory=True) if not model_fields[f].is_required() else None
+            for f in self.fields
+        }
+        self.seq = int(self.db[SEQ_KEY]) if SEQ_KEY in self.db else 0
+        self.ids: List[int] = sorted(_ID.unpack(key)[0] for key in self.db.keys() if len(key) == _ID.size)
+        stored = marshal.loads(self.db[SCHEMA_KEY]) if SCHEMA_KEY in self.db else None
+        if stored is not None and tuple(stored) != self.fields:
+            self._migrate(tuple(stored))
+        self.db[SCHEMA_KEY] = marshal.dumps(self.fields)
+
+    def _migrate(self, stored: Tuple[str, ...]):
+        # The model fields changed: repack every record in the new field order
+        for id_ in self.ids:
+            key = _ID.pack(id_)
+            record = dict(zip(stored, marshal.loads(self.db[key])))
+            self.db[key] = self.pack(record)
+
+    def pack(self, record: Dict[str, Any]) -> bytes:
+        try:
+            return marshal.dumps(tuple(record.get(f, self.defaults[f]) for f in self.fields))
+        except ValueError as e:
+            raise ValueError(f"Cannot store record: {e}")
+
+    def read(self, id_: int) -> Optional[Dict[str, Any]]:
+        value = self.db.get(_ID.pack(id_))
+        if value is None:
+            return None
+        record = dict(zip(self.fields, marshal.loads(value)))
+        record['id'] = id_
+        return record
+
+    def write(self, record: Dict[str, Any]):
+        id_ = record['id']
+        key = _ID.pack(id_)
+        if key not in self.db:
+            bisect.insort(self.ids, id_)
+        self.db[key] = self.pack(record)
+
+    def next_ids(self, count: int) -> int:
+        """
+        Reserves `count` ids and returns the first one. The sequence is persisted
+        before the records are written, so ids are never reused.
+        """
+        first_id = self.seq + 1
+        self.seq += count
+        self.db[SEQ_KEY] = str(self.seq).encode()
+        return first_id
+
+    def remove(self, id_: int) -> bool:
+        key = _ID.pack(id_)
+        if key not in self.db:
+            return False
+        del self.db[key]
+        del self.ids[bisect.bisect_left(self.ids, id_)]
+        return True
+
+
+class KVStorage(AbstractStorage):
+    """
+    Key-value storage backend built on the stdlib `dbm` module, one store per
+    table under `directory`. Reads and writes by id are a single key lookup;
+    `list()` walks the ids (kept sorted in memory) and filters the decoded records.
+    """
+
+    def __init__(self, directory: str = 'data'):
+        self.directory = directory
+        self._tables: Dict[str, _KVTable] = {}
+        self._tables_lock = threading.Lock()
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def _table(self, model_class: Type[Any]) -> _KVTable:
+        name = model_class.__tablename__
+        table = self._tables.get(name)
+        if table is None:
+            with self._tables_lock:
+                table = self._tables.get(name)
+                if table is None:
+                    table = self._tables[name] = _KVTable(os.path.join(self.directory, name), model_class)
+        return table
+
+    def close(self):
+        """
+        Closes every store.
+        """
+        with self._tables_lock:
+            for table in self._tables.values():
+                with table.lock:
+                    table.db.close()
+            self._tables = {}
+
+    def create_table(self, model_class: Type[Any]):
+        self._table(model_class)
+
+    def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
+        return self.create_many(model_class, [data])[0]
+
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        items = []
+        if limit == 0:
+            return items
+        for item in self.iter(model_class, after=after, order=order, filters=filters, fields=fields, raw=raw):
+            items.append(item)
+            if len(items) == limit:
+                break
+        return items
+
+    def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+             filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             batch_size: int = 500, raw: bool = False) -> Iterator[Any]:
+        """
+        Full scan in id order, decoding one batch of records at a time.
+        """
+        conditions = parse_filters(model_class, filters)
+        fields = check_fields(model_class, fields)
+        descending = check_order(order) == 'desc'
+        table = self._table(model_class)
+        while True:
+            with table.lock:
+                ids = table.ids
+                if descending:
+                    end = bisect.bisect_left(ids, after) if after is not None else len(ids)
+                    batch_ids = ids[max(end - batch_size, 0):end][::-1]
+                else:
+                    start = bisect.bisect_right(ids, after) if after is not None else 0
+                    batch_ids = ids[start:start + batch_size]
+                records = [table.read(id_) for id_ in batch_ids]
+            for record in records:
+                if record is not None and matches(record, conditions):
+                    yield build_model(model_class, record, fields, raw)
+            if len(batch_ids) < batch_size:
+                return
+            after = batch_ids[-1]
+
+    def get(self, model_class: Type[Any], id: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **filters) -> Any:
+        if id is None:
+            found = self.list(model_class, limit=1, filters=filters, fields=fields, raw=raw)
+            return found[0] if found else None
+        found = self.get_many(model_class, [id], fields=fields, raw=raw)
+        return found[0] if found else None
+
+    def update(self, model_class: Type[Any], id: int, data: Dict[str, Any]):
+        return bool(self.update_many(model_class, [{**data, 'id': id}]))
+
+    def delete(self, model_class: Type[Any], id: int):
+        return bool(self.delete_many(model_class, [id]))
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        if not records:
+            return []
+        table = self._table(model_class)
+        with table.lock:
+            first_id = table.next_ids(len(records))
+            for offset, data in enumerate(records):
+                data['id'] = first_id + offset
+                table.write(data)
+            self.versions.bump(model_class.__tablename__)
+        return [written_model(model_class, data) for data in records]
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        fields = check_fields(model_class, fields)
+        table = self._table(model_class)
+        with table.lock:
+            records = [table.read(id_) for id_ in ids]
+        return [build_model(model_class, record, fields, raw) for record in records if record is not None]
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[int]:
+        for data in records:
+            if data.get('id') is None:
+                raise ValueError("Each record to update must contain an 'id'.")
+        table = self._table(model_class)
+        updated = []
+        with table.lock:
+            for data in records:
+                current = table.read(data['id'])
+                if current is not None:
+                    table.write({**current, **data})
+                    updated.append(data['id'])
+            updated = list(dict.fromkeys(updated))
+            if updated:
+                self.versions.bump(model_class.__tablename__, updated)
+        return updated
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]) -> List[int]:
+        table = self._table(model_class)
+        with table.lock:
+            deleted = [id_ for id_ in dict.fromkeys(ids) if table.remove(id_)]
+            if deleted:
+                self.versions.bump(model_class.__tablename__, deleted)
+        return deleted
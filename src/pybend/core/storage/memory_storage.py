@@ -0,0 +1,375 @@
+# app/storage/memory_storage.py
+
+import bisect
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Type
+
+from .abstract_storage import AbstractStorage
+from .filters import Condition, matches, parse_filters
+from .indexes import declared_indexes
+from .pagination import check_order
+from .records import build_model, check_fields, new_record, written_model
+
+INDEX_KINDS = ('hash', 'sorted')
+
+
+class _HashIndex:
+    """
+    Maps the values of one or more fields to the ids of the records holding them.
+    As in SQL, records with a NULL in the index never conflict on a unique index.
+    """
+
+    def __init__(self, columns: Tuple[str, ...], unique: bool = False):
+        self.columns = columns
+        self.unique = unique
+        self.entries: Dict[Tuple[Any, ...], Set[int]] = {}
+
+    def key(self, record: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(record.get(column) for column in self.columns)
+
+    def check(self, record: Dict[str, Any], table: str):
+        if not self.unique:
+            return
+        key = self.key(record)
+        if None in key:
+            return
+        if self.entries.get(key, set()) - {record.get('id')}:
+            raise ValueError(f"UNIQUE constraint failed: {table}.{', '.join(self.columns)}")
+
+    def add(self, id_: int, record: Dict[str, Any]):
+        self.entries.setdefault(self.key(record), set()).add(id_)
+
+    def remove(self, id_: int, record: Dict[str, Any]):
+        key = self.key(record)
+        ids = self.entries.get(key)
+        if ids is not None:
+            ids.discard(id_)
+            if not ids:
+                del self.entries[key]
+
+    def lookup(self, keys: List[Tuple[Any, ...]]) -> Set[int]:
+        found = set()
+        for key in keys:
+            found |= self.entries.get(key, set())
+        return found
+
+
+class _SortedIndex:
+    """
+    Keeps the (value, id) pairs of one field sorted, for range lookups. NULLs are
+    not indexed, they never match a comparison.
+    """
+
+    def __init__(self, column: str):
+        self.column = column
+        self.entries: List[Tuple[Any, int]] = []
+
+    def add(self, id_: int, record: Dict[str, Any]):
+        value = record.get(self.column)
+        if value is not None:
+            bisect.insort(self.entries, (value, id_))
+
+    def remove(self, id_: int, record: Dict[str, Any]):
+        value = record.get(self.column)
+        if value is not None:
+            position = bisect.bisect_left(self.entries, (value, id_))
+            if position < len(self.entries) and self.entries[position] == (value, id_):
+                del self.entries[position]
+
+    def range(self, op: str, value: Any) -> Set[int]:
+        # Bisect on (value, id) pairs: ids are positive, so (value, 0) sorts before
+        # every entry of `value` and (value, inf) after them
+        low, high = 0, len(self.entries)
+        if op == 'gt':
+            low = bisect.bisect_right(self.entries, (value, float('inf')))
+        elif op == 'gte':
+            low = bisect.bisect_left(self.entries, (value, 0))
+        elif op == 'lt':
+            high = bisect.bisect_left(self.entries, (value, 0))
+        elif op == 'lte':
+            high = bisect.bisect_right(self.entries, (value, float('inf')))
+        return {id_ for _, id_ in self.entries[low:high]}
+
+
+class _MemoryTable:
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.RLock()
+        self.records: Dict[int, Dict[str, Any]] = {}
+        self.ids: List[int] = []  # sorted
+        self.seq = 0
+        self.hash_indexes: List[_HashIndex] = []
+        self.sorted_indexes: Dict[str, _SortedIndex] = {}
+
+    def indexes(self) -> List[Any]:
+        return self.hash_indexes + list(self.sorted_indexes.values())
+
+    def insert(self, record: Dict[str, Any]):
+        for index in self.hash_indexes:
+            index.check(record, self.name)
+        id_ = record['id']
+        self.records[id_] = record
+        bisect.insort(self.ids, id_)
+        for index in self.indexes():
+            index.add(id_, record)
+
+    def replace(self, record: Dict[str, Any]):
+        id_ = record['id']
+        for index in self.hash_indexes:
+            index.check(record, self.name)
+        current = self.records[id_]
+        for index in self.indexes():
+            index.remove(id_, current)
+            index.add(id_, record)
+        self.records[id_] = record
+
+    def remove(self, id_: int):
+        record = self.records.pop(id_, None)
+        if record is None:
+            return
+        del self.ids[bisect.bisect_left(self.ids, id_)]
+        for index in self.indexes():
+            index.remove(id_, record)
+
+    def candidates(self, conditions: List[Condition]) -> Optional[Set[int]]:
+        """
+        Returns the ids selected by the first condition an index can answer, or
+        None when a full scan is needed. Every condition is still checked on the records.
+        """
+        equalities = {field: [value] for field, op, value in conditions if op == 'eq'}
+        equalities.update({field: list(value) for field, op, value in conditions if op == 'in'})
+        if 'id' in equalities:
+            return set(equalities['id'])
+        for index in self.hash_indexes:
+            if all(column in equalities for column in index.columns):
+                keys = [()]
+                for column in index.columns:
+                    keys = [key + (value,) for key in keys for value in equalities[column]]
+                return index.lookup(keys)
+        for field, op, value in conditions:
+            if field in self.sorted_indexes and op in ('lt', 'lte', 'gt', 'gte') and value is not None:
+                return self.sorted_indexes[field].range(op, value)
+        return None
+
+    def build_index(self, index: Any):
+        for id_ in self.ids:
+            record = self.records[id_]
+            if isinstance(index, _HashIndex):
+                index.check(record, self.name)
+            index.add(id_, record)
+
+
+class MemoryStorage(AbstractStorage):
+    """
+    In-memory storage backend: records are dicts keyed by id, for tests and
+    ephemeral data (sessions, rate-limit state).
+
+    The indexes declared on a model (`__indexes__`, `__unique__`) are built as
+    hash indexes, and `create_index()` adds hash or sorted indexes; `list()`
+    uses them for `eq`/`in` and range filters instead of scanning. Every table
+    has its own lock, so mutations are thread-safe.
+
+    With `snapshot_path`, the data is loaded from that JSON file at startup and
+    written back to it by `snapshot()`, on `close()` and, with
+    `snapshot_interval`, periodically from a background thread.
+    """
+
+    def __init__(self, snapshot_path: str = None, snapshot_interval: float = None):
+        self.snapshot_path = snapshot_path
+        self._tables: Dict[str, _MemoryTable] = {}
+        self._tables_lock = threading.Lock()
+        self._snapshot: Dict[str, Any] = {}
+        if snapshot_path and os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                self._snapshot = json.load(f)
+        self._stop = threading.Event()
+        self._snapshotter = None
+        if snapshot_path and snapshot_interval:
+            self._snapshotter = threading.Thread(target=self._snapshot_loop, args=(snapshot_interval,),
+                                                 name='memory-storage-snapshot', daemon=True)
+            self._snapshotter.start()
+
+    def _table(self, model_class: Type[Any]) -> _MemoryTable:
+        name = model_class.__tablename__
+        table = self._tables.get(name)
+        if table is None:
+            with self._tables_lock:
+                table = self._tables.get(name)
+                if table is None:
+                    table = self._tables[name] = _MemoryTable(name)
+                    saved = self._snapshot.pop(name, None)
+                    if saved is not None:
+                        table.seq = saved['seq']
+                        for record in saved['records']:
+                            table.insert(record)
+        return table
+
+    def create_index(self, model_class: Type[Any], fields: Sequence[str], kind: str = 'hash', unique: bool = False):
+        """
+        Adds a secondary index on `fields`: a hash index (equality and `in`
+        filters, optionally unique) or a sorted index on a single field (range filters).
+        """
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind '{kind}', expected one of {list(INDEX_KINDS)}")
+        fields = (fields,) if isinstance(fields, str) else tuple(fields)
+        for field in fields:
+            if field not in model_class.model_fields:
+                raise ValueError(f"Cannot index unknown field '{field}' of {model_class.__name__}")
+        table = self._table(model_class)
+        with table.lock:
+            if kind == 'sorted':
+                if len(fields) != 1 or unique:
+                    raise ValueError("Sorted indexes cover a single, non-unique field")
+                if fields[0] not in table.sorted_indexes:
+                    index = table.sorted_indexes[fields[0]] = _SortedIndex(fields[0])
+                    table.build_index(index)
+            elif not any(index.columns == fields and index.unique == unique for index in table.hash_indexes):
+                index = _HashIndex(fields, unique)
+                table.build_index(index)
+                table.hash_indexes.append(index)
+
+    def snapshot(self):
+        """
+        Writes every table to the snapshot file, atomically.
+        """
+        if not self.snapshot_path:
+            raise ValueError("MemoryStorage has no snapshot_path")
+        with self._tables_lock:
+            tables = list(self._tables.values())
+        data = dict(self._snapshot)
+        for table in tables:
+            with table.lock:
+                # Stored records are replaced on update, never mutated: no copy needed
+                data[table.name] = {'seq': table.seq, 'records': [table.records[id_] for id_ in table.ids]}
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _snapshot_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.snapshot()
+
+    def close(self):
+        """
+        Stops the periodic snapshots and takes a final one.
+        """
+        self._stop.set()
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+        if self.snapshot_path:
+            self.snapshot()
+
+    def create_table(self, model_class: Type[Any]):
+        self._table(model_class)
+        for spec in declared_indexes(model_class):
+            self.create_index(model_class, spec.columns, unique=spec.unique)
+
+    def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
+        return self.create_many(model_class, [data])[0]
+
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        items = []
+        if limit == 0:
+            return items
+        for item in self.iter(model_class, after=after, order=order, filters=filters, fields=fields, raw=raw):
+            items.append(item)
+            if len(items) == limit:
+                break
+        return items
+
+    def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+             filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             batch_size: int = 500, raw: bool = False) -> Iterator[Any]:
+        conditions = parse_filters(model_class, filters)
+        fields = check_fields(model_class, fields)
+        descending = check_order(order) == 'desc'
+        table = self._table(model_class)
+        with table.lock:
+            candidates = table.candidates(conditions)
+            ids = table.ids if candidates is None else sorted(candidates)
+            if after is not None:
+                ids = ids[:bisect.bisect_left(ids, after)] if descending else ids[bisect.bisect_right(ids, after):]
+            ids = ids[::-1] if descending else list(ids)
+        for start in range(0, len(ids), batch_size):
+            with table.lock:
+                records = [table.records.get(id_) for id_ in ids[start:start + batch_size]]
+            for record in records:
+                if record is not None and matches(record, conditions):
+                    yield build_model(model_class, record, fields, raw)
+
+    def get(self, model_class: Type[Any], id: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **filters) -> Any:
+        if id is not None:
+            filters = {**filters, 'id': id}
+        found = self.list(model_class, limit=1, filters=filters, fields=fields, raw=raw)
+        return found[0] if found else None
+
+    def update(self, model_class: Type[Any], id: int, data: Dict[str, Any]):
+        return bool(self.update_many(model_class, [{**data, 'id': id}]))
+
+    def delete(self, model_class: Type[Any], id: int):
+        return bool(self.delete_many(model_class, [id]))
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        table = self._table(model_class)
+        with table.lock:
+            first_id = table.seq + 1
+            records = [new_record(model_class, data, first_id + offset) for offset, data in enumerate(records)]
+            inserted = []
+            try:
+                for data in records:
+                    table.insert(dict(data))
+                    inserted.append(data['id'])
+            except ValueError:
+                # All or nothing, like a transaction
+                for id_ in inserted:
+                    table.remove(id_)
+                raise
+            table.seq += len(records)
+            self.versions.bump(model_class.__tablename__)
+        return [written_model(model_class, data) for data in records]
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        fields = check_fields(model_class, fields)
+        table = self._table(model_class)
+        with table.lock:
+            records = [table.records.get(id_) for id_ in ids]
+        return [build_model(model_class, record, fields, raw) for record in records if record is not None]
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[int]:
+        for data in records:
+            if data.get('id') is None:
+                raise ValueError("Each record to update must contain an 'id'.")
+        table = self._table(model_class)
+        with table.lock:
+            previous = []
+            try:
+                for data in records:
+                    current = table.records.get(data['id'])
+                    if current is not None:
+                        table.replace({**current, **data})
+                        previous.append(current)
+            except ValueError:
+                for record in reversed(previous):
+                    table.replace(record)
+                raise
+            updated = list(dict.fromkeys(record['id'] for record in previous))
+            if updated:
+                self.versions.bump(model_class.__tablename__, updated)
+        return updated
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]) -> List[int]:
+        table = self._table(model_class)
+        with table.lock:
+            deleted = [id_ for id_ in dict.fromkeys(ids) if id_ in table.records]
+            for id_ in deleted:
+                table.remove(id_)
+            if deleted:
+                self.versions.bump(model_class.__tablename__, deleted)
+        return deleted
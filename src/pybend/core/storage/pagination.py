@@ -0,0 +1,39 @@
+# app/storage/pagination.py
+
+import base64
+import json
+from typing import Optional, Tuple
+
+ORDERS = ('asc', 'desc')
+
+
+def encode_cursor(last_id: int, order: str = 'asc') -> str:
+    """
+    Encodes the keyset position of a page into an opaque, URL safe cursor.
+    """
+    payload = json.dumps({'after': last_id, 'order': order}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[int], str]:
+    """
+    Decodes a cursor produced by `encode_cursor` into `(after, order)`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        after, order = payload['after'], payload['order']
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if order not in ORDERS or not isinstance(after, int):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return after, order
+
+
+def check_order(order: str) -> str:
+    if order not in ORDERS:
+        raise ValueError(f"Invalid order {order!r}, expected one of {ORDERS}")
+    return order
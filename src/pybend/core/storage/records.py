@@ -0,0 +1,105 @@
+# app/storage/records.py
+
+import functools
+from typing import Any, Dict, Optional, Sequence, Tuple, Type
+
+
+def check_fields(model_class: Type[Any], fields: Optional[Sequence[str]]) -> Optional[Tuple[str, ...]]:
+    """
+    Validates a sparse fieldset against the model fields and returns it in column
+    order ('id' first, always included). None means all fields.
+
+    Raises:
+        ValueError: On an unknown field.
+    """
+    if not fields:
+        return None
+    unknown = [field for field in fields if field not in model_class.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown field(s) {unknown} for {model_class.__name__}")
+    return ('id',) + tuple(f for f in model_class.model_fields if f != 'id' and f in fields)
+
+
+def record_id(item: Any) -> Any:
+    """
+    Returns the id of a model or of a raw record.
+    """
+    return item['id'] if isinstance(item, dict) else item.id
+
+
+def is_trusted(model_class: Type[Any]) -> bool:
+    """
+    Whether rows read back from storage can be built without validation (see ProtoModel.__trusted__).
+    """
+    return getattr(model_class, '__trusted__', False)
+
+
+def partial_model(model_class: Type[Any], record: Dict[str, Any], fields: Tuple[str, ...]) -> Any:
+    """
+    Builds a model holding only `fields`, without validating the omitted ones.
+    Only those fields are marked as set, so `model_dump(exclude_unset=True)` returns them alone.
+    """
+    model_fields = model_class.model_fields
+    values = {(model_fields[f].alias or f): record.get(f) for f in fields}
+    return model_class.model_construct(_fields_set=set(fields), **values)
+
+
+@functools.lru_cache(maxsize=None)
+def field_aliases(model_class: Type[Any]) -> Dict[str, str]:
+    """
+    Returns the {field name: alias} mapping of the aliased fields of a model.
+    """
+    return {name: field.alias for name, field in model_class.model_fields.items() if field.alias}
+
+
+def raw_record(model_class: Type[Any], record: Dict[str, Any],
+               fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+    """
+    Returns a stored record as a plain dict shaped like `model_dump()`: keyed by
+    field name, with the defaults of the fields the record lacks.
+    """
+    model_fields = model_class.model_fields
+    return {
+        field: record[field] if field in record else model_fields[field].get_default(call_default_factory=True)
+        for field in (fields if fields is not None else model_fields)
+    }
+
+
+def new_record(model_class: Type[Any], data: Dict[str, Any], id_: int) -> Dict[str, Any]:
+    """
+    Returns the record to store for new data under `id_`: every model field, with
+    the defaults of those the data lacks, as the SQLite backend inserts them, so
+    that filters on defaulted fields match the same records on every backend.
+    """
+    return raw_record(model_class, {**data, 'id': id_})
+
+
+def written_model(model_class: Type[Any], record: Dict[str, Any]) -> Any:
+    """
+    Builds a model from a record keyed by field name without validating it: for
+    trusted rows, and for records just written from validated data (see
+    StorableMixin), which are returned as is whatever `__trusted__`.
+    """
+    aliases = field_aliases(model_class)
+    if aliases:
+        record = {aliases.get(key, key): value for key, value in record.items()}
+    return model_class.model_construct(**record)
+
+
+def build_model(model_class: Type[Any], record: Dict[str, Any], fields: Optional[Tuple[str, ...]] = None,
+                raw: bool = False) -> Any:
+    """
+    Builds a model from a stored record keyed by field name, or a partial model
+    when a sparse fieldset (from `check_fields`) is given. Trusted models are
+    built without validation, and `raw` returns the record itself as a dict.
+    """
+    if raw:
+        return raw_record(model_class, record, fields)
+    if fields is not None:
+        return partial_model(model_class, record, fields)
+    if is_trusted(model_class):
+        return written_model(model_class, record)
+    aliases = field_aliases(model_class)
+    if aliases:
+        record = {aliases.get(key, key): value for key, value in record.items()}
+    return model_class(**record)
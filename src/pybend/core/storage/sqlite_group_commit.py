@@ -0,0 +1,155 @@
+# app/storage/sqlite_group_commit.py
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .sqlite_pool import SQLiteConnectionPool
+
+# When a caller gets the result of its mutation:
+# - 'full': once its group is committed, with PRAGMA synchronous = FULL (survives power loss)
+# - 'normal': once its group is committed, with PRAGMA synchronous = NORMAL (in WAL mode,
+#   survives an application crash, the last commits may be lost on power loss)
+# - 'async': as soon as the statement has run, before the group commits. Fastest, but a
+#   failed commit is only logged (and counted in `GroupCommitWriter.stats()`) and readers
+#   may not see the write yet.
+DURABILITY_MODES = ('full', 'normal', 'async')
+SYNCHRONOUS = {'full': 'FULL', 'normal': 'NORMAL', 'async': 'NORMAL'}
+
+Mutation = Callable[[sqlite3.Connection], Any]
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+def check_durability(durability: str) -> str:
+    if durability not in DURABILITY_MODES:
+        raise ValueError(f"Invalid durability '{durability}', expected one of {', '.join(DURABILITY_MODES)}")
+    return durability
+
+
+class GroupCommitWriter:
+    """
+    Write-behind queue for a SQLiteConnectionPool: a single writer thread drains
+    the submitted mutations and commits them in groups of up to `max_batch`:
+    those queued while the previous group was committing, plus those arriving
+    within `window` seconds after the first one. The fsync cost of a commit is
+    thus shared by the whole group.
+
+    Each mutation runs in its own savepoint, so a failing one is rolled back
+    alone and only its caller gets the error. A failed commit fails the callers
+    still waiting for it; `stats()` counts the commits, the failed ones and the
+    mutations already acknowledged (durability 'async') that they lost.
+    """
+
+    def __init__(self, pool: SQLiteConnectionPool, durability: str = 'normal',
+                 max_batch: int = 256, window: float = 0.0):
+        self.pool = pool
+        self.durability = check_durability(durability)
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._closed = False
+        # Updated by the writer thread only
+        self.commits = 0
+        self.failed_commits = 0
+        self.lost_mutations = 0
+        self.last_error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name='sqlite-group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, mutation: Mutation) -> "Future[Any]":
+        """
+        Queues a mutation, a callable run with the writer connection. The returned
+        future resolves to its result, according to the durability mode.
+        """
+        if self._closed:
+            raise RuntimeError("Group commit writer is closed")
+        future: "Future[Any]" = Future()
+        self._queue.put((mutation, future))
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the commit, failed commit and lost mutation counters, and the last commit error.
+        """
+        return {'commits': self.commits, 'failed_commits': self.failed_commits,
+                'lost_mutations': self.lost_mutations, 'last_error': self.last_error}
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+        # Mutations that raced with close() are failed rather than left pending forever
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                item[1].set_exception(RuntimeError("Group commit writer is closed"))
+
+    def _commit(self, batch: List[Tuple[Mutation, "Future[Any]"]]):
+        results = []
+        acknowledged = 0
+        try:
+            with self.pool.writer() as conn:
+                for mutation, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT mutation")
+                    try:
+                        result = mutation(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO mutation")
+                        conn.execute("RELEASE mutation")
+                        future.set_exception(e)
+                        continue
+                    conn.execute("RELEASE mutation")
+                    if self.durability == 'async':
+                        future.set_result(result)
+                        acknowledged += 1
+                    else:
+                        results.append((future, result))
+        except Exception as e:
+            self.failed_commits += 1
+            self.lost_mutations += acknowledged
+            self.last_error = e
+            logger.exception("Group commit of %d mutations failed, %d of them already acknowledged",
+                             len(batch), acknowledged)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.commits += 1
+        for future, result in results:
+            future.set_result(result)
+
+    def close(self):
+        """
+        Commits the mutations already queued and stops the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
@@ -0,0 +1,150 @@
+# app/storage/sqlite_plan.py
+
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple, Type
+
+from .filters import field_type
+from .records import is_trusted, partial_model
+
+
+def sql_type(python_type: Any) -> str:
+    """
+    Maps a (non-Optional) python field type to an SQLite column type.
+    """
+    if python_type in (int, bool):
+        return 'INTEGER'
+    elif python_type == float:
+        return 'REAL'
+    return 'TEXT'  # Default to TEXT
+
+
+class Projection(NamedTuple):
+    """
+    A compiled column subset of a table: the SELECT prefix and the matching row mapper.
+    """
+    columns: Tuple[str, ...]
+    select_sql: str
+    to_model: Callable[[Sequence[Any]], Any]
+
+
+class TablePlan:
+    """
+    Everything SQLiteStorage needs to query one model's table, compiled once:
+    the column order, the SQL statements and the row-to-model mapper.
+    """
+
+    def __init__(self, model_class: Type[Any]):
+        self.model_class = model_class
+        self.table = model_class.__tablename__
+        fields = model_class.model_fields
+        # Fixed column order: id first, then the model fields in declaration order
+        self.columns: Tuple[str, ...] = ('id',) + tuple(f for f in fields if f != 'id')
+        self.insert_columns: Tuple[str, ...] = self.columns[1:]
+        # Keys used to build models from rows, honouring field aliases (e.g. Product.id -> product_id)
+        self.keys: Tuple[str, ...] = tuple(
+            (fields[c].alias or c) if c in fields else c for c in self.columns
+        )
+
+        # Fields omitted from the data (e.g. dumped with exclude_unset) are stored with their default
+        self.defaults = {c: fields[c] for c in self.insert_columns if not fields[c].is_required()}
+
+        column_defs = ", ".join(f"{c} {sql_type(field_type(model_class, c))}" for c in self.insert_columns)
+        self.create_table_sql = (
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            f"(id INTEGER PRIMARY KEY AUTOINCREMENT{', ' if column_defs else ''}{column_defs})"
+        )
+        self.select_columns = ", ".join(self.columns)
+        self.insert_sql = (
+            f"INSERT INTO {self.table} ({', '.join(self.insert_columns)}) "
+            f"VALUES ({', '.join(['?'] * len(self.insert_columns))})"
+        )
+        self.select_sql = f"SELECT {self.select_columns} FROM {self.table}"
+        self.select_by_id_sql = f"{self.select_sql} WHERE id = ?"
+        self.delete_sql = f"DELETE FROM {self.table} WHERE id = ?"
+        self._update_sql: Dict[Tuple[str, ...], str] = {}
+        # SQLite has no boolean type: these columns come back as 0/1 and are converted
+        # when rows skip validation
+        self.bool_columns = frozenset(c for c in self.insert_columns if field_type(model_class, c) is bool)
+        self.to_model: Callable[[Sequence[Any]], Any] = self._compile_mapper()
+        self.full = Projection(self.columns, self.select_sql, self.to_model)
+        self._projections: Dict[Tuple[Optional[Tuple[str, ...]], bool], Projection] = {}
+
+    def _compile_mapper(self) -> Callable[[Sequence[Any]], Any]:
+        model_class, keys = self.model_class, self.keys
+        if is_trusted(model_class):
+            # Rows were validated when written: build the model without validating it again
+            decode = self._decoder(self.columns)
+
+            def to_model(row: Sequence[Any]) -> Any:
+                return model_class.model_construct(**dict(zip(keys, decode(row))))
+        else:
+            def to_model(row: Sequence[Any]) -> Any:
+                return model_class(**dict(zip(keys, row)))
+        return to_model
+
+    def _decoder(self, columns: Tuple[str, ...]) -> Callable[[Sequence[Any]], Sequence[Any]]:
+        positions = [i for i, column in enumerate(columns) if column in self.bool_columns]
+        if not positions:
+            return lambda row: row
+
+        def decode(row: Sequence[Any]) -> Sequence[Any]:
+            row = list(row)
+            for i in positions:
+                if row[i] is not None:
+                    row[i] = bool(row[i])
+            return row
+        return decode
+
+    def projection(self, fields: Optional[Tuple[str, ...]], raw: bool = False) -> Projection:
+        """
+        Returns the compiled projection of a sparse fieldset (as returned by
+        `records.check_fields`), or of all columns for None. Raw projections
+        map rows to plain dicts instead of models.
+        """
+        if fields is None and not raw:
+            return self.full
+        projection = self._projections.get((fields, raw))
+        if projection is None:
+            model_class = self.model_class
+            columns = fields if fields is not None else self.columns
+            decode = self._decoder(columns)
+            if raw:
+                def to_model(row: Sequence[Any]) -> Any:
+                    return dict(zip(columns, decode(row)))
+            else:
+                def to_model(row: Sequence[Any]) -> Any:
+                    return partial_model(model_class, dict(zip(columns, decode(row))), columns)
+            projection = self._projections[(fields, raw)] = Projection(
+                columns, f"SELECT {', '.join(columns)} FROM {self.table}", to_model
+            )
+        return projection
+
+    def written_model(self, row: Sequence[Any]) -> Any:
+        """
+        Builds the model of a row just inserted (id, then the insert values) without
+        validating it: its values come from validated data, not from the database.
+        """
+        return self.model_class.model_construct(**dict(zip(self.keys, row)))
+
+    def insert_values(self, data: Dict[str, Any]) -> list:
+        return [
+            data[column] if column in data
+            else self.defaults[column].get_default(call_default_factory=True) if column in self.defaults
+            else None
+            for column in self.insert_columns
+        ]
+
+    def update_sql(self, fields: Tuple[str, ...]) -> str:
+        """
+        Returns the UPDATE statement for a set of fields, cached per distinct field tuple.
+        """
+        sql = self._update_sql.get(fields)
+        if sql is None:
+            set_clause = ", ".join([f"{field} = ?" for field in fields])
+            sql = self._update_sql[fields] = f"UPDATE {self.table} SET {set_clause} WHERE id = ?"
+        return sql
+
+    def update_fields(self, data: Dict[str, Any]) -> Tuple[str, ...]:
+        """
+        Returns the updatable fields present in `data`, in column order.
+        """
+        return tuple(column for column in self.insert_columns if column in data)
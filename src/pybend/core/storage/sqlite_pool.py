@@ -0,0 +1,230 @@
+# app/storage/sqlite_pool.py
+
+import contextvars
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .abstract_storage import StorageBusy
+
+# The busy_timeout PRAGMA defaults to the pool's `timeout`
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,  # 256 MiB
+    'cache_size': -16000,  # ~16 MiB, negative values are KiB
+}
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    Connection passing the SQL it executes, with its placeholders, and the
+    parameters bound to it (the first row's for an executemany) to `trace` if set.
+    """
+    trace: Optional[Callable[[str, Sequence[Any]], None]] = None
+
+    def execute(self, sql, parameters=(), /):
+        if self.trace is not None:
+            self.trace(sql, parameters)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, parameters, /):
+        if self.trace is not None:
+            parameters = list(parameters)
+            self.trace(sql, parameters[0] if parameters else ())
+        return super().executemany(sql, parameters)
+
+
+class SQLiteConnectionPool:
+    """
+    Pool of persistent SQLite connections: a bounded set of reader connections
+    and a single dedicated writer connection serialized by a lock.
+
+    Connections are opened lazily, configured once with the given PRAGMAs and
+    reused for the lifetime of the pool, so requests no longer pay the
+    connect/close and page-cache warmup cost. A writer waits at most `timeout`
+    seconds for the writer lock, then gets StorageBusy; the same `timeout` bounds
+    the waits for SQLite's own locks (busy_timeout), unless a PRAGMA sets it.
+    """
+
+    def __init__(self, database: str, pragmas: Optional[Dict[str, Any]] = None,
+                 max_readers: int = 8, timeout: float = 30.0):
+        self.database = database
+        self.pragmas = {**DEFAULT_PRAGMAS, 'busy_timeout': int(timeout * 1000), **(pragmas or {})}
+        self.max_readers = max_readers
+        self.timeout = timeout
+        # An in-memory database only exists inside the connection that created
+        # it, so readers and writer must share that single connection.
+        self.shared = database == ':memory:' or database.startswith('file::memory:')
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        self._write_owner: Optional[int] = None
+        # Set while the current context holds a `transaction()`, seen by the threads it is copied to
+        self._in_transaction = contextvars.ContextVar(f'sqlite-transaction-{id(self)}', default=False)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._closed = False
+        self._trace_callback: Optional[Callable[[str, Sequence[Any]], None]] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            check_same_thread=False,
+            isolation_level=None,  # transactions are managed explicitly
+            uri=self.database.startswith('file:'),
+            factory=TracedConnection,
+        )
+        for name, value in self.pragmas.items():
+            if value is None:
+                continue
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn.trace = self._trace_callback
+        return conn
+
+    def set_trace_callback(self, callback: Optional[Callable[[str, Sequence[Any]], None]]):
+        """
+        Installs a trace callback, called with the SQL of every statement run (its
+        placeholders unexpanded) and its parameters, on all connections of the
+        pool, current and future. None removes it.
+        """
+        self._trace_callback = callback
+        with self._readers_lock:
+            connections = [self._writer, *self._readers]
+        for conn in connections:
+            if conn is not None:
+                conn.trace = callback
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError(f"Connection pool for '{self.database}' is closed")
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    @contextmanager
+    def writer(self):
+        """
+        Yields the writer connection inside a transaction. Commits on success,
+        rolls back on error. Nested use from the same thread joins the
+        outer transaction, as does any use from a context holding a `transaction()`.
+        Raises StorageBusy when the writer lock is not free within `timeout` seconds.
+        """
+        if self._in_transaction.get():
+            yield self._writer
+            return
+        if not self._write_lock.acquire(timeout=self.timeout):
+            raise StorageBusy(f"The writer of '{self.database}' stayed busy for {self.timeout}s")
+        try:
+            conn = self._writer_connection()
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            self._write_owner = threading.get_ident()
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                try:
+                    conn.execute("COMMIT")
+                except BaseException:
+                    # A failed COMMIT (e.g. a deferred constraint) can leave the transaction open
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+            finally:
+                self._write_owner = None
+        finally:
+            self._write_lock.release()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Holds the writer transaction for the current context until the block
+        exits: writes and reads made from this context, on this thread or on the
+        threads it is copied to (e.g. by AsyncStorageAdapter), join it and see its
+        uncommitted writes. Commits on success, rolls back on error. The calls of
+        one context must not overlap, other contexts wait for the writer.
+        """
+        if self._in_transaction.get():
+            yield self._writer
+            return
+        with self.writer() as conn:
+            token = self._in_transaction.set(True)
+            try:
+                yield conn
+            finally:
+                self._in_transaction.reset(token)
+
+    def owns_writer(self) -> bool:
+        """
+        Whether the current thread is inside a `writer()` transaction, or the current
+        context inside a `transaction()`.
+        """
+        return self._write_owner == threading.get_ident() or self._in_transaction.get()
+
+    @contextmanager
+    def reader(self):
+        """
+        Checks a reader connection out of the pool for the duration of the block.
+        Inside a `transaction()`, its writer connection is used instead.
+        """
+        if self._in_transaction.get():
+            yield self._writer
+            return
+        if self.shared:
+            with self._write_lock:
+                yield self._writer_connection()
+            return
+
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError(f"Connection pool for '{self.database}' is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if len(self._readers) < self.max_readers:
+                conn = self._connect()
+                self._readers.append(conn)
+                return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError(f"Timed out waiting for a reader connection to '{self.database}'")
+
+    def close(self):
+        """
+        Closes every connection held by the pool. Reader connections currently
+        checked out are closed when they are returned.
+        """
+        self._closed = True
+        with self._readers_lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+            self._readers = []
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
@@ -1,171 +1,289 @@
 # app/storage/sqlite_storage.py
 
 import sqlite3
-from typing import Any, Dict, List, Type
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
 from .abstract_storage import AbstractStorage
+from .filters import compile_where, parse_filters
+from .indexes import declared_indexes, index_name
+from .pagination import check_order
+from .records import check_fields
+from .sqlite_group_commit import SYNCHRONOUS, GroupCommitWriter, Mutation, check_durability
+from .sqlite_plan import Projection, TablePlan
+from .sqlite_pool import SQLiteConnectionPool
 
 class SQLiteStorage(AbstractStorage):
     """
     SQLite storage backend implementing the AbstractStorage.
+
+    Connections are persistent and pooled (see SQLiteConnectionPool): reads go
+    through pooled reader connections, writes through a single writer connection.
+
+    With `group_commit`, writes are queued to a GroupCommitWriter that commits
+    them in groups of up to `commit_batch` mutations (optionally waiting
+    `commit_window` seconds for more), so concurrent writers share each fsync. `durability` sets
+    when callers get their result (see `sqlite_group_commit.DURABILITY_MODES`)
+    and the matching `synchronous` PRAGMA.
     """
 
-    def __init__(self, database: str = 'database.db'):
+    def __init__(self, database: str = 'database.db', pragmas: Optional[Dict[str, Any]] = None,
+                 max_readers: int = 8, group_commit: bool = False, durability: str = None,
+                 commit_batch: int = 256, commit_window: float = 0.0, timeout: float = 30.0):
         self.database = database
+        if durability is not None:
+            pragmas = {**(pragmas or {}), 'synchronous': SYNCHRONOUS[check_durability(durability)]}
+        self.pool = SQLiteConnectionPool(database, pragmas=pragmas, max_readers=max_readers, timeout=timeout)
+        self.group_commit = GroupCommitWriter(
+            self.pool, durability=durability or 'normal', max_batch=commit_batch, window=commit_window
+        ) if group_commit else None
+        self._plans: Dict[Type[Any], TablePlan] = {}
+
+    def close(self):
+        """
+        Commits the queued writes, then closes all pooled connections.
+        """
+        if self.group_commit is not None:
+            self.group_commit.close()
+        self.pool.close()
+
+    def _write(self, mutation: Mutation) -> Any:
+        """
+        Runs a mutation with the writer connection, in its own transaction or, in
+        group commit mode, in the next group. Returns the mutation's result.
+        """
+        # Inside an enclosing transaction the mutation joins it, queuing it would deadlock
+        if self.group_commit is None or self.pool.owns_writer():
+            with self.pool.writer() as conn:
+                return mutation(conn)
+        return self.group_commit.submit(mutation).result()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the block in one transaction on the writer connection: the writes made
+        from this context, on any thread, commit together when it exits or roll
+        back if it raises, and its reads see them (see SQLiteConnectionPool.transaction).
+        Other writers wait until it ends. Versions are bumped on commit.
+        """
+        with self.versions.deferred(), self.pool.transaction():
+            yield self
+
+    def plan(self, model_class: Type[Any]) -> TablePlan:
+        """
+        Returns the compiled TablePlan of a model, compiling it on first use.
+        """
+        plan = self._plans.get(model_class)
+        if plan is None:
+            plan = self._plans[model_class] = TablePlan(model_class)
+        return plan
 
     def create_table(self, model_class: Type[Any]):
-        # Implementation similar to previous create_table method
-        # Use model_class.__annotations__ to get fields
-        # ...
-
-        # (Include the same create_table logic as before, adjusted to fit this method)
-
-        # Example:
-        table_name = model_class.__tablename__
-        columns = []
-        for field_name, field_type in model_class.__annotations__.items():
-            if field_name == 'id':
-                continue  # 'id' is added separately
-
-            # Handle typing annotations like Optional[int]
-            origin_type = getattr(field_type, '__origin__', None)
-            if origin_type is not None:
-                field_type = field_type.__args__[0]
-
-            if field_type == int:
-                sql_type = 'INTEGER'
-            elif field_type == float:
-                sql_type = 'REAL'
-            elif field_type == str:
-                sql_type = 'TEXT'
-            else:
-                sql_type = 'TEXT'  # Default to TEXT
-            columns.append(f"{field_name} {sql_type}")
-
-        columns_sql = ", ".join(columns)
-        create_table_sql = f"""
-        CREATE TABLE IF NOT EXISTS {table_name} (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            {columns_sql}
-        )
-        """
-        conn = sqlite3.connect(self.database)
-        cursor = conn.cursor()
-        cursor.execute(create_table_sql)
-        conn.commit()
-        conn.close()
+        # (Re)compile the plan: registering a model again invalidates its cached statements
+        plan = self._plans[model_class] = TablePlan(model_class)
+        with self.pool.writer() as conn:
+            conn.execute(plan.create_table_sql)
+            for spec in declared_indexes(model_class):
+                unique = "UNIQUE " if spec.unique else ""
+                conn.execute(
+                    f"CREATE {unique}INDEX IF NOT EXISTS {index_name(plan.table, spec)} "
+                    f"ON {plan.table} ({', '.join(spec.columns)})"
+                )
 
     def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
-        # Implementation similar to previous create method
-        # ...
-
-        print("Creating a new record in the database for model class:", model_class.__name__, flush=True)
-        table_name = model_class.__tablename__
-        fields = [f for f in model_class.model_fields.keys() if f != 'id']
-        print("Fields: ", fields)
-        placeholders = ", ".join(['?'] * len(fields))
-        columns = ", ".join(fields)
-        values = [data.get(field) for field in fields]
-        insert_sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        conn = sqlite3.connect(self.database)
-        cursor = conn.cursor()
-        cursor.execute(insert_sql, values)
-        conn.commit()
-        data['id'] = cursor.lastrowid
-        conn.close()
-        return model_class(**data)
-
-    def list(self, model_class: Type[Any]) -> List[Any]:
-        # Implementation similar to previous get_all method
-        # ...
-
-        table_name = model_class.__tablename__
-        select_sql = f"SELECT * FROM {table_name}"
-        conn = sqlite3.connect(self.database)
-        cursor = conn.cursor()
-        cursor.execute(select_sql)
-        rows = cursor.fetchall()
-        columns = [column[0] for column in cursor.description]
-        conn.close()
-        return [model_class(**dict(zip(columns, row))) for row in rows]
-
-    def get(self, model_class: Type[Any], id: int) -> Any:
-        # Implementation similar to previous get_by_id method
-        # ...
-
-        table_name = model_class.__tablename__
-        select_sql = f"SELECT * FROM {table_name} WHERE id = ?"
-        conn = sqlite3.connect(self.database)
-        cursor = conn.cursor()
-        cursor.execute(select_sql, (id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            columns = [column[0] for column in cursor.description]
-            record = dict(zip(columns, row))
-            object = {key: value for key, value in record.items() if key in model_class.model_fields}
-            print(object)
-            return model_class(**object)
-        else:
-            return None
+        plan = self.plan(model_class)
+        values = plan.insert_values(data)
+        id = self._write(lambda conn: conn.execute(plan.insert_sql, values).lastrowid)
+        self.versions.bump(plan.table)
+        return plan.written_model([id] + values)
+
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        """
+        Lists records using keyset pagination on the primary key. Filters are
+        compiled into a parameterized WHERE clause, `fields` into the column list.
+        """
+        projection = self.plan(model_class).projection(check_fields(model_class, fields), raw)
+        select_sql, params = self._select(model_class, projection, limit, after, order, filters)
+        with self.pool.reader() as conn:
+            rows = conn.execute(select_sql, params).fetchall()
+        return [projection.to_model(row) for row in rows]
+
+    def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+             filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             batch_size: int = 500, raw: bool = False) -> Iterator[Any]:
+        """
+        Streams the matching records from a single cursor with fetchmany. A reader
+        connection stays checked out until the iterator is exhausted or closed.
+        """
+        projection = self.plan(model_class).projection(check_fields(model_class, fields), raw)
+        select_sql, params = self._select(model_class, projection, None, after, order, filters)
+        with self.pool.reader() as conn:
+            cursor = conn.execute(select_sql, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield projection.to_model(row)
+            finally:
+                cursor.close()
+
+    def _select(self, model_class: Type[Any], projection: Projection, limit: Optional[int],
+                after: Optional[int], order: str, filters: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        direction = 'DESC' if check_order(order) == 'desc' else 'ASC'
+        where, params = compile_where(parse_filters(model_class, filters))
+        clauses = [where] if where else []
+        if after is not None:
+            clauses.append("id < ?" if direction == 'DESC' else "id > ?")
+            params.append(after)
+        select_sql = projection.select_sql
+        if clauses:
+            select_sql += " WHERE " + " AND ".join(clauses)
+        select_sql += f" ORDER BY id {direction}"
+        if limit is not None:
+            select_sql += " LIMIT ?"
+            params.append(limit)
+        return select_sql, params
+
+    def get(self, model_class: Type[Any], id: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **filters) -> Any:
+        if id is None:
+            matches = self.list(model_class, limit=1, filters=filters, fields=fields, raw=raw)
+            return matches[0] if matches else None
+
+        plan = self.plan(model_class)
+        projection = plan.projection(check_fields(model_class, fields), raw)
+        select_sql = plan.select_by_id_sql if projection is plan.full else f"{projection.select_sql} WHERE id = ?"
+        with self.pool.reader() as conn:
+            cursor = conn.execute(select_sql, (id,))
+            row = cursor.fetchone()
+            cursor.close()
+        return projection.to_model(row) if row else None
 
     def update(self, model_class: Type[Any], id: int, data: Dict[str, Any]):
         """
         Updates a record in the database for the given model class, using only the fields provided in the `data` dictionary.
         Prevents SQL injection by using parameterized queries.
         """
-        table_name = model_class.__tablename__
-
-        # Validate and filter the fields based on model annotations
-        valid_fields = [f for f in model_class.__annotations__.keys() if f != 'id']
-        fields_to_update = [field for field in data.keys() if field in valid_fields]
-
+        plan = self.plan(model_class)
+        fields_to_update = plan.update_fields(data)
         if not fields_to_update:
             raise ValueError("No valid fields provided to update.")
-
-        # Construct the SET clause dynamically
-        set_clause = ", ".join([f"{field} = ?" for field in fields_to_update])
         values = [data[field] for field in fields_to_update]
-
-        # Add the id to the values for the WHERE clause
-        update_sql = f"UPDATE {table_name} SET {set_clause} WHERE id = ?"
         values.append(id)
 
-        # Execute the update query
-        conn = sqlite3.connect(self.database)
-        cursor = conn.cursor()
-
+        update_sql = plan.update_sql(fields_to_update)
         try:
-            cursor.execute(update_sql, values)
-            conn.commit()
+            updated = self._write(lambda conn: conn.execute(update_sql, values).rowcount)
         except sqlite3.Error as e:
             raise RuntimeError(f"Database update failed: {e}")
-        finally:
-            conn.close()
-    """
-        def update(self, model_class: Type[Any], id: int, data: Dict[str, Any]):
-            # Implementation similar to previous update method
-            # ...
-
-            table_name = model_class.__tablename__
-            fields = [f for f in model_class.__annotations__.keys() if f != 'id']
-            set_clause = ", ".join([f"{field} = ?" for field in fields])
-            values = [data.get(field) for field in data.keys() if field in fields]
-            update_sql = f"UPDATE {table_name} SET {set_clause} WHERE id = ?"
-            conn = sqlite3.connect(self.database)
-            cursor = conn.cursor()
-            cursor.execute(update_sql, values + [id])
-            conn.commit()
-            conn.close()
-    """
+        if updated:
+            self.versions.bump(plan.table, [id])
+        return bool(updated)
 
     def delete(self, model_class: Type[Any], id: int):
-        # Implementation similar to previous delete method
-        # ...
-
-        table_name = model_class.__tablename__
-        delete_sql = f"DELETE FROM {table_name} WHERE id = ?"
-        conn = sqlite3.connect(self.database)
-        cursor = conn.cursor()
-        cursor.execute(delete_sql, (id,))
-        conn.commit()
-        conn.close()
+        plan = self.plan(model_class)
+        deleted = self._write(lambda conn: conn.execute(plan.delete_sql, (id,)).rowcount)
+        if deleted:
+            self.versions.bump(plan.table, [id])
+        return bool(deleted)
+
+    # Bulk operations
+
+    # Keeps `IN (...)` lists below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds
+    MAX_IN_PARAMS = 500
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Inserts all records with a single executemany in one transaction.
+        """
+        if not records:
+            return []
+        plan = self.plan(model_class)
+        rows = [plan.insert_values(data) for data in records]
+
+        def insert(conn) -> int:
+            conn.executemany(plan.insert_sql, rows)
+            # The writer connection is not shared meanwhile, so the ids are contiguous
+            return conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        last_id = self._write(insert)
+        self.versions.bump(plan.table)
+        first_id = last_id - len(records) + 1
+        return [plan.written_model([first_id + offset] + values) for offset, values in enumerate(rows)]
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        """
+        Fetches the records matching `ids` with `IN (...)` queries, in the order of `ids`.
+        Missing ids are skipped.
+        """
+        projection = self.plan(model_class).projection(check_fields(model_class, fields), raw)
+        found = {}
+        with self.pool.reader() as conn:
+            for start in range(0, len(ids), self.MAX_IN_PARAMS):
+                chunk = ids[start:start + self.MAX_IN_PARAMS]
+                placeholders = ", ".join(['?'] * len(chunk))
+                for row in conn.execute(f"{projection.select_sql} WHERE id IN ({placeholders})", chunk):
+                    found[row[0]] = row
+        return [projection.to_model(found[id_]) for id_ in ids if id_ in found]
+
+    def _existing_ids(self, conn: sqlite3.Connection, table: str, ids: List[int]) -> List[int]:
+        """
+        Returns the ids of `ids` that have a row, once each, in the order given.
+        """
+        found = set()
+        for start in range(0, len(ids), self.MAX_IN_PARAMS):
+            chunk = ids[start:start + self.MAX_IN_PARAMS]
+            placeholders = ", ".join(['?'] * len(chunk))
+            found.update(row[0] for row in conn.execute(f"SELECT id FROM {table} WHERE id IN ({placeholders})", chunk))
+        return [id_ for id_ in dict.fromkeys(ids) if id_ in found]
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[int]:
+        """
+        Updates several records in one transaction. Records updating the same set of
+        fields are grouped into a single executemany. Returns the ids updated, those
+        of missing records being skipped.
+        """
+        plan = self.plan(model_class)
+        groups: Dict[tuple, List[List[Any]]] = {}
+        for data in records:
+            if data.get('id') is None:
+                raise ValueError("Each record to update must contain an 'id'.")
+            fields_to_update = plan.update_fields(data)
+            if not fields_to_update:
+                raise ValueError("No valid fields provided to update.")
+            groups.setdefault(fields_to_update, []).append([data[field] for field in fields_to_update] + [data['id']])
+
+        def update(conn) -> List[int]:
+            updated = self._existing_ids(conn, plan.table, [data['id'] for data in records])
+            found = set(updated)
+            for fields_to_update, values in groups.items():
+                conn.executemany(plan.update_sql(fields_to_update), [row for row in values if row[-1] in found])
+            return updated
+        try:
+            updated = self._write(update)
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Database update failed: {e}")
+        if updated:
+            self.versions.bump(plan.table, updated)
+        return updated
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]) -> List[int]:
+        """
+        Deletes the records of `ids` in one transaction and returns the ids deleted.
+        """
+        plan = self.plan(model_class)
+
+        def delete(conn) -> List[int]:
+            deleted = self._existing_ids(conn, plan.table, ids)
+            for start in range(0, len(deleted), self.MAX_IN_PARAMS):
+                chunk = deleted[start:start + self.MAX_IN_PARAMS]
+                placeholders = ", ".join(['?'] * len(chunk))
+                conn.execute(f"DELETE FROM {plan.table} WHERE id IN ({placeholders})", chunk)
+            return deleted
+        deleted = self._write(delete)
+        if deleted:
+            self.versions.bump(plan.table, deleted)
+        return deleted
@@ -0,0 +1,76 @@
+# app/storage/storage_wrapper.py
+
+from typing import Any, ContextManager, Dict, Iterator, List, Sequence, Type
+
+from .abstract_storage import AbstractStorage
+from .versions import VersionTracker
+
+
+class StorageWrapper(AbstractStorage):
+    """
+    Base class for storages adding behaviour around another AbstractStorage.
+    Every operation is delegated to the wrapped `storage`, subclasses override
+    the ones they decorate. Other attributes (e.g. `database`, `compact()`) are
+    looked up on the wrapped storage.
+    """
+
+    def __init__(self, storage: AbstractStorage):
+        self.storage = storage
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes not found on the wrapper itself
+        if name == 'storage':
+            raise AttributeError(name)
+        return getattr(self.storage, name)
+
+    @property
+    def versions(self) -> VersionTracker:
+        # Writes go through the wrapped storage, which bumps the versions
+        return self.storage.versions
+
+    def create_table(self, model_class: Type[Any]):
+        return self.storage.create_table(model_class)
+
+    def create(self, model_class: Type[Any], data: Dict[str, Any]) -> Any:
+        return self.storage.create(model_class, data)
+
+    def list(self, model_class: Type[Any], limit: int = None, after: int = None,
+             order: str = 'asc', filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             raw: bool = False) -> List[Any]:
+        return self.storage.list(model_class, limit=limit, after=after, order=order, filters=filters,
+                                 fields=fields, raw=raw)
+
+    def get(self, model_class: Type[Any], id_: int = None, fields: Sequence[str] = None, raw: bool = False,
+            **kwargs) -> Any:
+        return self.storage.get(model_class, id_, fields=fields, raw=raw, **kwargs)
+
+    def update(self, model_class: Type[Any], id_: int, data: Dict[str, Any]):
+        return self.storage.update(model_class, id_, data)
+
+    def delete(self, model_class: Type[Any], id_: int):
+        return self.storage.delete(model_class, id_)
+
+    def iter(self, model_class: Type[Any], after: int = None, order: str = 'asc',
+             filters: Dict[str, Any] = None, fields: Sequence[str] = None,
+             batch_size: int = 500, raw: bool = False) -> Iterator[Any]:
+        return self.storage.iter(model_class, after=after, order=order, filters=filters, fields=fields,
+                                 batch_size=batch_size, raw=raw)
+
+    def create_many(self, model_class: Type[Any], records: List[Dict[str, Any]]) -> List[Any]:
+        return self.storage.create_many(model_class, records)
+
+    def get_many(self, model_class: Type[Any], ids: List[int], fields: Sequence[str] = None,
+                 raw: bool = False) -> List[Any]:
+        return self.storage.get_many(model_class, ids, fields=fields, raw=raw)
+
+    def update_many(self, model_class: Type[Any], records: List[Dict[str, Any]]):
+        return self.storage.update_many(model_class, records)
+
+    def delete_many(self, model_class: Type[Any], ids: List[int]):
+        return self.storage.delete_many(model_class, ids)
+
+    def transaction(self) -> ContextManager[Any]:
+        return self.storage.transaction()
+
+    def close(self):
+        return self.storage.close()
@@ -0,0 +1,84 @@
+# app/storage/versions.py
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class Version(NamedTuple):
+    etag: str
+    last_modified: float  # unix timestamp
+
+
+class VersionTracker:
+    """
+    Per-table and per-row change counters of a storage, for HTTP validators
+    (ETag/Last-Modified). Every write bumps a single counter, whose new value
+    becomes the version of the table and of the updated or deleted rows;
+    creates only bump the table, new ids have no previous version to invalidate.
+
+    Versions live in memory: they are tagged with a random epoch, so validators
+    issued before a restart never match again. Writes made by other processes
+    are not seen.
+    """
+
+    def __init__(self):
+        self.epoch = os.urandom(4).hex()
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._tables: Dict[str, Tuple[int, float]] = {}
+        self._rows: Dict[str, Dict[int, Tuple[int, float]]] = {}
+        # Bumps held back by `deferred()` in the current context
+        self._pending: "contextvars.ContextVar[Optional[List[Tuple[str, List[int]]]]]" = contextvars.ContextVar(
+            f'versions-pending-{id(self)}', default=None
+        )
+
+    def _version(self, counter: int, modified: float) -> Version:
+        return Version(f'W/"{self.epoch}-{counter:x}"', modified)
+
+    def bump(self, table: str, ids: Iterable[int] = ()):
+        """
+        Records a write to `table`, touching the rows `ids`.
+        """
+        pending = self._pending.get()
+        if pending is not None:
+            pending.append((table, list(ids)))
+            return
+        with self._lock:
+            self._counter += 1
+            stamp = (self._counter, time.time())
+            self._tables[table] = stamp
+            if ids:
+                rows = self._rows.setdefault(table, {})
+                for id_ in ids:
+                    rows[id_] = stamp
+
+    @contextmanager
+    def deferred(self):
+        """
+        Holds back the bumps made from the current context until the block exits,
+        then applies them, or drops them if it raised: the writes of a transaction
+        get their versions once committed, so a validator issued meanwhile never
+        stands for uncommitted rows.
+        """
+        if self._pending.get() is not None:
+            yield
+            return
+        pending: List[Tuple[str, List[int]]] = []
+        token = self._pending.set(pending)
+        try:
+            yield
+        finally:
+            self._pending.reset(token)
+        for table, ids in pending:
+            self.bump(table, ids)
+
+    def table_version(self, table: str) -> Version:
+        return self._version(*self._tables.get(table, (0, self.started)))
+
+    def row_version(self, table: str, id_: int) -> Version:
+        return self._version(*self._rows.get(table, {}).get(id_, (0, self.started)))
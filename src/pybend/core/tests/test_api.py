@@ -1,5 +1,8 @@
 # tests/test_api.py
 
+import config
+
+
 def test_create_user(client):
     response = client.post('/users', json={
         'name': 'Charlie',
@@ -46,3 +49,83 @@ def test_product_list(client):
     assert response.status_code == 200
     data = response.get_json()
     assert isinstance(data, list)
+
+def test_conditional_get(client):
+    client.post('/users', json={'name': 'Gus', 'email': 'gus@example.com', 'age': 40})
+    response = client.get('/users')
+    etag = response.headers['ETag']
+    # The JSON array and the NDJSON stream share the ETag: caches must key them on Accept
+    assert response.headers['Vary'] == 'Accept'
+    assert client.get('/users', headers={'Accept': 'application/x-ndjson'}).headers['Vary'] == 'Accept'
+    assert client.get('/users', headers={'If-None-Match': etag}).status_code == 304
+    # A delete matching no row keeps the version
+    client.delete('/users/999999')
+    assert client.get('/users', headers={'If-None-Match': etag}).status_code == 304
+    # A write changes the table version
+    client.post('/users', json={'name': 'Hal', 'email': 'hal@example.com', 'age': 41})
+    assert client.get('/users', headers={'If-None-Match': etag}).status_code == 200
+
+def test_schema_etag(client):
+    response = client.get('/users/schema')
+    assert response.status_code == 200
+    assert response.get_json()['__tablename__'] == 'users'
+    etag = response.headers['ETag']
+    assert client.get('/users/schema', headers={'If-None-Match': etag}).status_code == 304
+    assert 'users' in client.get('/blueprint').get_json()
+
+def test_batch(client):
+    response = client.post('/batch', json=[
+        {'method': 'POST', 'path': '/users', 'body': {'name': 'Ivy', 'email': 'ivy@example.com', 'age': 30}},
+        {'method': 'GET', 'path': '/users?email=ivy@example.com'},
+        {'method': 'GET', 'path': '/users/999999'},
+    ])
+    assert response.status_code == 200
+    results = response.get_json()
+    assert [result['status'] for result in results] == [201, 200, 404]
+    assert results[1]['body'][0]['name'] == 'Ivy'
+
+    # In a transaction, a failed operation rolls back the ones before it
+    response = client.post('/batch?transaction=true', json=[
+        {'method': 'POST', 'path': '/users', 'body': {'name': 'Jay', 'email': 'jay@example.com', 'age': 31}},
+        {'method': 'POST', 'path': '/users', 'body': {'name': 'Kim'}},
+    ])
+    assert [result['status'] for result in response.get_json()] == [424, 400]
+    assert client.get('/users?email=jay@example.com').get_json() == []
+    assert client.post('/batch', json={'method': 'GET'}).status_code == 400
+
+def test_change_feed(client, monkeypatch):
+    client.post('/users', json={'name': 'Lou', 'email': 'lou@example.com', 'age': 50})
+    response = client.get('/users/_changes?since=0&email=lou@example.com', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    event = next(iter(response.response))
+    response.close()
+    assert b'event: create' in event and b'"name":"Lou"' in event
+    # A stream ends after CHANGE_FEED_MAX_STREAM seconds with the position reached, to resume from
+    monkeypatch.setattr(config, 'CHANGE_FEED_MAX_STREAM', 0)
+    events = list(client.get('/users/_changes?since=0&email=lou@example.com').response)
+    assert events[-1] == events[0].split(b'\n')[0] + b'\n\n'
+    assert client.get('/users/_changes?since=x').status_code == 400
+
+def test_metrics(client):
+    client.get('/users/1')
+    client.get('/users/2')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    # Requests are labeled by their route template, not their URL
+    assert 'route="/users/<int:id>"' in text
+    assert 'route="/users/1"' not in text
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_requests_in_flight{method="GET"} 1' in text
+
+def test_bulk_update_validation(client):
+    created = client.post('/users', json={'name': 'Uma', 'email': 'uma@example.com', 'age': 40}).get_json()
+    response = client.put('/users/_bulk', json=[{'id': created['id'], 'age': 'zzz', 'email': 'UP@X.COM'}])
+    assert response.status_code == 400
+    assert client.get(f"/users/{created['id']}").get_json()['age'] == 40
+
+    response = client.put('/users/_bulk', json=[{'id': created['id'], 'email': 'UP@X.COM'}])
+    assert response.status_code == 200
+    assert client.get(f"/users/{created['id']}").get_json()['email'] == 'up@x.com'
@@ -0,0 +1,112 @@
+# tests/test_serializers.py
+
+import json
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel
+
+from server.api.serializers import Serializer
+from server.models.product_model import Product
+from server.models.user_model import User
+
+
+class Order(BaseModel):
+    product: Product
+    users: List[User]
+    note: Optional[str] = None
+
+
+class RecordingSerializer(Serializer):
+    """
+    Stdlib serializer remembering the rows and values it encoded.
+    """
+    name = 'recording'
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode_item(self, item):
+        self.encoded.append(item)
+        return super().encode_item(item)
+
+
+@pytest.fixture
+def registered_user(tmp_path):
+    from server.storage.sqlite_storage import SQLiteStorage
+    from server.utils.registrar import register_model
+
+    storage = SQLiteStorage(database=str(tmp_path / "serializers.db"))
+    register_model(User, storage=storage)
+    yield User
+    storage.close()
+
+
+def test_serializers_give_the_same_output():
+    pytest.importorskip("orjson")
+    from server.api.serializers import OrjsonSerializer
+
+    product = Product(product_id=1, name="Lamp", price=12.5)
+    user = User(id=2, name="Ann", email="Ann@Example.com", age=30)
+    order = Order(product=product, users=[user])
+    values = [
+        product,
+        {"id": 3, "name": "raw", "price": 1.0, "description": "é"},
+        [product, {"id": 3, "name": "raw"}, user],
+        order,
+        {"order": order, "count": 1},
+        {"message": "Updated successfully", "count": 2},
+    ]
+    for value in values:
+        encoded = Serializer().dumps(value)
+        assert json.loads(encoded) == json.loads(OrjsonSerializer().dumps(value))
+    assert json.loads(Serializer().dumps(order)) == {
+        "product": {"id": 1, "name": "Lamp", "price": 12.5, "description": ""},
+        "users": [{"id": 2, "name": "Ann", "email": "ann@example.com", "age": 30}],
+        "note": None,
+    }
+    assert json.loads(Serializer().dumps({"order": order}))["order"] == json.loads(Serializer().dumps(order))
+
+
+def test_streaming_uses_the_default_serializer():
+    from server.api.serializers import default_serializer
+    from server.api.streaming import iter_json
+
+    rows = [Product(product_id=1, name="Lamp", price=12.5), {"id": 2, "name": "raw"}]
+    assert b''.join(iter_json(rows)) == default_serializer().encode_items(rows)
+    assert b''.join(iter_json(rows, ndjson=True)).splitlines() == [
+        default_serializer().encode_item(row) for row in rows
+    ]
+
+
+def test_flask_backend_uses_its_serializer(registered_user):
+    from server.api.backend import FlaskBackend
+    from server.utils.registrar import registered_models
+
+    serializer = RecordingSerializer()
+    backend = FlaskBackend(name="test", version="1", description="test", serializer=serializer)
+    backend.register_routes(registered_models)
+    client = backend.app.test_client()
+
+    created = client.post('/users', json={'name': 'Flo', 'email': 'flo@example.com'}).get_json()
+    assert client.get('/users').get_json()[-1] == created
+    assert any(getattr(item, 'email', None) == 'flo@example.com' for item in serializer.encoded)
+
+
+def test_fastapi_backend_uses_its_serializer(registered_user, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from server.api.backend import FastAPIBackend
+    from server.api.routes_fastapi import router
+    from server.utils.registrar import registered_models
+
+    # The routes are registered on a module-level router: start from an empty one
+    monkeypatch.setattr(router, "routes", [])
+    serializer = RecordingSerializer()
+    backend = FastAPIBackend(name="test", version="1", description="test", serializer=serializer)
+    backend.register_routes(registered_models)
+    client = TestClient(backend.app)
+
+    created = client.post('/users', json={'name': 'Fay', 'email': 'fay@example.com'}).json()
+    assert client.get('/users').json()[-1] == created
+    assert any(getattr(item, 'email', None) == 'fay@example.com' for item in serializer.encoded)
@@ -44,3 +44,622 @@ def test_sqlite_storage_crud_operations(sqlite_storage):
     sqlite_storage.delete(User, created_user.id)
     deleted_user = sqlite_storage.get(User, created_user.id)
     assert deleted_user is None
+
+def test_sqlite_storage_reuses_pooled_connections(sqlite_storage):
+    sqlite_storage.create_table(User)
+    with sqlite_storage.pool.reader() as conn:
+        first = conn
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+    with sqlite_storage.pool.reader() as conn:
+        assert conn is first
+    assert journal_mode.lower() == "wal"
+    # SQLite's lock waits are bounded by the storage timeout
+    assert busy_timeout == int(sqlite_storage.pool.timeout * 1000)
+
+    sqlite_storage.close()
+    with pytest.raises(RuntimeError):
+        sqlite_storage.get(User, 1)
+
+def test_sqlite_storage_bulk_operations(sqlite_storage):
+    sqlite_storage.create_table(User)
+    created = sqlite_storage.create_many(User, [
+        {"name": "Ann", "email": "ann@example.com", "age": 31},
+        {"name": "Ben", "email": "ben@example.com"},
+        {"name": "Cid", "email": "cid@example.com", "age": 40},
+    ])
+    ids = [user.id for user in created]
+    assert len(set(ids)) == 3
+
+    fetched = sqlite_storage.get_many(User, [ids[2], ids[0], 9999])
+    assert [user.name for user in fetched] == ["Cid", "Ann"]
+
+    sqlite_storage.update_many(User, [{"id": ids[0], "name": "Anna"}, {"id": ids[1], "age": 22}])
+    assert sqlite_storage.get(User, ids[0]).name == "Anna"
+    assert sqlite_storage.get(User, ids[1]).age == 22
+
+    sqlite_storage.delete_many(User, ids[:2])
+    assert [user.id for user in sqlite_storage.list(User)] == [ids[2]]
+
+def test_sqlite_storage_keyset_pagination(sqlite_storage):
+    sqlite_storage.create_table(User)
+    User.set_storage(sqlite_storage)
+    sqlite_storage.create_many(User, [{"name": f"user{i}", "email": f"user{i}@example.com"} for i in range(5)])
+
+    first, cursor = User.page(2)
+    second, cursor = User.page(2, cursor=cursor)
+    last, cursor = User.page(2, cursor=cursor)
+    assert [u.name for u in first + second + last] == [f"user{i}" for i in range(5)]
+    assert cursor is None
+
+    newest, _ = User.page(2, order="desc")
+    assert [u.name for u in newest] == ["user4", "user3"]
+
+def test_sqlite_storage_filters_and_indexes(sqlite_storage):
+    sqlite_storage.create_table(User)
+    User.set_storage(sqlite_storage)
+    sqlite_storage.create_many(User, [
+        {"name": "Ann", "email": "ann@example.com", "age": 31},
+        {"name": "Ben", "email": "ben@example.com", "age": 19},
+        {"name": "Cid", "email": "cid@example.com", "age": 40},
+    ])
+
+    assert User.find_one(email="ben@example.com").name == "Ben"
+    assert User.find_one(email="nobody@example.com") is None
+    assert [u.name for u in User.find(age__gte=30)] == ["Ann", "Cid"]
+    assert [u.name for u in User.find(name__in=["Cid", "Ben"], age__lt=35)] == ["Ben"]
+    with pytest.raises(ValueError):
+        User.find(unknown=1)
+
+    conn = sqlite3.connect(sqlite_storage.database)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM users WHERE email = ?", ("x",)).fetchall()
+    conn.close()
+    assert any("ix_users_email" in row[-1] for row in plan)
+
+def test_sqlite_storage_compiles_table_plan_once(sqlite_storage):
+    sqlite_storage.create_table(User)
+    plan = sqlite_storage.plan(User)
+    assert plan.columns == ("id", "name", "email", "age")
+
+    created = sqlite_storage.create(User, {"name": "Dee", "email": "dee@example.com"})
+    assert sqlite_storage.get(User, created.id).name == "Dee"
+    assert sqlite_storage.plan(User) is plan
+
+    # Registering the model again recompiles its plan
+    sqlite_storage.create_table(User)
+    assert sqlite_storage.plan(User) is not plan
+
+def test_async_storage_adapter(sqlite_storage):
+    import asyncio
+    from server.storage.async_storage import as_async
+
+    sqlite_storage.create_table(User)
+    User.set_storage(sqlite_storage)
+    assert User.async_storage is as_async(sqlite_storage)
+
+    async def scenario():
+        created = await User.acreate(User(name="Eva", email="EVA@example.com"))
+        fetched = await User.aget(created.id)
+        items, cursor = await User.apage(10, filters={"email": "eva@example.com"})
+        await User.adelete(created.id)
+        return fetched, items, await User.aget(created.id)
+
+    fetched, items, deleted = asyncio.run(scenario())
+    assert fetched.email == "eva@example.com"
+    assert [u.id for u in items] == [fetched.id]
+    assert deleted is None
+    User.async_storage.close()
+
+def test_sqlite_storage_iter_streams_in_batches(sqlite_storage):
+    sqlite_storage.create_table(User)
+    sqlite_storage.create_many(User, [{"name": f"user{i}", "email": f"user{i}@example.com", "age": i} for i in range(25)])
+
+    rows = sqlite_storage.iter(User, filters={"age__gte": 5}, batch_size=4)
+    assert [u.age for u in rows] == list(range(5, 25))
+
+    # An abandoned iterator hands its reader connection back to the pool
+    partial = sqlite_storage.iter(User, batch_size=4)
+    next(partial)
+    partial.close()
+    assert sqlite_storage.pool._idle.qsize() == len(sqlite_storage.pool._readers)
+
+def test_sqlite_storage_sparse_fieldsets(sqlite_storage):
+    sqlite_storage.create_table(User)
+    created = sqlite_storage.create(User, {"name": "Fay", "email": "fay@example.com", "age": 41})
+
+    [partial] = sqlite_storage.list(User, fields=["name"])
+    assert partial.model_dump(exclude_unset=True) == {"id": created.id, "name": "Fay"}
+    assert sqlite_storage.get(User, created.id, fields=["email"]).email == "fay@example.com"
+    assert [u.age for u in sqlite_storage.get_many(User, [created.id], fields=["age"])] == [41]
+
+    with pytest.raises(ValueError):
+        sqlite_storage.list(User, fields=["password_hash", "nope"])
+
+def test_sqlite_storage_trusted_reads(sqlite_storage, monkeypatch):
+    sqlite_storage.create_table(User)
+    created = sqlite_storage.create(User, {"name": "Gus", "email": "gus@example.com", "age": 7})
+
+    # Raw rows are plain dicts shaped like model_dump()
+    assert sqlite_storage.list(User, raw=True) == [created.model_dump()]
+    assert sqlite_storage.get(User, created.id, fields=["age"], raw=True) == {"id": created.id, "age": 7}
+
+    # Models opt in to trusted reads, the others are validated again
+    from server.models.proto_model import ProtoModel
+    assert ProtoModel.__trusted__ is False and User.__trusted__ is True
+    calls = []
+    monkeypatch.setattr(User, "model_construct", classmethod(lambda cls, **data: calls.append(data) or data))
+    sqlite_storage.create_table(User)
+    sqlite_storage.get(User, created.id)
+    assert len(calls) == 1
+    monkeypatch.setattr(User, "__trusted__", False)
+    sqlite_storage.create_table(User)
+    assert isinstance(sqlite_storage.get(User, created.id), User)
+    assert len(calls) == 1
+
+def test_sqlite_storage_group_commit(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    storage = SQLiteStorage(database=str(tmp_path / "group.db"), group_commit=True, durability="full",
+                            commit_window=0.01)
+    storage.create_table(User)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        users = list(executor.map(
+            lambda i: storage.create(User, {"name": f"user{i}", "email": f"user{i}@example.com"}), range(40)
+        ))
+    # Each caller gets its real id, and the write is committed when create() returns
+    assert len({user.id for user in users}) == 40
+    assert [u.name for u in storage.get_many(User, [user.id for user in users])] == [u.name for u in users]
+
+    # A failing mutation is rolled back alone, its group still commits
+    failing = storage.group_commit.submit(lambda conn: conn.execute("INSERT INTO missing VALUES (1)"))
+    storage.delete(User, users[0].id)
+    with pytest.raises(sqlite3.OperationalError):
+        failing.result()
+    assert storage.get(User, users[0].id) is None
+
+    storage.close()
+    with pytest.raises(RuntimeError):
+        storage.create(User, {"name": "late", "email": "late@example.com"})
+
+def test_sqlite_storage_failed_group_commit(tmp_path, caplog):
+    storage = SQLiteStorage(database=str(tmp_path / "group.db"), group_commit=True, durability="async",
+                            pragmas={"foreign_keys": "ON"})
+    storage.create_table(User)
+    storage._write(lambda conn: conn.execute(
+        "CREATE TABLE IF NOT EXISTS owned (owner INTEGER REFERENCES users(id) DEFERRABLE INITIALLY DEFERRED)"
+    ))
+    # The deferred foreign key only fails the COMMIT: the mutation was acknowledged, then lost
+    storage.group_commit.submit(lambda conn: conn.execute("INSERT INTO owned VALUES (42)")).result()
+    storage.close()
+    stats = storage.group_commit.stats()
+    assert stats["failed_commits"] == 1 and stats["lost_mutations"] == 1
+    assert isinstance(stats["last_error"], sqlite3.IntegrityError)
+    assert "Group commit of 1 mutations failed" in caplog.text
+
+def test_json_log_storage(tmp_path):
+    from server.storage.json_log_storage import JSONLogStorage
+
+    storage = JSONLogStorage(directory=str(tmp_path), compact_min=4, compact_ratio=0.5)
+    storage.create_table(User)
+    users = [storage.create(User, {"name": f"user{i}", "email": f"user{i}@example.com", "age": i}) for i in range(6)]
+    storage.update(User, users[1].id, {"name": "renamed"})
+    storage.delete(User, users[2].id)
+    assert storage.get(User, users[1].id).name == "renamed"
+    assert storage.get(User, users[2].id) is None
+    assert [u.id for u in storage.list(User, limit=2, after=users[1].id)] == [users[3].id, users[4].id]
+    assert [u.age for u in storage.list(User, order="desc", filters={"age__lt": 3})] == [1, 0]
+
+    # Deleting the last record then reopening: the index is rebuilt and the id is not reused
+    storage.delete(User, users[5].id)
+    storage.close()
+    storage = JSONLogStorage(directory=str(tmp_path))
+    assert storage.get(User, users[1].id).name == "renamed"
+    assert storage.create(User, {"name": "new", "email": "new@example.com"}).id == users[5].id + 1
+
+    # Compaction keeps only the live records
+    storage.compact(User)
+    with open(tmp_path / "users.jsonl") as f:
+        assert len(f.readlines()) == 5
+    assert [u.id for u in storage.list(User)] == [users[0].id, users[1].id, users[3].id, users[4].id, users[5].id + 1]
+    storage.close()
+
+def test_json_log_storage_writes_during_compaction(tmp_path, monkeypatch):
+    import os
+    import threading
+    from server.storage.json_log_storage import JSONLogStorage
+
+    storage = JSONLogStorage(directory=str(tmp_path), compact_min=10 ** 6)
+    storage.create_table(User)
+    users = storage.create_many(User, [{"name": f"user{i}", "email": f"user{i}@example.com"} for i in range(4)])
+    storage.update(User, users[0].id, {"name": "renamed"})
+
+    # While the live records are synced (the second fsync, after the sequence's), other threads keep writing
+    fsync, calls = os.fsync, []
+
+    def write_meanwhile(fd):
+        calls.append(fd)
+        if len(calls) == 2:
+            writer = threading.Thread(target=lambda: (
+                storage.update(User, users[1].id, {"name": "during"}),
+                storage.delete(User, users[2].id),
+                storage.create(User, {"name": "new", "email": "new@example.com"}),
+            ))
+            writer.start()
+            writer.join(timeout=5)
+            assert not writer.is_alive()
+        fsync(fd)
+    monkeypatch.setattr(os, "fsync", write_meanwhile)
+    storage.compact(User)
+    monkeypatch.setattr(os, "fsync", fsync)
+
+    expected = [(users[0].id, "renamed"), (users[1].id, "during"), (users[3].id, "user3"), (users[3].id + 1, "new")]
+    assert [(u.id, u.name) for u in storage.list(User)] == expected
+    storage.close()
+    storage = JSONLogStorage(directory=str(tmp_path))
+    assert [(u.id, u.name) for u in storage.list(User)] == expected
+    storage.close()
+
+def test_columnar_storage(tmp_path):
+    pytest.importorskip("numpy")
+    from server.storage.columnar_storage import ColumnarStorage
+    from server.models.product_model import Product
+
+    storage = ColumnarStorage(directory=str(tmp_path))
+    storage.create_table(Product)
+    storage.create_many(Product, [{"name": f"product{i}", "price": float(i), "description": "even" if i % 2 == 0 else "odd"}
+                                  for i in range(10)])
+    storage.update(Product, 2, {"price": 100.0})
+    storage.delete(Product, 1)
+
+    assert storage.get(Product, 2).price == 100.0
+    assert storage.get(Product, 1) is None
+    assert [p.id for p in storage.list(Product, limit=2, after=2, filters={"description": "odd"})] == [4, 6]
+    # Ids start at 1: product i has id i + 1
+    assert storage.aggregate(Product, "sum", "price") == sum(range(2, 10)) + 100.0
+    assert storage.aggregate(Product, "count", group_by="description") == {"odd": 5, "even": 4}
+    assert list(storage.scan(Product, fields=["name"], filters={"price__gte": 9})["name"]) == ["product1", "product9"]
+
+    # Columns are persisted and reopened
+    storage.close()
+    storage = ColumnarStorage(directory=str(tmp_path))
+    assert storage.aggregate(Product, "max", "price") == 100.0
+    assert storage.create(Product, {"name": "new", "price": 1.0}).id == 11
+
+def test_kv_storage(tmp_path):
+    from server.storage.kv_storage import KVStorage
+
+    storage = KVStorage(directory=str(tmp_path))
+    storage.create_table(User)
+    users = storage.create_many(User, [{"name": f"user{i}", "email": f"user{i}@example.com", "age": i} for i in range(5)])
+    storage.update(User, users[0].id, {"name": "first"})
+    storage.delete(User, users[4].id)
+
+    assert storage.get(User, users[0].id).name == "first"
+    assert storage.get(User, users[4].id) is None
+    assert [u.id for u in storage.list(User, limit=2, after=users[0].id)] == [users[1].id, users[2].id]
+    assert [u.age for u in storage.list(User, order="desc", filters={"age__gte": 2})] == [3, 2]
+
+    # The sequence survives reopening, deleted ids are not reused
+    storage.close()
+    storage = KVStorage(directory=str(tmp_path))
+    assert storage.create(User, {"name": "new", "email": "new@example.com"}).id == users[4].id + 1
+    assert storage.get(User, users[1].id, raw=True) == users[1].model_dump()
+    storage.close()
+
+BACKENDS = ["sqlite", "memory", "json", "json-log", "columnar", "kv"]
+
+def make_storage(backend, tmp_path):
+    from server.storage.json_log_storage import JSONLogStorage
+    from server.storage.json_storage import JSONStorage
+    from server.storage.kv_storage import KVStorage
+    from server.storage.memory_storage import MemoryStorage
+
+    if backend == "columnar":
+        pytest.importorskip("numpy")
+        from server.storage.columnar_storage import ColumnarStorage
+    return {
+        "sqlite": lambda: SQLiteStorage(database=str(tmp_path / "test.db")),
+        "memory": MemoryStorage,
+        "json": lambda: JSONStorage(str(tmp_path)),
+        "json-log": lambda: JSONLogStorage(str(tmp_path)),
+        "columnar": lambda: ColumnarStorage(directory=str(tmp_path)),
+        "kv": lambda: KVStorage(directory=str(tmp_path)),
+    }[backend]()
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_filters_on_defaulted_fields(tmp_path, backend):
+    from server.models.product_model import Product
+
+    storage = make_storage(backend, tmp_path)
+    storage.create_table(Product)
+    # The description is left to its default: the same records match on every backend
+    plain = storage.create(Product, {"name": "plain", "price": 1.0})
+    storage.create_many(Product, [{"name": "bare", "price": 2.0}, {"name": "told", "price": 3.0, "description": "x"}])
+    assert [p.name for p in storage.list(Product, filters={"description": ""})] == ["plain", "bare"]
+    assert [p.name for p in storage.list(Product, filters={"description__ne": "x"})] == ["plain", "bare"]
+    assert storage.get(Product, plain.id, raw=True) == {"id": plain.id, "name": "plain", "price": 1.0, "description": ""}
+
+    # As in SQL, `ne` never matches a NULL field
+    storage.create_table(User)
+    storage.create_many(User, [{"name": name, "email": f"{name}@example.com", "age": age}
+                               for name, age in (("ann", 30), ("bob", None), ("cid", 40))])
+    assert [u.name for u in storage.list(User, filters={"age__ne": 30})] == ["cid"]
+    assert [u.name for u in storage.list(User, filters={"age__ne": None})] == ["ann", "cid"]
+    assert [u.name for u in storage.list(User, filters={"age": None})] == ["bob"]
+    storage.close()
+
+def test_memory_storage(tmp_path):
+    from server.storage.memory_storage import MemoryStorage
+
+    snapshot_path = str(tmp_path / "snapshot.json")
+    storage = MemoryStorage(snapshot_path=snapshot_path)
+    storage.create_table(User)
+    storage.create_index(User, "age", kind="sorted")
+    users = storage.create_many(User, [{"name": f"user{i}", "email": f"user{i}@example.com", "age": i} for i in range(5)])
+    storage.update(User, users[0].id, {"age": 10})
+    storage.delete(User, users[4].id)
+
+    # Served by the hash index on email and the sorted index on age
+    assert storage.get(User, email="user1@example.com").id == users[1].id
+    assert [u.age for u in storage.list(User, filters={"age__gte": 2})] == [10, 2, 3]
+    assert [u.id for u in storage.list(User, order="desc", after=users[3].id, limit=2)] == [users[2].id, users[1].id]
+
+    storage.create_index(User, "name", unique=True)
+    with pytest.raises(ValueError):
+        storage.create(User, {"name": "user1", "email": "other@example.com"})
+    with pytest.raises(ValueError):
+        storage.update(User, users[2].id, {"name": "user1"})
+    assert storage.get(User, users[2].id).name == "user2"
+
+    # The snapshot restores the records and the sequence
+    storage.close()
+    storage = MemoryStorage(snapshot_path=snapshot_path)
+    storage.create_table(User)
+    assert storage.get(User, users[0].id).age == 10
+    assert storage.create(User, {"name": "new", "email": "new@example.com"}).id == users[4].id + 1
+
+def test_caching_storage(sqlite_storage):
+    from server.storage.caching_storage import CachingStorage
+
+    storage = CachingStorage(sqlite_storage, max_entries=3)
+    storage.create_table(User)
+    users = storage.create_many(User, [{"name": f"user{i}", "email": f"user{i}@example.com", "age": i} for i in range(5)])
+
+    assert storage.get(User, users[0].id).name == "user0"
+    assert storage.get(User, users[0].id, raw=True)["name"] == "user0"
+    assert storage.get(User, users[0].id, fields=["name"]).model_dump(exclude_unset=True) == {"id": users[0].id, "name": "user0"}
+    assert storage.stats()["hits"] == 2 and storage.stats()["misses"] == 1
+
+    # Writes through the cache invalidate the record and the table's lists
+    assert len(storage.list(User, filters={"age__gte": 3})) == 2
+    storage.update(User, users[0].id, {"name": "first", "age": 10})
+    assert storage.get(User, users[0].id).name == "first"
+    assert len(storage.list(User, filters={"age__gte": 3})) == 3
+    storage.delete(User, users[1].id)
+    assert storage.get(User, users[1].id) is None
+    assert [u.id for u in storage.get_many(User, [users[2].id, users[1].id, users[3].id])] == [users[2].id, users[3].id]
+
+    assert len(storage.get_many(User, [u.id for u in users])) == 4
+    assert storage.stats()["entries"] == 3 and storage.stats()["evictions"] > 0
+
+def test_storage_versions(sqlite_storage):
+    sqlite_storage.create_table(User)
+    versions = sqlite_storage.versions
+    users = sqlite_storage.create_many(User, [{"name": f"user{i}", "email": f"user{i}@example.com"} for i in range(2)])
+    table_etag = versions.table_version("users").etag
+    row_etags = [versions.row_version("users", user.id).etag for user in users]
+
+    sqlite_storage.update(User, users[0].id, {"name": "first"})
+    assert versions.table_version("users").etag != table_etag
+    assert versions.row_version("users", users[0].id).etag != row_etags[0]
+    assert versions.row_version("users", users[1].id).etag == row_etags[1]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_writes_matching_no_row_keep_versions(tmp_path, backend):
+    storage = make_storage(backend, tmp_path)
+    storage.create_table(User)
+    users = storage.create_many(User, [{"name": f"user{i}", "email": f"user{i}@example.com"} for i in range(2)])
+    versions = storage.versions
+    table_etag = versions.table_version("users").etag
+    missing = users[-1].id + 1
+
+    # Only the rows actually written are returned and bump the versions
+    assert storage.update(User, missing, {"name": "nobody"}) is False
+    assert storage.delete(User, missing) is False
+    assert storage.update_many(User, [{"id": missing, "name": "nobody"}]) == []
+    assert storage.delete_many(User, [missing]) == []
+    assert versions.table_version("users").etag == table_etag
+    assert storage.update_many(User, [{"id": users[0].id, "name": "first"}, {"id": missing, "name": "x"}]) == [users[0].id]
+    assert versions.table_version("users").etag != table_etag
+    assert storage.delete_many(User, [missing, users[1].id, users[1].id]) == [users[1].id]
+    assert storage.delete(User, users[0].id) is True
+    assert storage.list(User) == []
+    storage.close()
+
+def test_create_from_dict(sqlite_storage):
+    from pydantic import ValidationError
+
+    User.set_storage(sqlite_storage)
+    User.create_table()
+    # A dict is validated once (the email is normalized) and stored as is
+    user = User.create({"name": "Ann", "email": "ANN@example.com"})
+    assert user.id is not None and user.email == "ann@example.com"
+    assert sqlite_storage.get(User, user.id).email == "ann@example.com"
+    with pytest.raises(ValidationError):
+        User.create({"email": "nameless@example.com"})
+
+def test_sqlite_storage_transaction(sqlite_storage):
+    from server.storage.caching_storage import CachingStorage
+
+    storage = CachingStorage(sqlite_storage)
+    storage.create_table(User)
+    user = storage.create(User, {"name": "Ann", "email": "ann@example.com"})
+    assert storage.get(User, user.id).name == "Ann"
+    etag = sqlite_storage.versions.row_version("users", user.id).etag
+
+    # Rolled back: the cache still serves the committed row, the version is unchanged
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.update(User, user.id, {"name": "Bea"})
+            assert storage.get(User, user.id).name == "Bea"
+            raise RuntimeError("abort")
+    assert storage.get(User, user.id).name == "Ann"
+    assert sqlite_storage.versions.row_version("users", user.id).etag == etag
+
+    with storage.transaction():
+        storage.update(User, user.id, {"name": "Cat"})
+        storage.create(User, {"name": "Dan", "email": "dan@example.com"})
+    assert [u.name for u in storage.list(User)] == ["Cat", "Dan"]
+    assert sqlite_storage.versions.row_version("users", user.id).etag != etag
+
+    from server.storage.memory_storage import MemoryStorage
+    with pytest.raises(NotImplementedError):
+        MemoryStorage().transaction()
+
+def test_change_feed(sqlite_storage):
+    from server.storage.change_feed import ChangeFeed, change_feed
+    from server.storage.filters import parse_filters
+
+    feed = ChangeFeed(buffer_size=3)
+    for i in range(4):
+        feed.publish("users", "update", i, {"id": i, "age": i})
+    # Only the last 3 changes are buffered: resuming from before them needs a reset
+    assert feed.since("users", 0) is None
+    assert [change.id for change in feed.since("users", 2)] == [2, 3]
+    changes = feed.subscribe("users", since=0, conditions=parse_filters(User, {"age__gte": 3}), timeout=0)
+    assert next(changes).op == "reset"
+    feed.publish("users", "update", 1, {"id": 1, "age": 1})
+    feed.publish("users", "update", 2, {"id": 2, "age": 5})
+    feed.publish("users", "delete", 1)
+    assert [(change.id, change.op) for change in (next(changes), next(changes))] == [(2, "update"), (1, "delete")]
+    assert next(changes) is None
+
+    with pytest.raises(RuntimeError):
+        with feed.deferred():
+            feed.publish("users", "delete", 2)
+            raise RuntimeError("rolled back")
+    assert feed.since("users", 7) == []
+
+    # StorableMixin writes publish their changes
+    User.set_storage(sqlite_storage)
+    User.create_table()
+    seq = change_feed.seq
+    user = User.create({"name": "Ann", "email": "ann@example.com"})
+    User.update(user.id, {"name": "Bea", "email": "ann@example.com"})
+    User.delete(user.id)
+    # Writes matching no row publish nothing
+    User.update(user.id, {"name": "Cat", "email": "ann@example.com"})
+    User.delete(user.id)
+    User.delete_many([user.id, user.id + 1])
+    assert [(change.op, change.id) for change in change_feed.since("users", seq)] == [
+        ("create", user.id), ("update", user.id), ("delete", user.id)
+    ]
+
+def test_instrumented_storage(sqlite_storage, tmp_path):
+    import json
+    from server.storage.instrumented_storage import InstrumentedStorage
+
+    log_path = tmp_path / "slow.jsonl"
+    # Every call is slow: all are logged with their query plan
+    storage = InstrumentedStorage(sqlite_storage, slow_threshold=0, slow_log_path=str(log_path))
+    storage.create_table(User)
+    storage.create_many(User, [{"name": f"user{i}", "email": f"user{i}@example.com"} for i in range(3)])
+    assert len(storage.list(User, filters={"name": "user1"})) == 1
+    assert storage.get(User, email="user2@example.com").name == "user2"
+    assert len(list(storage.iter(User, batch_size=2))) == 3
+
+    stats = storage.stats()
+    assert stats[("create_many", "users")]["rows"] == 3
+    assert stats[("list", "users")]["calls"] == 1 and stats[("list", "users")]["full_scans"] == 1
+    assert stats[("get", "users")]["full_scans"] == 0  # email is indexed
+    assert stats[("iter", "users")]["rows"] == 3
+
+    by_name = next(query for query in storage.slow_queries() if query.operation == "list")
+    # The SQL is logged with its placeholders, never with the values bound
+    assert by_name.filters == ("name",) and "name = ?" in by_name.statements[0].sql
+    assert "user1" not in log_path.read_text() and "user2@example.com" not in log_path.read_text()
+    assert any(detail.startswith("SCAN users") for detail in by_name.statements[0].plan)
+    assert "User.__indexes__ = [..., 'name']" in storage.report()
+    assert len(log_path.read_text().splitlines()) == len(storage.slow_queries())
+    assert json.loads(log_path.read_text().splitlines()[0])["operation"] == "create_table"
+    storage.close()
+
+def test_wrapped_async_storage_keeps_its_executor(tmp_path):
+    from server.storage.async_storage import AsyncSQLiteStorage
+    from server.storage.caching_storage import with_cache
+    from server.storage.instrumented_storage import with_instrumentation
+
+    storage = AsyncSQLiteStorage(str(tmp_path / "wrapped.db"), max_workers=3)
+    instrumented = with_instrumentation(storage)
+    cached = with_cache(instrumented)
+    assert instrumented.executor is storage.executor and cached.executor is storage.executor
+    assert storage.executor._max_workers == 3
+    assert cached.storage.storage is instrumented.storage and instrumented.storage.storage is storage.storage
+    storage.close()
+
+def test_async_storage_transaction_with_concurrent_writers(tmp_path):
+    import asyncio
+    import threading
+    from server.storage.abstract_storage import StorageBusy
+    from server.storage.async_storage import AsyncSQLiteStorage, transaction_thread
+
+    # As many concurrent writers as workers: all of them wait for the writer lock the transaction holds
+    storage = AsyncSQLiteStorage(str(tmp_path / "concurrent.db"), max_workers=2)
+    asyncio.run(storage.create_table(User))
+
+    async def batch():
+        async with transaction_thread(storage.storage.transaction):
+            await asyncio.sleep(0.2)
+            await storage.create(User, {"name": "Ann", "email": "ann@example.com"})
+            return await storage.list(User)
+
+    async def write(i):
+        await asyncio.sleep(0.05)
+        return await storage.create(User, {"name": f"Writer {i}", "email": f"writer{i}@example.com"})
+
+    async def scenario():
+        return await asyncio.wait_for(asyncio.gather(batch(), write(1), write(2)), 5)
+
+    seen, *_ = asyncio.run(scenario())
+    assert [u.name for u in seen] == ["Ann"]
+    assert len(asyncio.run(storage.list(User))) == 3
+    storage.close()
+
+    # A writer waits for the lock at most `timeout` seconds
+    busy = SQLiteStorage(str(tmp_path / "busy.db"), timeout=0.1)
+    busy.create_table(User)
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with busy.pool.writer():
+            held.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+    with pytest.raises(StorageBusy):
+        busy.create(User, {"name": "Bob", "email": "bob@example.com"})
+    release.set()
+    holder.join()
+    assert busy.create(User, {"name": "Bob", "email": "bob@example.com"}).id is not None
+
+def test_bulk_update_validation(sqlite_storage):
+    import asyncio
+
+    User.set_storage(sqlite_storage)
+    User.create_table()
+    user = User.create({"name": "Ann", "email": "ann@example.com", "age": 30})
+    # Partial updates are validated merged over the stored row, only the given fields are written
+    User.update_many([{"id": user.id, "email": "ANN@EXAMPLE.ORG"}])
+    assert User.get(user.id, raw=True) == {"id": user.id, "name": "Ann", "email": "ann@example.org", "age": 30}
+    asyncio.run(User.aupdate_many([{"id": user.id, "age": "31"}]))
+    assert User.get(user.id).age == 31
+
+    for invalid in ([{"id": user.id, "age": "zzz"}], [{"id": user.id, "nickname": "A"}],
+                    [{"id": user.id + 1, "age": 1}], [{"age": 1}]):
+        with pytest.raises(ValueError):
+            User.update_many(invalid)
+        with pytest.raises(ValueError):
+            asyncio.run(User.aupdate_many(invalid))
+    assert User.get(user.id, raw=True)["age"] == 31
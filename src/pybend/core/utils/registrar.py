@@ -1,20 +1,30 @@
 # app/utils/registrar.py
 
-from typing import Dict, Type, Any
+from typing import Dict, Type, Any, Union
 from pydantic import BaseModel
 from storage.abstract_storage import AbstractStorage as StorageInterface
+from storage.caching_storage import with_cache
 from models.storable_mixin import StorableMixin
+from utils.schema_registry import schema_registry
 
 registered_models: Dict[str, Type[Any]] = {}
 
 
-def register_model(model_class: Type[Any], storage: StorageInterface = None):
+def register_model(model_class: Type[Any], storage: StorageInterface = None,
+                   cache: Union[bool, Dict[str, Any]] = None):
     """
-    Registers a model class with the system. If the model is storable, injects the storage backend.
+    Registers a model class with the system. If the model is storable, injects the storage backend
+    (an AbstractStorage, or an AsyncStorageAdapter such as AsyncSQLiteStorage).
+    With `cache` (True, or CachingStorage options such as {'max_entries': 1000, 'ttl': 30}),
+    the model reads through its own CachingStorage over that backend.
     """
     if hasattr(model_class, '__storable__') and model_class.__storable__:
         if storage is None:
             raise ValueError(f"Storage backend must be provided for model '{model_class.__name__}'")
+        if cache:
+            storage = with_cache(storage, **(cache if isinstance(cache, dict) else {}))
         model_class.set_storage(storage)
         model_class.create_table()
     registered_models[model_class.__tablename__] = model_class
+    # Schemas are computed once here, then served pre-serialized
+    schema_registry.register(model_class, registered_models)
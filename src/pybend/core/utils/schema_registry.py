@@ -0,0 +1,97 @@
+# app/utils/schema_registry.py
+
+import copy
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Type
+
+from storage.versions import Version
+
+
+class CompiledSchema(NamedTuple):
+    schema: Dict[str, Any]  # shared, never mutate it
+    body: bytes
+    version: Version  # strong ETag: a hash of `body`
+
+
+def compile_schema(schema: Dict[str, Any]) -> CompiledSchema:
+    """
+    Serializes a schema document once, with its content hash as ETag.
+    """
+    body = json.dumps(schema, separators=(',', ':')).encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return CompiledSchema(schema, body, Version(etag, time.time()))
+
+
+class SchemaRegistry:
+    """
+    Computes the schemas of the models once and keeps them, serialized, for the
+    `/schema` and `/blueprint` routes and the OpenAPI/Swagger generation.
+    Models are compiled at `register_model` time (or on first use), the
+    blueprint of all registered models is rebuilt on each registration.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._json_schemas: Dict[Type[Any], Dict[str, Any]] = {}
+        self._schemas: Dict[Type[Any], CompiledSchema] = {}
+        self._blueprint = compile_schema({})
+        self._documents: Dict[str, CompiledSchema] = {}
+
+    def json_schema(self, model_class: Type[Any]) -> Dict[str, Any]:
+        """
+        Returns the model's JSON schema (`model_json_schema()`), computed once. Shared, never mutate it.
+        """
+        json_schema = self._json_schemas.get(model_class)
+        if json_schema is None:
+            with self._lock:
+                json_schema = self._json_schemas.setdefault(model_class, model_class.model_json_schema())
+        return json_schema
+
+    def schema(self, model_class: Type[Any]) -> CompiledSchema:
+        """
+        Returns the model's `/schema` document: its JSON schema plus `__type__`,
+        `__name__` and `__tablename__`.
+        """
+        compiled = self._schemas.get(model_class)
+        if compiled is None:
+            with self._lock:
+                compiled = self._schemas.get(model_class)
+                if compiled is None:
+                    schema = copy.deepcopy(self.json_schema(model_class))
+                    schema['__type__'] = 'schema'
+                    schema['__name__'] = model_class.__name__
+                    schema['__tablename__'] = getattr(model_class, '__tablename__', "")
+                    compiled = self._schemas[model_class] = compile_schema(schema)
+        return compiled
+
+    def register(self, model_class: Type[Any], models: Dict[str, Type[Any]]):
+        """
+        Compiles a newly registered model and the blueprint of `models`, the registered models by name.
+        """
+        with self._lock:
+            self.schema(model_class)
+            self._blueprint = compile_schema({name: self.schema(cls).schema for name, cls in models.items()})
+
+    def blueprint(self) -> CompiledSchema:
+        """
+        Returns the `/blueprint` document: the schemas of all registered models by name.
+        """
+        return self._blueprint
+
+    def document(self, name: str, build: Callable[[], Dict[str, Any]]) -> CompiledSchema:
+        """
+        Returns a document built by `build` on first use (e.g. the OpenAPI spec, once all routes exist).
+        """
+        compiled = self._documents.get(name)
+        if compiled is None:
+            with self._lock:
+                compiled = self._documents.get(name)
+                if compiled is None:
+                    compiled = self._documents[name] = compile_schema(build())
+        return compiled
+
+
+schema_registry = SchemaRegistry()